@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Arc fitting: runs of short G1 moves on a circle are replaced by G2/G3 moves
+
+Curves from vector artwork come as polylines of many tiny G1 moves, every
+one a line over the serial connection. mc_arc cuts arcs into chords on the
+controller and feeds them through the same polar mc_line, so one G2/G3 line
+can replace a whole run of them. Candidate runs are the stretches of G1
+moves which keep turning in the same direction. Every run is checked
+against the circle through its first, middle and last point (radial error
+plus the sagitta of every chord within the tolerance, one direction of
+rotation, limits on radius and angular span) and runs which fail are split
+in halves and checked again, all runs at once. Installed as the
+vplotter-arcfit console script.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import sys
+import argparse
+import numpy as np
+from gcodeparser import parse_gcode
+from gcodefile import GcodeFile
+from gcodesegmenter import DISTANCE_MODE, PLAIN_G1
+
+
+DEFAULT_TOLERANCE = 0.05  # mm, like the segmenter
+DEFAULT_MAX_RADIUS = 1000.0  # mm
+DEFAULT_MAX_SPAN = 270.0  # degrees, well clear of full circles, where start and end coincide
+DEFAULT_MIN_SEGMENTS = 4  # G1 moves replaced by one arc at least
+
+_MOTION = re.compile(r'G0*[0-3](?![0-9.])')
+_NON_MODAL = re.compile(r'G(0*4|10|28|30|53|92)(?![0-9])')
+
+
+def circumcircles(x0, y0, x1, y1, x2, y2):
+    """Centre and radius of the circles through three points each, the radius is not finite for collinear points."""
+    ax, ay = x0 - x1, y0 - y1
+    cx, cy = x2 - x1, y2 - y1
+    d = 2*(ax*cy - ay*cx)
+    a2 = ax*ax + ay*ay
+    c2 = cx*cx + cy*cy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ux = (cy*a2 - ay*c2) / d
+        uy = (ax*c2 - cx*a2) / d
+    return x1 + ux, y1 + uy, np.hypot(ux, uy)
+
+
+def check_arcs(px, py, a, b, tolerance, max_radius=DEFAULT_MAX_RADIUS, max_span=np.radians(DEFAULT_MAX_SPAN)):
+    """Check if the points a..b of the polylines px, py lie on an arc each.
+
+    Returns an ok flag, the centre and the direction (True for counter
+    clockwise, G3) of every arc.
+    """
+    m = (a + b) // 2
+    cx, cy, r = circumcircles(px[a], py[a], px[m], py[m], px[b], py[b])
+    ccw = (px[m] - px[a])*(py[b] - py[m]) - (py[m] - py[a])*(px[b] - px[m]) > 0
+    if len(a) == 0:
+        return np.zeros(0, bool), cx, cy, ccw
+    n = b - a
+    first = np.cumsum(n) - n
+    arc = np.repeat(np.arange(len(a)), n)
+    end = np.repeat(a - first, n) + np.arange(n.sum()) + 1
+    ux = px[end - 1] - cx[arc]
+    uy = py[end - 1] - cy[arc]
+    vx = px[end] - cx[arc]
+    vy = py[end] - cy[arc]
+    with np.errstate(invalid='ignore'):
+        radial = np.abs(np.hypot(vx, vy) - r[arc])
+        half_chord = 0.5*np.hypot(vx - ux, vy - uy)
+        sagitta = r[arc] - np.sqrt(np.maximum(r[arc]**2 - half_chord**2, 0.0))
+        error = np.nan_to_num(radial + sagitta, nan=np.inf)
+        # angle of every chord seen from the centre, all in the direction of the arc
+        dphi = np.arctan2(ux*vy - uy*vx, ux*vx + uy*vy) * np.where(ccw, 1.0, -1.0)[arc]
+    ok = np.isfinite(r) & (r <= max_radius)
+    ok &= np.maximum.reduceat(error, first) <= tolerance
+    ok &= np.minimum.reduceat(dphi, first) > 0
+    ok &= np.add.reduceat(dphi, first) <= max_span
+    return ok, cx, cy, ccw
+
+
+def fit_arcs(x, y, joined, tolerance=DEFAULT_TOLERANCE, max_radius=DEFAULT_MAX_RADIUS,
+             max_span=np.radians(DEFAULT_MAX_SPAN), min_segments=DEFAULT_MIN_SEGMENTS, start=(0.0, 0.0)):
+    """Find arcs in the polyline of the moves ending at x, y.
+
+    joined[k] is True if move k may be put on one arc with move k-1. Returns
+    the index of the first and one past the last move, the centre and the
+    direction (True for G3) of every arc, ordered along the polyline.
+    """
+    px = np.concatenate(([start[0]], x))
+    py = np.concatenate(([start[1]], y))
+    # turning direction at the vertices between moves k-1 and k
+    cross = (px[1:-1] - px[:-2])*(py[2:] - py[1:-1]) - (py[1:-1] - py[:-2])*(px[2:] - px[1:-1])
+    turn = np.sign(cross).astype(np.int8) * np.asarray(joined[1:], bool)
+    # stretches of vertices turning the same way, vertex k-1 joins the moves k-1 and k
+    change = np.flatnonzero(np.diff(np.concatenate(([0], turn, [0]))) != 0)
+    a = change[:-1]
+    b = change[1:] + 1
+    curved = turn[a] != 0
+    # at a change of direction the move in between belongs to the stretch before
+    a = np.where((a > 0) & (turn[np.maximum(a - 1, 0)] != 0), a + 1, a)
+    keep = curved & (b - a >= min_segments)
+    a, b = a[keep], b[keep]
+
+    found = []
+    while len(a):
+        ok, cx, cy, ccw = check_arcs(px, py, a, b, tolerance, max_radius, max_span)
+        found.append((a[ok], b[ok], cx[ok], cy[ok], ccw[ok]))
+        a, b = a[~ok], b[~ok]
+        m = (a + b) // 2
+        a, b = np.concatenate((a, m)), np.concatenate((m, b))
+        keep = b - a >= min_segments
+        a, b = a[keep], b[keep]
+    if not found:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), np.zeros(0), np.zeros(0, bool)
+    first, stop, cx, cy, ccw = [np.concatenate(columns) for columns in zip(*found)]
+    order = np.argsort(first)
+    first, stop, cx, cy, ccw = first[order], stop[order], cx[order], cy[order], ccw[order]
+
+    # halving cuts arcs at arbitrary points, merge neighbours which still fit one circle
+    while len(first) > 1:
+        pair = np.flatnonzero((stop[:-1] == first[1:]) & np.asarray(joined, bool)[np.minimum(stop[:-1], len(x) - 1)])
+        if len(pair) == 0:
+            break
+        ok, mx, my, mccw = check_arcs(px, py, first[pair], stop[pair + 1], tolerance, max_radius, max_span)
+        pair, mx, my, mccw = pair[ok], mx[ok], my[ok], mccw[ok]
+        # of a chain of overlapping merges only every other one
+        chain = np.concatenate(([True], pair[1:] != pair[:-1] + 1))
+        start_index = np.maximum.accumulate(np.where(chain, np.arange(len(pair)), 0))
+        take = (np.arange(len(pair)) - start_index) % 2 == 0
+        if not take.any():
+            break
+        pair = pair[take]
+        stop[pair] = stop[pair + 1]
+        cx[pair], cy[pair], ccw[pair] = mx[take], my[take], mccw[take]
+        keep = np.ones(len(first), bool)
+        keep[pair + 1] = False
+        first, stop, cx, cy, ccw = first[keep], stop[keep], cx[keep], cy[keep], ccw[keep]
+    return first, stop, cx, cy, ccw
+
+
+def arcfit_gcode(fn_in, fn_out, tolerance=DEFAULT_TOLERANCE, max_radius=DEFAULT_MAX_RADIUS,
+                 max_span=DEFAULT_MAX_SPAN, min_segments=DEFAULT_MIN_SEGMENTS, precision=3):
+    """Write the g-code file fn_in with runs of G1 moves on arcs replaced by G2/G3 moves to fn_out.
+
+    Only lines with nothing but a G1 move are replaced, and only runs in
+    one line after another with the same feed rate and pen state. max_span
+    is in degrees. Returns a dict with the number of lines read and written,
+    the number of arcs and the number of moves they replace.
+    """
+    with GcodeFile(fn_in) as gcodefile:
+        toolpath, nlines = parse_gcode(gcodefile.data)
+        plain = np.fromiter((PLAIN_G1.match(line.replace(' ', '')) is not None for line in gcodefile),
+                            bool, len(gcodefile))
+        line = toolpath['line']
+        move = (toolpath['motion'] == 1) & plain[line]
+        joined = np.zeros(len(toolpath), bool)
+        joined[1:] = move[1:] & move[:-1] & (np.diff(line) == 1)
+        for name in ('f', 's', 'spindle'):
+            joined[1:] &= toolpath[name][1:] == toolpath[name][:-1]
+        x = toolpath['x']
+        y = toolpath['y']
+        first, stop, cx, cy, ccw = fit_arcs(x, y, joined, tolerance, max_radius, np.radians(max_span), min_segments)
+        px = np.concatenate(([0.0], x))
+        py = np.concatenate(([0.0], y))
+        fmt = '%%.%if' % precision
+        arc_line = 'G%%i X%s Y%s I%s J%s' % (fmt, fmt, fmt, fmt)
+        arc_at = dict(zip(line[first].tolist(), range(len(first))))
+
+        relative = False
+        after_arc = False
+        skip_until = -1
+        ox = oy = 0.0  # machine position - parsed position, from rounding the arc end points
+        narcs = nmoves = nout = 0
+        with open(fn_out, 'w') as file:
+            for n, text in enumerate(gcodefile):
+                if n <= skip_until:
+                    continue
+                k = arc_at.get(n)
+                if k is not None:
+                    a, b = int(first[k]), int(stop[k])
+                    sx, sy = px[a] + ox, py[a] + oy
+                    if relative:
+                        ex, ey = round(px[b] - sx, precision), round(py[b] - sy, precision)
+                        nx, ny = sx + ex, sy + ey
+                    else:
+                        ex, ey = nx, ny = round(px[b], precision), round(py[b], precision)
+                    i, j = round(cx[k] - sx, precision), round(cy[k] - sy, precision)
+                    # the radius check of gcode.c, on the numbers as written
+                    r = np.hypot(i, j)
+                    dr = abs(np.hypot(nx - sx - i, ny - sy - j) - r)
+                    if not (dr > 0.005 and (dr > 0.5 or dr > 0.001*r)):
+                        out = arc_line % (3 if ccw[k] else 2, ex, ey, i, j)
+                        if 'F' in text:
+                            out += ' F%g' % toolpath['f'][a]
+                        file.write(out + '\n')
+                        ox, oy = nx - px[b], ny - py[b]
+                        skip_until = int(line[b - 1])
+                        after_arc = True
+                        narcs += 1
+                        nmoves += b - a
+                        nout += 1
+                        continue
+                if after_arc and (_MOTION.search(text) or _NON_MODAL.search(text)):
+                    after_arc = False
+                elif after_arc and any(axis in text for axis in 'XYZ'):
+                    # back to the modal G1 of the replaced moves
+                    text = 'G1 ' + text
+                    after_arc = False
+                file.write(text + '\n')
+                nout += 1
+                modes = DISTANCE_MODE.findall(text)
+                if modes:
+                    relative = modes[-1] == '1'
+                if not relative:
+                    ox = 0.0 if 'X' in text else ox
+                    oy = 0.0 if 'Y' in text else oy
+    return {'lines_in': nlines, 'lines_out': nout, 'arcs': narcs, 'moves_replaced': nmoves}
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Replace runs of G1 moves on arcs in a g-code file by G2/G3 moves.')
+    parser.add_argument('gcode_file',
+            help='g-code file to fit arcs to')
+    parser.add_argument('output_file',
+            help='g-code file to write')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='max deviation (mm) of the arcs from the G1 moves (default: %(default)s)')
+    parser.add_argument('--max-radius', type=float, default=DEFAULT_MAX_RADIUS,
+            help='max arc radius (mm) (default: %(default)s)')
+    parser.add_argument('--max-span', type=float, default=DEFAULT_MAX_SPAN,
+            help='max angle (degrees) of an arc (default: %(default)s)')
+    parser.add_argument('--min-segments', type=int, default=DEFAULT_MIN_SEGMENTS,
+            help='min number of G1 moves replaced by an arc (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    result = arcfit_gcode(args.gcode_file, args.output_file, tolerance=args.tolerance,
+                          max_radius=args.max_radius, max_span=args.max_span, min_segments=args.min_segments)
+    print('%i moves replaced by %i arcs, %i -> %i lines' %
+          (result['moves_replaced'], result['arcs'], result['lines_in'], result['lines_out']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Bounded console log for the GUI
+
+Every line sent and acknowledged while streaming ends up in the console,
+two lines per g-code line. The log keeps only the last capacity entries in
+a ring, collects new entries until the GUI flushes them at its own rate
+and writes everything to an optional rotating log file, in batches too.
+The GUI console shows the tail, filtered by verbosity.
+
+version history:
+2026-10-18: created this
+"""
+
+import time
+import logging
+import logging.handlers
+from collections import deque
+
+
+INFO = 1  # messages for the user, grbl's responses
+STREAM = 2  # the lines sent and acknowledged while streaming
+VERBOSITY = {'messages': INFO, 'stream lines': STREAM}
+
+DEFAULT_CAPACITY = 10000
+LOGFILE_BYTES = 10 * 1024 * 1024
+LOGFILE_BACKUPS = 5
+
+
+def format_entries(entries, date=False, clock=False):
+    """Console lines of entries, with the time (clock) and the date in front."""
+    if not clock:
+        return [text for t, level, text in entries]
+    fmt = '%Y-%m-%d %H:%M:%S' if date else '%H:%M:%S'
+    return ['%s: %s' % (time.strftime(fmt, time.localtime(t)), text) for t, level, text in entries]
+
+
+class ConsoleLog(object):
+    """Ring of the last log entries (time, level, text) and the rotating log file."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, logfile=None, max_bytes=LOGFILE_BYTES, backups=LOGFILE_BACKUPS):
+        """Initialise, logfile None for no file."""
+        self.entries = deque(maxlen=capacity)
+        self.pending = []  # entries not flushed yet
+        self.count = 0
+        self.handler = None
+        if logfile is not None:
+            self.handler = logging.handlers.RotatingFileHandler(logfile, maxBytes=max_bytes, backupCount=backups)
+            self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def append(self, text, level=INFO):
+        """Log one line."""
+        entry = (time.time(), level, text)
+        self.entries.append(entry)
+        self.pending.append(entry)
+        self.count += 1
+
+    def flush(self):
+        """Write the new entries to the log file and return them."""
+        entries, self.pending = self.pending, []
+        if entries and self.handler is not None:
+            # one record for the whole batch, the file rotates between batches
+            text = '\n'.join(format_entries(entries, date=True, clock=True))
+            self.handler.emit(logging.makeLogRecord({'msg': text}))
+        return entries
+
+    def tail(self, verbosity=INFO, n=None):
+        """The last n entries up to verbosity, all in the ring for n None."""
+        entries = [entry for entry in self.entries if entry[1] <= verbosity]
+        return entries if n is None else entries[-n:]
+
+    def close(self):
+        """Flush and close the log file."""
+        self.flush()
+        if self.handler is not None:
+            self.handler.close()
+            self.handler = None
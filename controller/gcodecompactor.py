@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+G-code compactor: fewer bytes per move through grbl's 128 byte rx buffer
+
+Comments, spaces and line numbers are removed, repeated modal words (motion
+mode, F, S) and axis words which don't change the position are dropped and
+the numbers are rounded to the step resolution of the machine, without
+trailing zeros. The lines are handled one by one, so files of any size can
+be compacted, or the compacted lines streamed directly. Installed as the
+vplotter-compact console script.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import os
+import sys
+import math
+import argparse
+from gcodefile import GcodeFile
+from grblsettings import DEFAULT_SETTINGS, parse_settings
+
+
+_WORD = re.compile(r'([A-Z])([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+))')
+_AXES = 'XYZ'
+# arcs keep at least this many decimals, so the rounded end point and centre pass grbl's radius check (0.005 mm)
+ARC_DECIMALS = 3
+
+
+def step_decimals(settings=DEFAULT_SETTINGS):
+    """Decimals needed for coordinates, so rounding moves no motor by half a step or more.
+
+    The belt lengths change at most as much as the pen moves, the rounding
+    errors of x and y add up to sqrt(2) times the error per axis.
+    """
+    steps_per_mm = max(settings[100], settings[101])
+    return max(int(math.ceil(math.log10(math.sqrt(2) * steps_per_mm))), 0)
+
+
+def format_number(value, decimals):
+    """Shortest text for value rounded to decimals, like 1.5, .25, -3 or 0."""
+    text = '%.*f' % (decimals, value)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text.startswith('0.'):
+        text = text[1:]
+    elif text.startswith('-0.'):
+        text = '-' + text[2:]
+    if text in ('-0', '-', ''):
+        text = '0'
+    return text
+
+
+class GcodeCompactor(object):
+    """Compacts g-code lines, keeping track of the modal state between them."""
+
+    def __init__(self, decimals=None, feed_decimals=1):
+        """Initialise, decimals for coordinates default to the step resolution, see step_decimals."""
+        self.decimals = step_decimals() if decimals is None else decimals
+        self.feed_decimals = feed_decimals
+        self.reset()
+
+    def reset(self):
+        """Forget the modal state, e.g. after a reset of grbl."""
+        self.relative = False
+        self.relative_exact = {}  # sum of the increments since G91, as given and as written
+        self.relative_sent = {}
+        self.forget()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lines_in = 0
+        self.lines_out = 0
+
+    def forget(self):
+        """Forget the position and the modal words written, they are written again when needed."""
+        self.motion = None
+        self.feed = None
+        self.spindle_speed = None
+        self.position = {}  # the last (rounded) absolute position of every axis, as far as known
+
+    def compact(self, line):
+        """Compacted version of a cleaned line (see gcodefile.clean_line), '' if nothing is left."""
+        compact = line.replace(' ', '')
+        if not compact or compact[0] in '$%[':
+            if compact.startswith('$'):
+                # homing ($H) moves, the rest may change what grbl does with the following lines
+                self.forget()
+            return compact
+        words = _WORD.findall(compact)
+        if sum(len(letter) + len(value) for letter, value in words) != len(compact):
+            # something this doesn't understand, leave it alone
+            self.forget()
+            return compact
+
+        gcodes = [float(value) for letter, value in words if letter == 'G']
+        # axis words of these are no plain moves, leave them alone
+        non_modal = [g for g in gcodes if int(g) in (4, 10, 28, 30, 53, 92)]
+        for g in gcodes:
+            if g == 90:
+                self.relative = False
+            elif g == 91 and not self.relative:
+                self.relative = True
+                self.relative_exact = {}
+                self.relative_sent = {}
+        motion = self.motion
+        for g in gcodes:
+            if g in (0, 1, 2, 3):
+                motion = int(g)
+        is_arc = motion in (2, 3)
+        decimals = max(self.decimals, ARC_DECIMALS) if is_arc else self.decimals
+
+        out = []
+        target = {}
+        for letter, value in words:
+            v = float(value)
+            if letter == 'N':
+                continue
+            if letter == 'G':
+                if v in (0, 1, 2, 3):
+                    if int(v) == self.motion and not non_modal:
+                        continue
+                    out.append('G%i' % v)
+                else:
+                    out.append('G' + format_number(v, 1))
+                continue
+            if letter == 'F':
+                text = format_number(v, self.feed_decimals)
+                if text == self.feed:
+                    continue
+                self.feed = text
+                out.append('F' + text)
+                continue
+            if letter == 'S':
+                text = format_number(v, self.feed_decimals)
+                if text == self.spindle_speed:
+                    continue
+                self.spindle_speed = text
+                out.append('S' + text)
+                continue
+            if letter in _AXES + 'IJK' and not non_modal:
+                text = format_number(v, decimals)
+                if letter in _AXES:
+                    if self.relative:
+                        # round the sum of the increments, so rounding errors don't add up
+                        exact = self.relative_exact.get(letter, 0.0) + v
+                        self.relative_exact[letter] = exact
+                        sent = self.relative_sent.get(letter, 0.0)
+                        text = format_number(round(exact, decimals) - sent, decimals)
+                        self.relative_sent[letter] = sent + float(text)
+                        if float(text) == 0 and not is_arc:
+                            continue
+                    else:
+                        target[letter] = text
+                        if self.position.get(letter) == text and not is_arc:
+                            continue
+                out.append(letter + text)
+                continue
+            if letter == 'R':
+                value = format_number(v, self.decimals)
+            elif letter == 'P':
+                value = format_number(v, 3)
+            out.append(letter + value)
+
+        if non_modal:
+            # homing, G53 moves and coordinate system changes, positions are unknown afterwards
+            if any(g != 4 for g in non_modal):
+                self.position = {}
+        elif self.relative:
+            for letter, value in words:
+                if letter in _AXES:
+                    self.position.pop(letter, None)
+        else:
+            self.position.update(target)
+        self.motion = motion
+        if any(letter == 'M' and float(value) in (2, 30) for letter, value in words):
+            # program end resets the modes of grbl, G90 among them
+            self.relative = False
+            self.forget()
+        return ''.join(out)
+
+    def lines(self, lines):
+        """Iterate over the compacted, non-empty versions of the cleaned lines."""
+        for line in lines:
+            compact = self.compact(line)
+            self.lines_in += 1
+            self.bytes_in += len(line) + 1
+            if compact:
+                self.lines_out += 1
+                self.bytes_out += len(compact) + 1
+                yield compact
+
+    @property
+    def ratio(self):
+        """Compression ratio, bytes in / bytes out, of the lines so far."""
+        return self.bytes_in / self.bytes_out if self.bytes_out else 1.0
+
+
+def compact_gcode(fn_in, fn_out, decimals=None):
+    """Write the compacted g-code file fn_in to fn_out, returns a dict with the sizes."""
+    compactor = GcodeCompactor(decimals)
+    with GcodeFile(fn_in) as gcodefile, open(fn_out, 'w') as file:
+        for line in compactor.lines(gcodefile):
+            file.write(line + '\n')
+    return {'lines_in': compactor.lines_in, 'lines_out': compactor.lines_out,
+            'bytes_in': os.path.getsize(fn_in), 'bytes_out': os.path.getsize(fn_out),
+            'ratio': os.path.getsize(fn_in) / max(os.path.getsize(fn_out), 1)}
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Compact a g-code file for streaming to grbl.')
+    parser.add_argument('gcode_file',
+            help='g-code file to compact')
+    parser.add_argument('output_file',
+            help='compacted g-code file to write')
+    parser.add_argument('-d', '--decimals', type=int, default=None,
+            help='decimals of the coordinates (default: from the step resolution)')
+    parser.add_argument('--settings', type=argparse.FileType('r'),
+            help="file with the output of grbl's '$$' for the step resolution (default: polar defaults)")
+    args = parser.parse_args(argv)
+
+    decimals = args.decimals
+    if decimals is None and args.settings is not None:
+        with args.settings as f:
+            decimals = step_decimals(parse_settings(f))
+    result = compact_gcode(args.gcode_file, args.output_file, decimals)
+    print('%i -> %i lines, %i -> %i bytes, compression ratio %.2f' %
+          (result['lines_in'], result['lines_out'], result['bytes_in'], result['bytes_out'], result['ratio']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
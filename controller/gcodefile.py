@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Memory mapped, lazy access to (very large) g-code files
+
+The file is never read into Python strings as a whole. A uint64 array with
+the byte offset of every line start is built once, lines are sliced out of
+the mmap and cleaned (comments stripped, upper case) when they are asked for.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import re
+import mmap
+import numpy as np
+
+
+_COMMENT = re.compile(r'\([^)]*\)?|;.*')
+_INDEX_CHUNKSIZE = 1 << 24
+
+
+def clean_line(line):
+    """Strip comments and whitespace from a g-code line and capitalize it."""
+    if ';' in line or '(' in line:
+        line = _COMMENT.sub('', line)
+    return line.strip().upper()
+
+
+class GcodeFile(object):
+    """Read-only, memory mapped g-code file with a line offset index.
+
+    Supports len(), indexing with line numbers (returning the cleaned line)
+    and iteration, so it can be handed to GrblStreamer.stream directly.
+    """
+
+    def __init__(self, fn, offsets=None):
+        """Open and index the file fn, or use a line offset index from a previous run."""
+        self.fn = fn
+        self._file = open(fn, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+        self.offsets = self._index() if offsets is None else offsets
+
+    def _index(self):
+        """Byte offsets of all line starts, with len(data) appended as the end of the last line."""
+        size = len(self.data)
+        parts = [np.zeros(1, np.uint64)]
+        for pos in range(0, size, _INDEX_CHUNKSIZE):
+            chunk = np.frombuffer(self.data, dtype=np.uint8, count=min(_INDEX_CHUNKSIZE, size - pos), offset=pos)
+            parts.append(np.flatnonzero(chunk == 10).astype(np.uint64) + np.uint64(pos + 1))
+            del chunk  # release the buffer export, otherwise the mmap can't be closed
+        offsets = np.concatenate(parts)
+        if offsets[-1] != size:
+            offsets = np.append(offsets, np.uint64(size))
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, n):
+        """Line n as bytes, as it is in the file."""
+        return self.data[int(self.offsets[n]):int(self.offsets[n+1])]
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[m] for m in range(*n.indices(len(self)))]
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError('line %i out of range' % n)
+        return clean_line(self.raw(n).decode(errors='replace'))
+
+    def lines(self, start=0, stop=None):
+        """Iterate over the cleaned lines from line start on."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        data = self.data
+        # offsets converted to Python ints in blocks, cheaper than one numpy scalar per line
+        for block in range(start, stop, 4096):
+            offsets = self.offsets[block:min(block + 4096, stop) + 1].tolist()
+            for a, b in zip(offsets[:-1], offsets[1:]):
+                yield clean_line(data[a:b].decode(errors='replace'))
+
+    def __iter__(self):
+        return self.lines()
+
+    def close(self):
+        """Close the mmap and the file."""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,280 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Vectorized g-code parser producing a NumPy structured toolpath array
+
+The whole text is handled as one uint8 array: comments and whitespace are
+masked out, every letter starts a word and the numbers are assembled from
+their digits with cumulative sums, without creating a Python object per
+line or per word. Modal values (motion mode, feed, spindle, distance mode)
+are forward-filled with the index of the last line that set them.
+
+The result has one row per move (a line with X or Y words in a motion mode).
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import numpy as np
+
+
+TOOLPATH_DTYPE = np.dtype([
+    ('line', np.int64),  # line number in the file, starting at 0
+    ('motion', np.int8),  # modal motion mode, 0..3 for G0..G3
+    ('x', np.float64),  # absolute target position (mm)
+    ('y', np.float64),
+    ('i', np.float64),  # arc centre offset for G2/G3, 0 if not given
+    ('j', np.float64),
+    ('f', np.float64),  # modal feed rate (mm/min), nan before the first F word
+    ('s', np.float64),  # modal spindle speed / servo position
+    ('spindle', np.int8),  # modal spindle state, 1 after M3/M4, 0 after M5
+])
+
+PARSER_VERSION = 1  # increase when the output of parse_gcode changes, invalidates cached toolpaths
+
+DEFAULT_RAPID_RATE = 5000.0  # mm/min, DEFAULT_X_MAX_RATE in defaults_polar.h
+
+# non-modal G codes which use axis words for something else than a move
+_NON_MOTION_G = (4, 10, 28, 30, 92)
+_CHUNKSIZE = 1 << 23
+_POW10 = 10.0 ** np.arange(32)
+_COMMENT = re.compile(rb'\([^\n)]*\)?|;[^\n]*')
+
+
+def _last_index(mask):
+    """Index of the last True at or before every position, -1 where there is none."""
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx)
+
+
+def _ffill(values, mask, default):
+    """Forward-fill values[mask] over the following positions."""
+    idx = _last_index(mask)
+    out = np.where(idx >= 0, values[np.maximum(idx, 0)], default)
+    return out
+
+
+def _parse_words(data, line0):
+    """Split a chunk of g-code text into words.
+
+    Returns letters (uint8), values (float64, nan for words without a number)
+    and the line number of each word, plus the number of lines in the chunk.
+    """
+    data = bytes(data).upper()
+    if b';' in data or b'(' in data:
+        data = _COMMENT.sub(b'', data)
+    c = np.frombuffer(data, dtype=np.uint8)
+    nl = c == 10
+    # every letter and every line end starts a new word
+    start = ((c >= 65) & (c <= 90)) | nl
+    first = np.flatnonzero(start)
+    nlines = data.count(b'\n') + (len(data) > 0 and not data.endswith(b'\n'))
+    if not len(first):
+        return np.zeros(0, np.uint8), np.zeros(0), np.zeros(0, np.int64), int(nlines)
+    word = np.cumsum(start, dtype=np.int32) - 1
+    nwords = len(first)
+
+    # digits only: value of every digit times its power of ten within the word
+    dv = c - np.uint8(48)
+    dpos = np.flatnonzero(dv < 10)
+    dword = word[dpos]
+    ndigits = np.bincount(dword, minlength=nwords)
+    dend = np.cumsum(ndigits)
+    power = dend[dword] - 1 - np.arange(len(dpos))
+    mantissa = np.bincount(dword, weights=dv[dpos] * _POW10[np.minimum(power, len(_POW10) - 1)],
+                           minlength=nwords)
+    # digits after the decimal point
+    frac = np.zeros(nwords, np.int64)
+    dotpos = np.flatnonzero(c == 46)
+    if len(dotpos):
+        dotword = word[dotpos]
+        frac[dotword] = dend[dotword] - np.searchsorted(dpos, dotpos)
+    sign = np.ones(nwords)
+    sign[word[np.flatnonzero(c == 45)]] = -1.0
+    values = np.where(ndigits > 0, sign * mantissa / _POW10[np.minimum(frac, len(_POW10) - 1)], np.nan)
+
+    letters = c[first]
+    isnl = letters == 10
+    line = np.cumsum(isnl) - isnl + line0
+    isletter = ~isnl & (letters >= 65)
+    return letters[isletter], values[isletter], line[isletter], int(nlines)
+
+
+def _iter_chunks(data, chunksize):
+    """Cut data into chunks which end at a line end."""
+    pos = 0
+    n = len(data)
+    while pos < n:
+        end = min(pos + chunksize, n)
+        if end < n:
+            nl = data.rfind(b'\n', pos, end)
+            if nl < 0:
+                nl = data.find(b'\n', end)
+                if nl < 0:
+                    nl = n - 1
+            end = nl + 1
+        yield data[pos:end]
+        pos = end
+
+
+def _line_table(letters, values, lines, line0, nlines):
+    """Scatter the words into one row per line, nan where a word is missing."""
+    table = {}
+    for key in 'XYIJFS':
+        col = np.full(nlines, np.nan)
+        m = letters == ord(key)
+        col[lines[m] - line0] = values[m]
+        table[key] = col
+    g = letters == ord('G')
+    gval = values[g]
+    glines = lines[g] - line0
+    motion = np.full(nlines, -1, np.int8)
+    m = np.isin(gval, (0, 1, 2, 3))
+    motion[glines[m]] = gval[m]
+    distance = np.full(nlines, -1, np.int8)
+    m = np.isin(gval, (90, 91))
+    distance[glines[m]] = gval[m] - 90
+    nonmotion = np.zeros(nlines, bool)
+    nonmotion[glines[np.isin(gval, _NON_MOTION_G)]] = True
+    mw = letters == ord('M')
+    spindle = np.full(nlines, -1, np.int8)
+    mval = values[mw]
+    mlines = lines[mw] - line0
+    m = np.isin(mval, (3, 4, 5))
+    spindle[mlines[m]] = np.where(mval[m] == 5, 0, 1)
+    table['motion'] = motion
+    table['distance'] = distance
+    table['nonmotion'] = nonmotion
+    table['spindle'] = spindle
+    return table
+
+
+class _ModalState(object):
+    """Modal state carried from one chunk to the next."""
+
+    def __init__(self):
+        self.motion = 0
+        self.distance = 0  # 0: G90, 1: G91
+        self.f = np.nan
+        self.s = 0.0
+        self.spindle = 0
+        self.x = 0.0
+        self.y = 0.0
+
+
+def _positions(word, relative, state_value):
+    """Absolute positions from absolute and incremental axis words.
+
+    Row 0 is the carried state. The position is the last absolute word plus
+    the sum of the incremental words since then.
+    """
+    has = ~np.isnan(word)
+    absolute = has & ~relative
+    absolute[0] = True
+    word = word.copy()
+    word[0] = state_value
+    inc = np.where(has & relative, word, 0.0)
+    inc[0] = 0.0
+    cinc = np.cumsum(inc)
+    idx = _last_index(absolute)
+    return word[idx] + cinc - cinc[idx]
+
+
+def _parse_chunk(data, line0, state):
+    letters, values, lines, nlines = _parse_words(data, line0)
+    t = _line_table(letters, values, lines, line0, nlines)
+
+    def carried(col, value):
+        return np.concatenate(([value], col))
+
+    motion = carried(t['motion'], state.motion)
+    motion = _ffill(motion, motion >= 0, state.motion)
+    distance = carried(t['distance'], state.distance)
+    distance = _ffill(distance, distance >= 0, state.distance)
+    spindle = carried(t['spindle'], state.spindle)
+    spindle = _ffill(spindle, spindle >= 0, state.spindle)
+    f = carried(t['F'], state.f)
+    f = _ffill(f, ~np.isnan(f), state.f)
+    s = carried(t['S'], state.s)
+    s = _ffill(s, ~np.isnan(s), state.s)
+
+    xw = carried(t['X'], state.x)
+    yw = carried(t['Y'], state.y)
+    nonmotion = carried(t['nonmotion'], False)
+    # axis words of G10/G28/G92... are no moves
+    xw[nonmotion] = np.nan
+    yw[nonmotion] = np.nan
+    relative = distance == 1
+    x = _positions(xw, relative, state.x)
+    y = _positions(yw, relative, state.y)
+
+    move = ~np.isnan(xw[1:]) | ~np.isnan(yw[1:])
+    rows = np.flatnonzero(move)
+    out = np.zeros(len(rows), dtype=TOOLPATH_DTYPE)
+    out['line'] = rows + line0
+    rows1 = rows + 1
+    out['motion'] = motion[rows1]
+    out['x'] = x[rows1]
+    out['y'] = y[rows1]
+    out['i'] = np.nan_to_num(t['I'][rows])
+    out['j'] = np.nan_to_num(t['J'][rows])
+    out['f'] = f[rows1]
+    out['s'] = s[rows1]
+    out['spindle'] = spindle[rows1]
+
+    state.motion = motion[-1]
+    state.distance = distance[-1]
+    state.spindle = spindle[-1]
+    state.f = f[-1]
+    state.s = s[-1]
+    state.x = x[-1]
+    state.y = y[-1]
+    return out, nlines
+
+
+def parse_gcode(data, chunksize=_CHUNKSIZE):
+    """Parse g-code text into a toolpath array with one row per move.
+
+    data can be bytes, str or any buffer supporting slicing and rfind, like
+    an mmap. The text is processed in chunks of about chunksize bytes, so the
+    temporary arrays stay small for very large files.
+    Returns the toolpath array and the number of lines in the text.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    state = _ModalState()
+    parts = []
+    line0 = 0
+    for chunk in _iter_chunks(data, chunksize):
+        out, nlines = _parse_chunk(chunk, line0, state)
+        parts.append(out)
+        line0 += nlines
+    if not parts:
+        return np.zeros(0, dtype=TOOLPATH_DTYPE), 0
+    return np.concatenate(parts), line0
+
+
+def parse_gcode_file(fn, chunksize=_CHUNKSIZE):
+    """Parse a g-code file, see parse_gcode."""
+    with open(fn, 'rb') as file:
+        return parse_gcode(file.read(), chunksize=chunksize)
+
+
+def segment_lengths(toolpath, start=(0.0, 0.0)):
+    """Straight line length (mm) of every move, the first one starting at start."""
+    x = np.concatenate(([start[0]], toolpath['x']))
+    y = np.concatenate(([start[1]], toolpath['y']))
+    return np.hypot(np.diff(x), np.diff(y))
+
+
+def line_times(toolpath, nlines, rapid_rate=DEFAULT_RAPID_RATE):
+    """Cumulative time (s) at the end of every line, from move length over feed rate.
+
+    Accelerations are ignored, this is a rough estimate.
+    """
+    feed = np.where((toolpath['motion'] == 0) | np.isnan(toolpath['f']), rapid_rate, toolpath['f'])
+    feed = np.minimum(feed, rapid_rate)
+    dt = segment_lengths(toolpath) / feed * 60.0
+    return np.cumsum(np.bincount(toolpath['line'], weights=dt, minlength=nlines))
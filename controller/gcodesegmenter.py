@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Host side segmentation of straight lines for the polar geometry
+
+The firmware moves linearly in belt space between the points of a G1
+move, cut into fixed 30 mm pieces by mc_segmented_line. Depending on where
+on the drawing area a line lies, that bows it by up to a millimetre or
+more. This stage cuts every G1 move into the fewest pieces which keep the
+machine path within a tolerance of the straight line and writes them as
+explicit G1 points. Moves the firmware already cuts finely enough are left
+alone. Installed as the vplotter-segment console script.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import sys
+import argparse
+import numpy as np
+from gcodeparser import parse_gcode
+from gcodefile import GcodeFile
+from grblsettings import parse_settings
+from polarkinematics import PolarKinematics, subdivide
+
+
+DEFAULT_TOLERANCE = 0.05  # mm
+
+DISTANCE_MODE = re.compile(r'G0*9([01])(?![0-9])')
+# lines with nothing but a G1 move, which can be replaced by their pieces
+PLAIN_G1 = re.compile(r'^(N[0-9]+)?(G0*1(?![0-9.])|[XYF][-+]?[0-9.]+)+$')
+
+
+def segment_gcode(fn_in, fn_out, tolerance=DEFAULT_TOLERANCE, kinematics=None, precision=3):
+    """Write the g-code file fn_in with adaptively segmented G1 moves to fn_out.
+
+    Returns a dict with the number of lines read and written, the number
+    of moves split and the largest deviation (mm) before and after.
+    """
+    kinematics = PolarKinematics() if kinematics is None else kinematics
+    with GcodeFile(fn_in) as gcodefile:
+        toolpath, nlines = parse_gcode(gcodefile.data)
+        x = toolpath['x']
+        y = toolpath['y']
+        counts = kinematics.adaptive_counts(x, y, toolpath['motion'], tolerance)
+        xs, ys, source = subdivide(x, y, counts)
+        first = np.cumsum(counts) - counts
+        split = {line: row for row, line in zip(np.flatnonzero(counts > 1).tolist(),
+                                                 toolpath['line'][counts > 1].tolist())}
+        x0 = np.concatenate(([0.0], x[:-1]))
+        y0 = np.concatenate(([0.0], y[:-1]))
+        fmt = '%%.%if' % precision
+        xy = 'G1 X%s Y%s' % (fmt, fmt)
+
+        relative = False
+        written = np.ones(len(counts), np.int64)
+        nout = 0
+        with open(fn_out, 'w') as file:
+            for n, line in enumerate(gcodefile):
+                modes = DISTANCE_MODE.findall(line)
+                row = split.get(n)
+                if row is not None and PLAIN_G1.match(line.replace(' ', '')):
+                    px = np.round(xs[first[row]:first[row] + counts[row]], precision)
+                    py = np.round(ys[first[row]:first[row] + counts[row]], precision)
+                    if relative:
+                        # increments between the rounded points, so they add up exactly
+                        px = np.diff(np.concatenate(([round(x0[row], precision)], px)))
+                        py = np.diff(np.concatenate(([round(y0[row], precision)], py)))
+                    pieces = [xy % p for p in zip(px.tolist(), py.tolist())]
+                    if 'F' in line:
+                        pieces[0] += ' F%g' % toolpath['f'][row]
+                    file.write('\n'.join(pieces) + '\n')
+                    written[row] = counts[row]
+                    nout += len(pieces)
+                else:
+                    file.write(line + '\n')
+                    nout += 1
+                if modes:
+                    relative = modes[-1] == '1'
+
+    # the pieces really written, lines with other words than the move are left alone
+    before = after = 0.0
+    line = toolpath['motion'] == 1
+    if line.any():
+        xf, yf, fsource = kinematics.firmware_segments(x, y, toolpath['motion'])
+        before = _max_deviation(kinematics, xf, yf, line[fsource])
+        xs, ys, source = subdivide(x, y, written)
+        xf, yf, fsource = kinematics.firmware_segments(xs, ys, toolpath['motion'][source])
+        after = _max_deviation(kinematics, xf, yf, line[source][fsource])
+    return {'lines_in': nlines, 'lines_out': nout, 'moves_split': int((written > 1).sum()),
+            'deviation_before': before, 'deviation_after': after}
+
+
+def _max_deviation(kinematics, x, y, mask, start=(0.0, 0.0)):
+    x0 = np.concatenate(([start[0]], x[:-1]))
+    y0 = np.concatenate(([start[1]], y[:-1]))
+    return float(kinematics.chord_deviation(x0[mask], y0[mask], x[mask], y[mask]).max())
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Segment the G1 moves of a g-code file for the polar geometry.')
+    parser.add_argument('gcode_file',
+            help='g-code file to segment')
+    parser.add_argument('output_file',
+            help='segmented g-code file to write')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='max deviation (mm) of the machine path from the straight lines (default: %(default)s)')
+    parser.add_argument('--settings', type=argparse.FileType('r'),
+            help="file with the output of grbl's '$$' for the machine geometry (default: polar defaults)")
+    args = parser.parse_args(argv)
+
+    kinematics = None
+    if args.settings is not None:
+        with args.settings as f:
+            kinematics = PolarKinematics.from_settings(parse_settings(f))
+    result = segment_gcode(args.gcode_file, args.output_file, tolerance=args.tolerance, kinematics=kinematics)
+    print('%i moves split, %i -> %i lines' % (result['moves_split'], result['lines_in'], result['lines_out']))
+    print('max deviation: %.3f mm -> %.3f mm' % (result['deviation_before'], result['deviation_after']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
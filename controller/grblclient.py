@@ -0,0 +1,295 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+asyncio client for grbl, for scripts that create, stream and watch in one process
+
+The serial port is read by the event loop (add_reader on its file
+descriptor), so there are no threads and no sleeps per command. Every line
+command, from send() as well as from stream(), goes through the same
+character counting as grblstreamer: it is written as soon as it fits into
+grbl's rx buffer and its future resolves with the matching ok/error, which
+grbl sends in the order of the lines.
+
+    async with await connect('/dev/ttyACM0') as grbl:
+        await grbl.send('$X')
+        print(await grbl.query('$$'))
+        task = asyncio.ensure_future(grbl.stream(lines))
+        async for status in grbl.statuses(0.5):
+            print(status.state, status.spos)
+            if task.done():
+                break
+
+connect() waits for grbl's banner and reads its state, settings and
+offsets once, see grblhandshake, with reset=False it reconnects to a
+running plotter without resetting it.
+
+Ports without a file descriptor, like grblsim.SimulatedSerial, are polled
+instead.
+
+version history:
+2026-10-18: created this
+"""
+
+import asyncio
+from collections import deque
+import serial
+from grblstreamer import RX_BUFFER_SIZE, is_ack
+from grblstatus import parse_status
+from grblsettings import parse_settings
+from grblhandshake import (BANNER_TIMEOUT, GrblInfo, open_port, parse_banner, parse_build_info,
+                           parse_parameters)
+
+
+POLL_INTERVAL = 0.005  # s between reads of ports without a file descriptor
+STATUS_TIMEOUT = 1.0  # s to wait for the answer to '?'
+REALTIME_COMMANDS = ('?', '!', '~', '\x18')
+
+
+class _Command(object):
+    """A line in grbl's rx buffer, waiting for its acknowledge."""
+
+    def __init__(self, length, future):
+        self.length = length
+        self.future = future
+        self.lines = []  # output of grbl before the acknowledge, e.g. of '$$'
+
+
+class GrblClient(object):
+    """Exchange commands with grbl on an asyncio event loop.
+
+    ser is an opened serial.Serial, or anything with write(bytes),
+    read(size), in_waiting and timeout. on_message(text) is called for
+    output of grbl which doesn't belong to a command, like the startup
+    banner and alarms.
+    """
+
+    def __init__(self, ser, rx_buffer_size=RX_BUFFER_SIZE):
+        """Initialise, start() attaches to the running event loop."""
+        self.ser = ser
+        self.rx_buffer_size = rx_buffer_size
+        self.on_message = None
+        self.status = None  # the last MachineStatus
+        self.info = None  # grblhandshake.GrblInfo, after handshake()
+        self.errors = 0
+        self._pending = deque()
+        self._buffered = 0
+        self._partial = b''
+        self._room = None
+        self._status_waiters = []
+        self._banner_waiters = []
+        self._loop = None
+        self._fd = None
+        self._poller = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def start(self):
+        """Read the port with the running event loop, then handshake() before the first command."""
+        self._loop = asyncio.get_running_loop()
+        self._room = asyncio.Event()
+        self.ser.timeout = 0
+        try:
+            self._fd = self.ser.fileno()
+        except (AttributeError, OSError, serial.SerialException):
+            self._fd = None
+        if self._fd is not None:
+            self._loop.add_reader(self._fd, self._read)
+        else:
+            self._poller = self._loop.create_task(self._poll())
+
+    async def handshake(self, reset=True, timeout=BANNER_TIMEOUT):
+        """Wait until grbl is ready and read its state, settings and offsets, returns a GrblInfo.
+
+        Like grblhandshake.handshake: with reset, wait for the banner, and
+        reset grbl with ctrl-x if it doesn't come. Without reset, grbl is
+        just asked for its status. Raises asyncio.TimeoutError if grbl
+        doesn't answer within timeout seconds.
+        """
+        t0 = self._loop.time()
+        info = GrblInfo(reset)
+        if reset:
+            try:
+                info.version = await self._wait_banner(timeout)
+            except asyncio.TimeoutError:
+                self.realtime('\x18')
+                info.version = await self._wait_banner(timeout)
+        info.status = await self.get_status(timeout)
+        info.ready_time = self._loop.time() - t0
+        if info.status.state in ('Idle', 'Alarm'):
+            # grbl answers these only while the machine stands still
+            if not reset:
+                info.version, info.build = parse_build_info(await self.query('$I'))
+            info.settings = parse_settings(await self.query('$$'))
+            info.parameters = parse_parameters(await self.query('$#'))
+        info.time = self._loop.time() - t0
+        self.info = info
+        return info
+
+    async def _wait_banner(self, timeout):
+        future = self._loop.create_future()
+        self._banner_waiters.append(future)
+        return await asyncio.wait_for(future, timeout)
+
+    def close(self):
+        """Stop reading and close the port, commands still waiting fail."""
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        self._fail_pending(ConnectionError('port closed'))
+        self.ser.close()
+
+    async def _poll(self):
+        while True:
+            self._read()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _read(self):
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if not data:
+            return
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._dispatch(line.decode(errors='replace').strip())
+
+    def _dispatch(self, response):
+        if not response:
+            return
+        if response.startswith('<'):
+            status = parse_status(response)
+            if status is not None:
+                self.status = status
+                waiters, self._status_waiters = self._status_waiters, []
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(status)
+                return
+        version = parse_banner(response)
+        if version is not None:
+            # grbl was reset, the lines in its rx buffer are gone
+            self._fail_pending(ConnectionResetError('grbl was reset'))
+            waiters, self._banner_waiters = self._banner_waiters, []
+            for future in waiters:
+                if not future.done():
+                    future.set_result(version)
+        elif is_ack(response) and self._pending:
+            command = self._pending.popleft()
+            self._buffered -= command.length
+            self._room.set()
+            if response.startswith('error'):
+                self.errors += 1
+            command.lines.append(response)
+            if not command.future.done():
+                command.future.set_result(command.lines)
+            return
+        elif self._pending:
+            self._pending[0].lines.append(response)
+            return
+        if self.on_message is not None:
+            self.on_message(response)
+
+    def _fail_pending(self, exc):
+        while self._pending:
+            future = self._pending.popleft().future
+            if not future.done():
+                future.set_exception(exc)
+        self._buffered = 0
+        if self._room is not None:
+            self._room.set()
+
+    async def _write_line(self, line):
+        """Write line as soon as it fits into grbl's rx buffer, returns the future of its response lines."""
+        block = line.strip()
+        length = len(block) + 1
+        # grbl's ring buffer holds rx_buffer_size-1 characters, keep one more spare
+        while self._pending and self._buffered + length >= self.rx_buffer_size - 1:
+            self._room.clear()
+            await self._room.wait()
+        command = _Command(length, self._loop.create_future())
+        self._pending.append(command)
+        self._buffered += length
+        self.ser.write(('%s\n' % block).encode())
+        return command.future
+
+    async def query(self, command):
+        """Send a line command, returns grbl's output for it, the ok/error last."""
+        return await (await self._write_line(command))
+
+    async def send(self, command):
+        """Send a line command, returns the matching 'ok' or 'error: ...'."""
+        return (await self.query(command))[-1]
+
+    def realtime(self, command):
+        """Send a realtime command ('?', '!', '~', '\\x18'), it bypasses grbl's rx buffer."""
+        if command not in REALTIME_COMMANDS:
+            raise ValueError('not a realtime command: %r' % command)
+        self.ser.write(command.encode())
+
+    async def stream(self, lines, on_ack=None):
+        """Stream lines with character counting, returns the number of lines acknowledged and of errors.
+
+        on_ack(n, response) is called for every line.
+        """
+        counts = [0, 0]
+
+        def done(n, future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            response = future.result()[-1]
+            counts[0] += 1
+            if response.startswith('error'):
+                counts[1] += 1
+            if on_ack is not None:
+                on_ack(n, response)
+
+        last = None
+        for n, line in enumerate(lines):
+            last = await self._write_line(line)
+            last.add_done_callback(lambda future, n=n: done(n, future))
+        if last is not None:
+            # the acknowledges come in order, and done() runs before this wakes up
+            await last
+        return counts[0], counts[1]
+
+    async def get_status(self, timeout=STATUS_TIMEOUT):
+        """Request a status report, returns it as grblstatus.MachineStatus."""
+        future = self._loop.create_future()
+        self._status_waiters.append(future)
+        self.realtime('?')
+        return await asyncio.wait_for(future, timeout)
+
+    async def statuses(self, interval=0.2):
+        """Async iterator of a status report every interval seconds."""
+        while True:
+            t0 = self._loop.time()
+            try:
+                yield await self.get_status()
+            except asyncio.TimeoutError:
+                continue
+            await asyncio.sleep(max(interval - (self._loop.time() - t0), 0.0))
+
+    async def wait_idle(self, interval=0.2):
+        """Wait until grbl has executed every move, returns the Idle status."""
+        async for status in self.statuses(interval):
+            if status.idle and not self._pending:
+                return status
+
+
+async def connect(port, baudrate=115200, rx_buffer_size=RX_BUFFER_SIZE, reset=True, timeout=BANNER_TIMEOUT):
+    """Open a serial port to grbl and return the started GrblClient, after the handshake."""
+    client = GrblClient(open_port(port, baudrate, reset, timeout=0), rx_buffer_size)
+    client.start()
+    try:
+        await client.handshake(reset, timeout)
+    except asyncio.TimeoutError:
+        client.close()
+        raise
+    return client
@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Handshake with grbl after opening the port, instead of fixed sleeps
+
+Opening the port resets the Arduino, and grbl announces itself after the
+bootloader with
+    Grbl 0.9j ['$' for help]
+so the host waits for this banner, not a fixed time, and grbl is ready as
+soon as it arrives. Then the machine state ('?'), the settings ('$$') and
+the coordinate offsets ('$#') are read once, into a GrblInfo.
+
+To reconnect to a running plotter without losing its position and modes,
+the port is opened with DTR held low, so the Arduino is not reset, and
+grbl is asked for a status report and its build info ('$I') instead of
+waiting for a banner.
+
+handshake() works on a GrblStreamer, grblclient has the same for asyncio.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import time
+import serial
+from grblstreamer import is_ack
+from grblstatus import parse_status
+from grblsettings import parse_settings
+
+
+BANNER_TIMEOUT = 3.0  # s for the bootloader and grbl's start up
+QUERY_TIMEOUT = 1.0  # s for the answer to '?', '$I', '$$' or '$#'
+
+_BANNER = re.compile(r"^Grbl (\S+) \['\$' for help\]")
+_BUILD_INFO = re.compile(r'^\[([^.:\]]+\.[^.:\]]+)\.([^:\]]*):')
+_PARAMETER = re.compile(r'^\[([A-Z][A-Z0-9]*):([-+0-9.,]+)')
+
+
+def parse_banner(line):
+    """The version of grbl from its banner line, None for any other line."""
+    m = _BANNER.match(line)
+    return None if m is None else m.group(1)
+
+
+def parse_build_info(lines):
+    """(version, build date) from the response lines of '$I', (None, None) if not found."""
+    for line in lines:
+        m = _BUILD_INFO.match(line)
+        if m:
+            return m.group(1), m.group(2)
+    return None, None
+
+
+def parse_parameters(lines):
+    """Dict {'G54': (x, y, z), ..., 'G92': ..., 'TLO': (z,), 'PRB': ...} from the response lines of '$#'."""
+    parameters = {}
+    for line in lines:
+        m = _PARAMETER.match(line.strip())
+        if m:
+            parameters[m.group(1)] = tuple(float(v) for v in m.group(2).split(','))
+    return parameters
+
+
+class GrblInfo(object):
+    """What the handshake found out about grbl."""
+
+    def __init__(self, reset=True):
+        """Initialise, reset is False for a reconnect without reset."""
+        self.reset = reset
+        self.version = None  # e.g. '0.9j'
+        self.build = None  # build date, from '$I' on a reconnect only
+        self.status = None  # grblstatus.MachineStatus
+        self.settings = None  # {number: value} from '$$', on top of DEFAULT_SETTINGS
+        self.parameters = None  # from '$#', see parse_parameters
+        self.ready_time = None  # s from the start of the handshake until grbl answered
+        self.time = None  # s for the whole handshake
+
+    @property
+    def text(self):
+        """One line for the user."""
+        state = '' if self.status is None else ', %s' % self.status.state
+        return 'grbl %s ready after %.2f s%s' % (self.version or '?', self.ready_time, state)
+
+
+def open_port(port, baudrate=115200, reset=True, timeout=0.1):
+    """Open the serial port to grbl, without reset the Arduino keeps running.
+
+    The Arduino resets when DTR goes high, so it is kept low. Some serial
+    drivers raise DTR while opening anyway, 'stty -F <port> -hupcl' once
+    stops that on Linux.
+    """
+    ser = serial.Serial(None, baudrate, timeout=timeout)
+    ser.port = port
+    if not reset:
+        ser.dtr = False
+        ser.rts = False
+    ser.open()
+    return ser
+
+
+def _wait_for(streamer, parse, deadline):
+    """The first line parse() returns something for, other lines are dispatched, None on timeout."""
+    while time.time() < deadline:
+        line = streamer.readline()
+        if not line:
+            continue
+        result = parse(line)
+        if result is not None:
+            return result
+        streamer.dispatch(line)
+    return None
+
+
+def _query(streamer, command, timeout=QUERY_TIMEOUT):
+    """Send a line command, returns grbl's output for it, the ok/error last."""
+    streamer.ser.write(('%s\n' % command).encode())
+    lines = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        line = streamer.readline()
+        if line.startswith('<'):
+            streamer.dispatch(line)
+        elif line:
+            lines.append(line)
+            if is_ack(line):
+                return lines
+    raise TimeoutError('no answer from grbl to %s' % command)
+
+
+def handshake(streamer, reset=True, timeout=BANNER_TIMEOUT):
+    """Wait until grbl is ready and read its state, settings and offsets, returns a GrblInfo.
+
+    streamer is the GrblStreamer of the port just opened. With reset, wait
+    for the banner, and reset grbl with ctrl-x if the port was opened
+    without a reset. Without reset, grbl is just asked for its status.
+    Output of grbl on the way goes to the streamer's callbacks. Raises
+    TimeoutError if grbl doesn't answer within timeout seconds.
+    """
+    ser = streamer.ser
+    t0 = time.time()
+    info = GrblInfo(reset)
+    if reset:
+        info.version = _wait_for(streamer, parse_banner, t0 + timeout)
+        if info.version is None:
+            ser.write(b'\x18')
+            info.version = _wait_for(streamer, parse_banner, time.time() + timeout)
+        if info.version is None:
+            raise TimeoutError('no answer from grbl within %.1f s' % timeout)
+    else:
+        # output from before the reconnect
+        ser.reset_input_buffer()
+    ser.write(b'?')
+    info.status = _wait_for(streamer, parse_status, time.time() + (QUERY_TIMEOUT if reset else timeout))
+    if info.status is None:
+        raise TimeoutError('no status report from grbl')
+    streamer.status = info.status
+    info.ready_time = time.time() - t0
+    if info.status.state in ('Idle', 'Alarm'):
+        # grbl answers these only while the machine stands still
+        if not reset:
+            info.version, info.build = parse_build_info(_query(streamer, '$I'))
+        info.settings = parse_settings(_query(streamer, '$$'))
+        info.parameters = parse_parameters(_query(streamer, '$#'))
+    info.time = time.time() - t0
+    return info
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+grbl '$' settings of the polar v-plotter firmware
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+
+
+# firmware/grbl/defaults/defaults_polar.h, in the units grbl reports them with $$
+DEFAULT_SETTINGS = {
+    11: 0.01,  # junction deviation, mm
+    12: 0.002,  # arc tolerance, mm
+    28: 1133.0,  # motor distance, mm
+    29: 291.0,  # x0, mm
+    30: 1192.0,  # y0, mm
+    100: 40.0,  # x (belt A) step/mm
+    101: 40.0,  # y (belt B) step/mm
+    110: 5000.0,  # x max rate, mm/min
+    111: 5000.0,  # y max rate, mm/min
+    120: 10.0,  # x accel, mm/sec^2
+    121: 10.0,  # y accel, mm/sec^2
+}
+
+_SETTING = re.compile(r'^\$(\d+)=([-+]?[0-9.]+)')
+
+
+def parse_settings(lines):
+    """Dict {number: value} from the response lines of '$$', on top of DEFAULT_SETTINGS."""
+    settings = dict(DEFAULT_SETTINGS)
+    for line in lines:
+        m = _SETTING.match(line.strip())
+        if m:
+            settings[int(m.group(1))] = float(m.group(2))
+    return settings
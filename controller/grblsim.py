@@ -0,0 +1,959 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Simulated grbl 0.9j polar firmware, in-process or behind a pseudo terminal
+
+A stand-in for the plotter, to run the controller and the streaming code
+without hardware. The simulation runs on its own clock and emulates what
+the host can see of the firmware:
+- the serial line at the baud rate, in both directions
+- the 128 byte rx buffer, bytes which don't fit are lost like in serial.c
+- realtime '?', '!', '~' and ctrl-x, picked out of the byte stream
+- the main loop of protocol.c, one line at a time, comments, spaces and
+  line overflow handled the same way, with a fixed time to parse a line
+- the planner queue of BLOCK_BUFFER_SIZE-1 blocks, with moves cut into
+  blocks like the firmware does and the time of every block from the
+  trapezoid profile planned over the blocks queued when it starts
+- buffer syncs for spindle (pen) changes, dwells and program ends
+- 'ok' / 'error: ...' responses, '<...>' status reports with SPos/GPos,
+  '$$', '$#', '$G', '$X', settings, the alarm lock after power up.
+Feed hold stops the machine at once instead of decelerating.
+
+SimulatedSerial looks like a serial.Serial to GrblStreamer, SerialWorker and
+vplotter-stream, GrblPty puts the simulation behind a pseudo terminal for
+any other program. Installed as the vplotter-grblsim console script.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import argparse
+import threading
+from collections import deque
+import numpy as np
+from grblsettings import DEFAULT_SETTINGS, parse_settings
+from grblstatus import (STATUS_OK, STATUS_EXPECTED_COMMAND_LETTER, STATUS_BAD_NUMBER_FORMAT,
+                        STATUS_INVALID_STATEMENT, STATUS_NEGATIVE_VALUE, STATUS_SETTING_DISABLED,
+                        STATUS_SETTING_STEP_PULSE_MIN, STATUS_IDLE_ERROR, STATUS_ALARM_LOCK, STATUS_OVERFLOW,
+                        STATUS_GCODE_UNSUPPORTED_COMMAND, STATUS_GCODE_MODAL_GROUP_VIOLATION,
+                        STATUS_GCODE_UNDEFINED_FEED_RATE, STATUS_GCODE_COMMAND_VALUE_NOT_INTEGER,
+                        STATUS_GCODE_WORD_REPEATED, STATUS_GCODE_VALUE_WORD_MISSING,
+                        STATUS_GCODE_NO_AXIS_WORDS_IN_PLANE, STATUS_GCODE_INVALID_TARGET,
+                        STATUS_GCODE_ARC_RADIUS_ERROR, STATUS_GCODE_NO_OFFSETS_IN_PLANE,
+                        STATUS_GCODE_UNUSED_WORDS, status_message)
+from grblstreamer import RX_BUFFER_SIZE
+from plannersim import PlannerSimulator, BLOCK_BUFFER_SIZE, trapezoid_times
+from polarkinematics import PolarKinematics, MM_PER_LINE_SEGMENT
+
+
+GRBL_VERSION = '0.9j'
+GRBL_VERSION_BUILD = '20151218'
+LINE_BUFFER_SIZE = 80  # protocol.h
+DEFAULT_LINE_TIME = 0.002  # s, for parsing and planning one line on the AVR
+
+# number, kind, description and default (defaults_polar.h) of every setting, in the order of '$$'
+FIRMWARE_SETTINGS = [
+    (0, 'int', 'step pulse, usec', 10), (1, 'int', 'step idle delay, msec', 0),
+    (2, 'mask', 'step port invert mask', 0), (3, 'mask', 'dir port invert mask', 0),
+    (4, 'int', 'step enable invert, bool', 0), (5, 'int', 'limit pins invert, bool', 0),
+    (6, 'int', 'probe pin invert, bool', 0), (10, 'mask', 'status report mask', 3),
+    (11, 'float', 'junction deviation, mm', 0.01), (12, 'float', 'arc tolerance, mm', 0.002),
+    (13, 'int', 'report inches, bool', 0), (20, 'int', 'soft limits, bool', 0),
+    (21, 'int', 'hard limits, bool', 0), (22, 'int', 'homing cycle, bool', 1),
+    (23, 'mask', 'homing dir invert mask', 0), (24, 'float', 'homing feed, mm/min', 25.0),
+    (25, 'float', 'homing seek, mm/min', 5000.0), (26, 'int', 'homing debounce, msec', 250),
+    (27, 'float', 'homing pull-off, mm', 1.0), (28, 'float', 'motor distance, mm', 1133.0),
+    (29, 'float', 'x0, mm', 291.0), (30, 'float', 'y0, mm', 1192.0),
+] + [(base + k, 'float', '%s%s' % (axis, text), default)
+     for base, text, defaults in ((100, ', step/mm', (40.0, 40.0, 250.0)),
+                                  (110, ' max rate, mm/min', (5000.0, 5000.0, 500.0)),
+                                  (120, ' accel, mm/sec^2', (10.0, 10.0, 10.0)),
+                                  (130, ' max travel, mm', (2000.0, 2000.0, 200.0)))
+     for k, (axis, default) in enumerate(zip('xyz', defaults))]
+
+_HELP = ("$$ (view Grbl settings)\r\n$# (view # parameters)\r\n$G (view parser state)\r\n"
+         "$I (view build info)\r\n$N (view startup blocks)\r\n$x=value (save Grbl setting)\r\n"
+         "$Nx=line (save startup block)\r\n$C (check gcode mode)\r\n$X (kill alarm lock)\r\n"
+         "$H (run homing cycle)\r\n~ (cycle start)\r\n! (feed hold)\r\n? (current status)\r\n"
+         "ctrl-x (reset Grbl)\r\n")
+
+_REALTIME = re.compile(rb'[?!~\x18]')
+_WIRE_EVENT = re.compile(rb'[\r\n?!~\x18]')
+_WORD = re.compile(r'([A-Z])([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+))?')
+_SETTING = re.compile(r'^\$([0-9.]+)=(.*)$')
+
+
+class _GcodeError(Exception):
+    """A status code for gc_execute_line to fail with."""
+
+
+class GrblSimulator(object):
+    """grbl 0.9j with the polar kinematics, on a simulated clock (s).
+
+    Write the bytes of the host with receive(), advance the clock with
+    update() and collect the output with read(). Nothing happens between
+    the calls, so the simulation can run faster or slower than real time.
+    """
+
+    def __init__(self, settings=None, baudrate=115200, rx_buffer_size=RX_BUFFER_SIZE,
+                 block_buffer_size=BLOCK_BUFFER_SIZE, line_time=DEFAULT_LINE_TIME, locked=None):
+        """Initialise and power up.
+
+        settings are '$' settings on top of the firmware defaults. locked is
+        the alarm lock after power up, by default like HOMING_INIT_LOCK, i.e.
+        when homing is enabled.
+        """
+        self.settings = {number: default for number, kind, text, default in FIRMWARE_SETTINGS}
+        self.settings.update(DEFAULT_SETTINGS)
+        if settings is not None:
+            self.settings.update(settings)
+        self.byte_time = 10.0 / baudrate  # 8N1
+        self.rx_buffer_size = rx_buffer_size
+        self.block_buffer_size = block_buffer_size
+        self.line_time = line_time
+        self.time = 0.0
+        self.rx_overflows = 0  # bytes lost because the rx buffer was full
+        self.lines_executed = 0
+        self.rx_fill_time = np.zeros(rx_buffer_size)  # time (s) spent with n bytes in the rx buffer
+        self.starved = []  # (start, end) times the planner ran empty without a buffer sync to wait for
+        self._wire = deque()  # [start time, data, bytes arrived], on the way to grbl
+        self._wire_free = 0.0
+        self._output = deque()  # (time of the last byte, data), on the way to the host
+        self._output_free = 0.0
+        self.coord_data = [[0.0, 0.0, 0.0] for k in range(8)]  # G54-G59, G28, G30, 'EEPROM'
+        self.belt = np.zeros(2)  # belt lengths at the start of the current block (mm from the origin)
+        self.z = 0.0
+        self._configure()
+        if locked is None:
+            locked = bool(self.settings[22])
+        self._reset(alarm=locked)
+
+    def _configure(self):
+        """Kinematics and planner from the settings."""
+        self.kinematics = PolarKinematics.from_settings(self.settings)
+        self.planner_sim = PlannerSimulator.from_settings(self.settings, block_buffer_size=self.block_buffer_size)
+        self.steps_per_mm = np.array([self.settings[100], self.settings[101]])
+
+    def _reset(self, alarm=False):
+        """Power up or soft reset: empty buffers, default modal state, welcome message."""
+        self.rx = bytearray()
+        self._line = []
+        self._comment = None
+        self._actions = deque()
+        self._wait_until = None
+        self._busy_until = self.time
+        self.planner = deque()  # (da, db, feed, a end, b end) of the queued blocks, the first is running
+        self._running = False
+        self._hold = None  # time the feed hold started
+        self._speed = 0.0
+        self._starved_since = None
+        self.state = 'Alarm' if alarm else 'Idle'
+        self.motion = 0
+        self.distance = 90
+        self.units = 21
+        self.plane = 17
+        self.coord_select = 0
+        self.spindle = 5
+        self.coolant = 9
+        self.feed = 0.0
+        self.spindle_speed = 0.0
+        self.tool = 0
+        self.coord_system = list(self.coord_data[0])
+        self.coord_offset = [0.0, 0.0, 0.0]
+        # the parser continues from where the machine is
+        x, y = self.kinematics.inverse(self.belt[0], self.belt[1])
+        self.position = [float(x), float(y), self.z]
+        self._steps = np.rint(self.belt * self.steps_per_mm)
+        self._write("\r\nGrbl %s ['$' for help]\r\n" % GRBL_VERSION)
+        if alarm:
+            self._write("['$H'|'$X' to unlock]\r\n")
+
+    # host side
+
+    def receive(self, data):
+        """Bytes written by the host at the current time, they arrive at the baud rate."""
+        if data:
+            start = max(self.time, self._wire_free)
+            self._wire.append([start, bytes(data), 0])
+            self._wire_free = start + len(data) * self.byte_time
+
+    def read(self):
+        """The output which arrived at the host up to the current time."""
+        out = []
+        while self._output and self._output[0][0] <= self.time:
+            out.append(self._output.popleft()[1])
+        return b''.join(out)
+
+    def update(self, now):
+        """Run the simulation up to the time now (s)."""
+        while True:
+            t = self._next_event()
+            if t > now:
+                break
+            self._advance(t)
+            self._step()
+        self._advance(now)
+
+    def _advance(self, t):
+        if t > self.time:
+            self.rx_fill_time[len(self.rx)] += t - self.time
+            self.time = t
+
+    def next_time(self):
+        """Time of the next thing to happen, inside grbl or on the serial line."""
+        t = self._next_event()
+        if self._output:
+            t = min(t, self._output[0][0])
+        return t
+
+    @property
+    def machine_state(self):
+        """State as in the status report, Idle, Run, Hold, Alarm or Check."""
+        if self._hold is not None:
+            return 'Hold'
+        if self.state != 'Idle':
+            return self.state
+        return 'Run' if self._running else 'Idle'
+
+    def status_report(self):
+        """'<...>' status report like report_realtime_status, with the SPos/GPos of the polar firmware."""
+        mask = int(self.settings[10])
+        report = '<' + self.machine_state
+        if mask & 1:
+            a, b = self._belt_now()
+            report += ',SPos:%.3f,%.3f,%.3f' % (a, b, self.z)
+        if mask & 2:
+            report += ',GPos:%.3f,%.3f,%.3f' % tuple(self.position)
+        if mask & 4:
+            report += ',Buf:%i' % len(self.planner)
+        if mask & 8:
+            report += ',RX:%i' % len(self.rx)
+        if mask & 16:
+            report += ',Lim:000'
+        return report + '>'
+
+    # the event loop
+
+    def _next_event(self):
+        times = [np.inf]
+        if self._wire:
+            start, data, pos = self._wire[0]
+            m = _WIRE_EVENT.search(data, pos)
+            end = m.start() + 1 if m else len(data)
+            times.append(start + end * self.byte_time)
+        if self._running and self._hold is None:
+            times.append(self._block_end)
+        if self._wait_until is not None:
+            times.append(self._wait_until)
+        if self._main_ready():
+            times.append(max(self.time, self._busy_until))
+        return min(times)
+
+    def _step(self):
+        self._deliver()
+        if self._running and self._hold is None and self._block_end <= self.time:
+            self._finish_block()
+        if self._busy_until <= self.time:
+            self._main_loop()
+        # auto cycle start, when the main loop ran out of input or waits for the planner
+        if self.planner and not self._running and self._hold is None and (not self.rx or self._main_blocked()):
+            self._start_block(self.time)
+
+    def _deliver(self):
+        """Move the bytes which arrived into the rx buffer, realtime commands are executed right away."""
+        while self._wire:
+            chunk = self._wire[0]
+            start, data, pos = chunk
+            n = min(len(data), int((self.time - start) / self.byte_time + 1e-6))
+            if n > pos:
+                part = data[pos:n]
+                chunk[2] = n
+                if _REALTIME.search(part):
+                    for c in part:
+                        self._serial_byte(c)
+                else:
+                    self._store(part)
+            if chunk[2] < len(data):
+                break
+            self._wire.popleft()
+
+    def _serial_byte(self, c):
+        """The serial rx interrupt of serial.c for one byte."""
+        if c == ord('?'):
+            self._write(self.status_report() + '\r\n')
+        elif c == ord('!'):
+            if self._running and self._hold is None:
+                self._hold = self.time
+        elif c == ord('~'):
+            self._cycle_start()
+        elif c == 0x18:
+            moving = self._running and self._hold is None
+            if moving:
+                self.belt = np.array(self._belt_now())
+                self._write('ALARM: Abort during cycle\r\n')
+            self._reset(alarm=moving or self.state == 'Alarm')
+        else:
+            self._store(bytes((c,)))
+
+    def _store(self, data):
+        room = self.rx_buffer_size - 1 - len(self.rx)
+        if len(data) > room:
+            self.rx_overflows += len(data) - max(room, 0)
+            data = data[:max(room, 0)]
+        self.rx += data
+
+    def _write(self, text):
+        data = text.encode()
+        start = max(self.time, self._output_free)
+        self._output_free = start + len(data) * self.byte_time
+        self._output.append((self._output_free, data))
+
+    # the main loop of protocol.c
+
+    def _main_ready(self):
+        """True if the main loop can go on, as soon as it isn't busy."""
+        if self._actions:
+            kind, arg = self._actions[0]
+            if kind == 'blocks':
+                return len(self.planner) < self.block_buffer_size - 1
+            if kind == 'sync':
+                return not self.planner
+            if kind == 'wait':
+                return self._wait_until is None
+            return True
+        return bool(self.rx)
+
+    def _main_blocked(self):
+        return bool(self._actions) and self._actions[0][0] in ('blocks', 'sync') and not self._main_ready()
+
+    def _main_loop(self):
+        while self._actions:
+            kind, arg = self._actions[0]
+            if kind == 'blocks':
+                while arg and len(self.planner) < self.block_buffer_size - 1:
+                    self.planner.append(arg.popleft())
+                if arg:
+                    return
+            elif kind == 'sync':
+                if self.planner:
+                    return
+            elif kind == 'wait':
+                if self._wait_until is None:
+                    self._wait_until = self.time + arg
+                if self.time < self._wait_until:
+                    return
+                self._wait_until = None
+            elif kind == 'say':
+                self._write(arg)
+            elif kind == 'hold':
+                self._hold = self.time
+            elif kind == 'reset':
+                self._actions.popleft()
+                self._reset(alarm=arg)
+                return
+            self._actions.popleft()
+
+        line = self._read_line()
+        if line is not None:
+            self._busy_until = self.time + self.line_time
+            self._execute_line(line)
+
+    def _read_line(self):
+        """Take characters from the rx buffer until the end of a line, returns the line or None."""
+        line = self._line
+        for k, c in enumerate(self.rx):
+            if c in (10, 13):
+                del self.rx[:k+1]
+                self._line = []
+                self._comment = None
+                return ''.join(line)
+            if self._comment is not None:
+                if c == 41 and self._comment == '(':  # ')'
+                    self._comment = None
+            elif c <= 32 or c == 47:  # whitespace, control characters, block delete
+                pass
+            elif c == 40 or c == 59:  # '(' or ';'
+                self._comment = chr(c)
+            elif len(line) >= LINE_BUFFER_SIZE - 1:
+                self._write(status_message(STATUS_OVERFLOW) + '\r\n')
+                self._comment = None
+                del line[:]
+            else:
+                line.append(chr(c).upper())
+        del self.rx[:]
+        return None
+
+    def _execute_line(self, line):
+        """protocol_execute_line, the response is written after the actions of the line."""
+        self.lines_executed += 1
+        self._reset_after = None  # soft reset after the response, with the alarm lock or not
+        if not line:
+            status = STATUS_OK
+        elif line[0] == '$':
+            status = self._system_command(line)
+        elif self.state == 'Alarm':
+            status = STATUS_ALARM_LOCK
+        else:
+            try:
+                self._actions.extend(self._gcode(line))
+                status = STATUS_OK
+            except _GcodeError as e:
+                status = e.args[0]
+        self._actions.append(('say', status_message(status) + '\r\n'))
+        if self._reset_after is not None:
+            self._actions.append(('reset', self._reset_after))
+
+    # the planner and the steppers
+
+    def _cycle_start(self):
+        if self._hold is not None:
+            if self._running:
+                # the current block continues where it stopped
+                self._block_start += self.time - self._hold
+                self._block_end += self.time - self._hold
+            self._hold = None
+        elif self.planner and not self._running:
+            self._start_block(self.time)
+
+    def _start_block(self, t):
+        blocks = np.array(self.planner)
+        length, v0, v1, vn, accel = self.planner_sim.plan(blocks[:, 0], blocks[:, 1], blocks[:, 2],
+                                                          entry_speed=self._speed)
+        dt = trapezoid_times(length[:1], v0[:1], v1[:1], vn[:1], accel[:1])[0]
+        if self._starved_since is not None:
+            self.starved.append((self._starved_since, t))
+            self._starved_since = None
+        self._block_start = t
+        self._block_end = t + float(dt)
+        self._exit_speed = float(v1[0])
+        self._running = True
+
+    def _finish_block(self):
+        block = self.planner.popleft()
+        self.belt = np.array(block[3:5])
+        self._speed = self._exit_speed
+        if self.planner:
+            self._start_block(self._block_end)
+        else:
+            self._running = False
+            self._speed = 0.0
+            if not self._actions or self._actions[0][0] not in ('sync', 'wait', 'hold'):
+                self._starved_since = self._block_end
+
+    def _belt_now(self):
+        if not self._running:
+            return float(self.belt[0]), float(self.belt[1])
+        t = self.time if self._hold is None else self._hold
+        duration = self._block_end - self._block_start
+        f = min(max((t - self._block_start) / duration, 0.0), 1.0) if duration > 0 else 1.0
+        block = self.planner[0]
+        return (float(self.belt[0] + f*(block[3] - self.belt[0])),
+                float(self.belt[1] + f*(block[4] - self.belt[1])))
+
+    def _move(self, target, motion, i=0.0, j=0.0):
+        """Planner blocks of a move from the parser position to target, like mc_line/mc_arc."""
+        x0, y0 = self.position[:2]
+        if motion == 0 or (motion == 1 and math.hypot(target[0] - x0, target[1] - y0) < 2*MM_PER_LINE_SEGMENT):
+            # a single block, most lines of a drawing, without the overhead of the toolpath functions
+            a, b = self.kinematics.forward(target[0], target[1])
+            sa = np.array([round(float(a) * self.steps_per_mm[0])])
+            sb = np.array([round(float(b) * self.steps_per_mm[1])])
+        else:
+            xs, ys, source = self.kinematics.firmware_segments(
+                np.array([target[0]]), np.array([target[1]]), np.array([motion]), start=(x0, y0),
+                i=np.array([i]), j=np.array([j]), arc_tolerance=self.settings[12])
+            a, b = self.kinematics.forward(xs, ys)
+            sa = np.rint(a * self.steps_per_mm[0])
+            sb = np.rint(b * self.steps_per_mm[1])
+        da = np.diff(np.concatenate(([self._steps[0]], sa))) / self.steps_per_mm[0]
+        db = np.diff(np.concatenate(([self._steps[1]], sb))) / self.steps_per_mm[1]
+        self._steps = np.array([sa[-1], sb[-1]])
+        feed = -1.0 if motion == 0 else self.feed
+        keep = (da != 0) | (db != 0)
+        blocks = deque((da[k], db[k], feed, sa[k] / self.steps_per_mm[0], sb[k] / self.steps_per_mm[1])
+                       for k in np.flatnonzero(keep).tolist())
+        self.position = list(target)
+        if self.state == 'Check' or not blocks:
+            return []
+        return [('blocks', blocks)]
+
+    # gcode.c
+
+    def _gcode(self, line):
+        """Execute a g-code line like gc_execute_line, returns the actions for the main loop."""
+        words = []
+        pos = 0
+        while pos < len(line):
+            m = _WORD.match(line, pos)
+            if m is None:
+                raise _GcodeError(STATUS_EXPECTED_COMMAND_LETTER)
+            if m.group(2) is None:
+                raise _GcodeError(STATUS_BAD_NUMBER_FORMAT)
+            words.append((m.group(1), float(m.group(2))))
+            pos = m.end()
+
+        groups = set()
+
+        def modal_group(group):
+            if group in groups:
+                raise _GcodeError(STATUS_GCODE_MODAL_GROUP_VIOLATION)
+            groups.add(group)
+
+        motion = self.motion
+        non_modal = None
+        plane, units, distance, coord_select = self.plane, self.units, self.distance, self.coord_select
+        spindle, coolant, program = self.spindle, self.coolant, None
+        values = {}
+        for letter, value in words:
+            if letter in 'GM':
+                code = int(value)
+                mantissa = int(round(100*(value - code)))
+                if mantissa and not (letter == 'G' and code in (28, 30, 92) and mantissa == 10):
+                    raise _GcodeError(STATUS_GCODE_COMMAND_VALUE_NOT_INTEGER)
+                if letter == 'G':
+                    if code in (0, 1, 2, 3, 80):
+                        modal_group('motion')
+                        motion = code
+                    elif code in (4, 10, 28, 30, 53, 92):
+                        modal_group('non modal')
+                        non_modal = value
+                    elif code in (17, 18, 19):
+                        modal_group('plane')
+                        plane = code
+                    elif code in (20, 21):
+                        modal_group('units')
+                        units = code
+                    elif code in (90, 91):
+                        modal_group('distance')
+                        distance = code
+                    elif 54 <= code <= 59:
+                        modal_group('coordinate system')
+                        coord_select = code - 54
+                    elif code in (40, 49, 94):
+                        pass
+                    else:
+                        raise _GcodeError(STATUS_GCODE_UNSUPPORTED_COMMAND)
+                else:
+                    if code in (0, 1, 2, 30):
+                        modal_group('program flow')
+                        program = code
+                    elif code in (3, 4, 5):
+                        modal_group('spindle')
+                        spindle = code
+                    elif code in (8, 9):
+                        modal_group('coolant')
+                        coolant = code
+                    else:
+                        raise _GcodeError(STATUS_GCODE_UNSUPPORTED_COMMAND)
+            elif letter in 'FIJKLNPRSTXYZ':
+                if letter in values:
+                    raise _GcodeError(STATUS_GCODE_WORD_REPEATED)
+                if letter in 'FNPST' and value < 0:
+                    raise _GcodeError(STATUS_NEGATIVE_VALUE)
+                values[letter] = value
+            else:
+                raise _GcodeError(STATUS_GCODE_UNSUPPORTED_COMMAND)
+
+        scale = 25.4 if units == 20 else 1.0
+        axes = [k for k, letter in enumerate('XYZ') if letter in values]
+        axis_values = [values.get(letter, 0.0) * scale for letter in 'XYZ']
+        non_modal_axes = non_modal in (10, 28, 30, 92, 28.1, 30.1, 92.1)
+        arc = motion in (2, 3) and axes and not non_modal_axes
+        used = set('NXYZFST')
+        if arc:
+            used |= set('IJKR')
+        if non_modal in (4, 10):
+            used.add('P')
+        if non_modal == 10:
+            used.add('L')
+        if set(values) - used:
+            raise _GcodeError(STATUS_GCODE_UNUSED_WORDS)
+        if non_modal == 4 and 'P' not in values:
+            raise _GcodeError(STATUS_GCODE_VALUE_WORD_MISSING)
+        if non_modal == 10 and ('L' not in values or 'P' not in values or values['L'] not in (2, 20)):
+            raise _GcodeError(STATUS_GCODE_VALUE_WORD_MISSING)
+        if motion in (1, 2, 3) and axes and not non_modal_axes and values.get('F', self.feed) <= 0:
+            raise _GcodeError(STATUS_GCODE_UNDEFINED_FEED_RATE)
+
+        actions = []
+        if 'F' in values:
+            self.feed = values['F'] * scale
+        speed = values.get('S', self.spindle_speed)
+        if spindle != self.spindle or (speed != self.spindle_speed and spindle != 5):
+            actions.append(('sync', None))
+        self.spindle_speed = speed
+        self.spindle = spindle
+        if 'T' in values:
+            self.tool = int(values['T'])
+        if coolant != self.coolant:
+            actions.append(('sync', None))
+            self.coolant = coolant
+        if non_modal == 4:
+            actions += [('sync', None), ('wait', values['P'])]
+        self.plane, self.units, self.distance = plane, units, distance
+        if coord_select != self.coord_select:
+            self.coord_select = coord_select
+            self.coord_system = list(self.coord_data[coord_select])
+
+        if non_modal == 10:
+            index = int(values['P']) - 1 if values['P'] else self.coord_select
+            data = self.coord_data[index]
+            for k in axes:
+                if values['L'] == 20:
+                    data[k] = self.position[k] - self.coord_offset[k] - axis_values[k]
+                else:
+                    data[k] = axis_values[k]
+            if index == self.coord_select:
+                self.coord_system = list(data)
+        elif non_modal == 92:
+            for k in axes:
+                self.coord_offset[k] = self.position[k] - self.coord_system[k] - axis_values[k]
+        elif non_modal == 92.1:
+            self.coord_offset = [0.0, 0.0, 0.0]
+        elif non_modal in (28.1, 30.1):
+            self.coord_data[6 if non_modal == 28.1 else 7] = list(self.position)
+        elif non_modal in (28, 30):
+            if axes:
+                actions += self._move(self._target(axes, axis_values, distance), 0)
+            stored = self.coord_data[6 if non_modal == 28 else 7]
+            actions += self._move([stored[0], stored[1], self.position[2]], 0)
+        else:
+            self.motion = motion
+            if axes and motion in (0, 1):
+                target = self._target(axes, axis_values, distance, machine=non_modal == 53)
+                actions += self._move(target, motion)
+            elif axes and motion in (2, 3):
+                target = self._target(axes, axis_values, distance, machine=non_modal == 53)
+                i, j = self._arc_offsets(target, motion, values, scale, axes)
+                actions += self._move(target, motion, i, j)
+
+        if program is not None:
+            actions.append(('sync', None))
+            if program in (0, 1):
+                actions.append(('hold', None))
+            else:
+                self.motion = 1
+                self.plane = 17
+                self.distance = 90
+                self.coord_select = 0
+                self.coord_system = list(self.coord_data[0])
+                self.spindle = 5
+                self.coolant = 9
+                actions.append(('say', '[Pgm End]\r\n'))
+        return actions
+
+    def _target(self, axes, axis_values, distance, machine=False):
+        target = list(self.position)
+        for k in axes:
+            if machine:
+                target[k] = axis_values[k]
+            elif distance == 91:
+                target[k] = self.position[k] + axis_values[k]
+            else:
+                target[k] = axis_values[k] + self.coord_system[k] + self.coord_offset[k]
+        return target
+
+    def _arc_offsets(self, target, motion, values, scale, axes):
+        """Centre offsets I, J of an arc in the XY plane, with the radius checks of gcode.c."""
+        if 0 not in axes and 1 not in axes:
+            raise _GcodeError(STATUS_GCODE_NO_AXIS_WORDS_IN_PLANE)
+        x = target[0] - self.position[0]
+        y = target[1] - self.position[1]
+        if 'R' in values:
+            r = values['R'] * scale
+            if x == 0 and y == 0:
+                raise _GcodeError(STATUS_GCODE_INVALID_TARGET)
+            h_x2_div_d = 4.0*r*r - x*x - y*y
+            if h_x2_div_d < 0:
+                raise _GcodeError(STATUS_GCODE_ARC_RADIUS_ERROR)
+            h_x2_div_d = -np.sqrt(h_x2_div_d) / np.hypot(x, y)
+            if motion == 3:
+                h_x2_div_d = -h_x2_div_d
+            if r < 0:
+                h_x2_div_d = -h_x2_div_d
+            return 0.5*(x - y*h_x2_div_d), 0.5*(y + x*h_x2_div_d)
+        if 'I' not in values and 'J' not in values:
+            raise _GcodeError(STATUS_GCODE_NO_OFFSETS_IN_PLANE)
+        i = values.get('I', 0.0) * scale
+        j = values.get('J', 0.0) * scale
+        r = np.hypot(i, j)
+        delta_r = abs(np.hypot(x - i, y - j) - r)
+        if delta_r > 0.005 and (delta_r > 0.5 or delta_r > 0.001*r):
+            raise _GcodeError(STATUS_GCODE_ARC_RADIUS_ERROR)
+        return i, j
+
+    # system.c
+
+    def _system_command(self, line):
+        """'$' commands like system_execute_line, returns the status code."""
+        state = self.machine_state
+        c = line[1:2]
+        if not c:
+            self._write(_HELP)
+        elif c in '$GCX':
+            if len(line) != 2:
+                return STATUS_INVALID_STATEMENT
+            if c == '$':
+                if state in ('Run', 'Hold'):
+                    return STATUS_IDLE_ERROR
+                self._write(self._settings_report())
+            elif c == 'G':
+                self._write(self._modes_report())
+            elif c == 'C':
+                if self.state == 'Check':
+                    self._write('[Disabled]\r\n')
+                    self._reset_after = False
+                else:
+                    if state != 'Idle':
+                        return STATUS_IDLE_ERROR
+                    self.state = 'Check'
+                    self._write('[Enabled]\r\n')
+            elif self.state == 'Alarm':
+                self._write('[Caution: Unlocked]\r\n')
+                self.state = 'Idle'
+        else:
+            if state not in ('Idle', 'Alarm'):
+                return STATUS_IDLE_ERROR
+            if line == '$#':
+                self._write(self._ngc_report())
+            elif c == '#':
+                return STATUS_INVALID_STATEMENT
+            elif c == 'H':
+                if not self.settings[22]:
+                    return STATUS_SETTING_DISABLED
+                # homed at the origin
+                self.belt = np.zeros(2)
+                self._steps = np.zeros(2)
+                self.position = [0.0, 0.0, self.position[2]]
+                self.state = 'Idle'
+            elif c == 'I':
+                self._write('[%s.%s:]\r\n' % (GRBL_VERSION, GRBL_VERSION_BUILD))
+            elif c == 'N' and len(line) == 2:
+                self._write('$N0=\r\n$N1=\r\n')
+            elif c == 'N':
+                if state != 'Idle':
+                    return STATUS_IDLE_ERROR
+            elif c == 'R':
+                if line not in ('$RST=$', '$RST=#', '$RST=*'):
+                    return STATUS_INVALID_STATEMENT
+                if line[-1] in '$*':
+                    self.settings = {number: default for number, kind, text, default in FIRMWARE_SETTINGS}
+                    self._configure()
+                if line[-1] in '#*':
+                    self.coord_data = [[0.0, 0.0, 0.0] for k in range(8)]
+                self._write('[Restoring defaults]\r\n')
+                self._reset_after = bool(self.settings[22])
+            else:
+                return self._store_setting(line)
+        return STATUS_OK
+
+    def _store_setting(self, line):
+        m = _SETTING.match(line)
+        if m is None:
+            return STATUS_INVALID_STATEMENT
+        try:
+            number = float(m.group(1))
+            value = float(m.group(2))
+        except ValueError:
+            return STATUS_BAD_NUMBER_FORMAT
+        if number != int(number) or int(number) not in self.settings:
+            return STATUS_INVALID_STATEMENT
+        if value < 0:
+            return STATUS_NEGATIVE_VALUE
+        if number == 0 and value < 3:
+            return STATUS_SETTING_STEP_PULSE_MIN
+        self.settings[int(number)] = value
+        self._configure()
+        return STATUS_OK
+
+    def _settings_report(self):
+        lines = []
+        for number, kind, text, default in FIRMWARE_SETTINGS:
+            value = self.settings[number]
+            if kind == 'float':
+                lines.append('$%i=%.3f (%s)' % (number, value, text))
+            elif kind == 'mask':
+                lines.append('$%i=%i (%s:%s)' % (number, value, text, format(int(value), '08b')))
+            else:
+                lines.append('$%i=%i (%s)' % (number, value, text))
+        return '\r\n'.join(lines) + '\r\n'
+
+    def _ngc_report(self):
+        names = ['G54', 'G55', 'G56', 'G57', 'G58', 'G59', 'G28', 'G30']
+        lines = ['[%s:%.3f,%.3f,%.3f]' % ((name,) + tuple(data)) for name, data in zip(names, self.coord_data)]
+        lines.append('[G92:%.3f,%.3f,%.3f]' % tuple(self.coord_offset))
+        lines.append('[TLO:0.000]')
+        lines.append('[PRB:0.000,0.000,0.000:0]')
+        return '\r\n'.join(lines) + '\r\n'
+
+    def _modes_report(self):
+        return '[G%i G%i G%i G%i G%i G94 M0 M%i M%i T%i F%i. S%i.]\r\n' % (
+            self.motion, self.coord_select + 54, self.plane, self.units, self.distance,
+            self.spindle, self.coolant, self.tool, round(self.feed), round(self.spindle_speed))
+
+
+class SimulatedSerial(object):
+    """A GrblSimulator behind the part of the serial.Serial interface the streaming code uses.
+
+    The simulation runs in real time times time_scale, in the calls of the
+    caller's thread.
+    """
+
+    def __init__(self, simulator=None, timeout=None, time_scale=1.0, **kwargs):
+        """Initialise with a simulator, or create one with the keyword arguments."""
+        self.simulator = GrblSimulator(**kwargs) if simulator is None else simulator
+        self.timeout = timeout
+        self.time_scale = time_scale
+        self.port = 'simulated grbl'
+        self.is_open = True
+        self._t0 = time.monotonic()
+        self._sim_t0 = self.simulator.time
+        self._input = bytearray()
+
+    def _now(self):
+        return self._sim_t0 + (time.monotonic() - self._t0) * self.time_scale
+
+    def _update(self):
+        self.simulator.update(self._now())
+        self._input += self.simulator.read()
+
+    def _wait(self, done):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        self._update()
+        while not done():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            delay = (self.simulator.next_time() - self._now()) / self.time_scale
+            delay = min(max(delay, 1e-4), 0.05 if remaining is None else remaining)
+            time.sleep(delay)
+            self._update()
+
+    def write(self, data):
+        """Send bytes to grbl."""
+        self._update()
+        self.simulator.receive(data)
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        """Number of bytes from grbl ready to be read."""
+        self._update()
+        return len(self._input)
+
+    def read(self, size=1):
+        """Read up to size bytes, less if the timeout runs out."""
+        self._wait(lambda: len(self._input) >= size)
+        data = bytes(self._input[:size])
+        del self._input[:size]
+        return data
+
+    def readline(self):
+        """Read up to and including '\\n', or what arrived until the timeout."""
+        self._wait(lambda: b'\n' in self._input)
+        end = self._input.find(b'\n') + 1 or len(self._input)
+        data = bytes(self._input[:end])
+        del self._input[:end]
+        return data
+
+    def reset_input_buffer(self):
+        self._update()
+        del self._input[:]
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class GrblPty(threading.Thread):
+    """A GrblSimulator behind a pseudo terminal, open port like a serial device. POSIX only."""
+
+    def __init__(self, simulator=None, time_scale=1.0, **kwargs):
+        """Initialise with a simulator, or create one with the keyword arguments, start() to run it."""
+        import pty
+        import tty
+        super(GrblPty, self).__init__()
+        self.daemon = True
+        self.simulator = GrblSimulator(**kwargs) if simulator is None else simulator
+        self.time_scale = time_scale
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+
+    def run(self):
+        """Thread main loop."""
+        import select
+        sim = self.simulator
+        t0 = time.monotonic()
+        sim_t0 = sim.time
+        while self._running:
+            delay = (sim.next_time() - sim_t0) / self.time_scale - (time.monotonic() - t0)
+            readable, _, _ = select.select([self._master], [], [], min(max(delay, 0.0), 0.05))
+            sim.update(sim_t0 + (time.monotonic() - t0) * self.time_scale)
+            if readable:
+                sim.receive(os.read(self._master, 4096))
+            output = sim.read()
+            if output:
+                os.write(self._master, output)
+
+    def stop(self):
+        """Stop the thread and close the pseudo terminal."""
+        self._running = False
+        if self.is_alive():
+            self.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Simulated grbl on a pseudo terminal.')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200,
+            help='simulated serial baud rate (default: %(default)s)')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+            help='simulated seconds per real second (default: %(default)s)')
+    parser.add_argument('--rx-buffer-size', type=int, default=RX_BUFFER_SIZE,
+            help='serial rx buffer size, RX_BUFFER_SIZE in serial.h (default: %(default)s)')
+    parser.add_argument('--block-buffer-size', type=int, default=BLOCK_BUFFER_SIZE,
+            help='planner buffer size, 16 with USE_LINE_NUMBERS (default: %(default)s)')
+    parser.add_argument('--line-time', type=float, default=DEFAULT_LINE_TIME,
+            help='time (s) to parse and plan one line (default: %(default)s)')
+    parser.add_argument('--settings', type=argparse.FileType('r'),
+            help="file with the output of grbl's '$$' (default: polar defaults)")
+    parser.add_argument('--unlocked', action='store_true', default=False,
+            help='start without the alarm lock')
+    args = parser.parse_args(argv)
+
+    settings = None
+    if args.settings is not None:
+        with args.settings as f:
+            settings = parse_settings(f)
+    grbl = GrblPty(settings=settings, baudrate=args.baudrate, rx_buffer_size=args.rx_buffer_size,
+                   block_buffer_size=args.block_buffer_size, line_time=args.line_time,
+                   locked=False if args.unlocked else None, time_scale=args.time_scale)
+    grbl.start()
+    print('simulated grbl on %s, ctrl-c to quit' % grbl.port)
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grbl.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Realtime status reports of the polar v-plotter firmware
+
+grbl answers the realtime '?' with a report like
+    <Run,SPos:12.300,-4.050,0.000,GPos:10.000,5.000,0.000,Buf:15,RX:42>
+The fields present depend on $10. SPos are the belt length changes of the
+steppers right now, GPos the position the g-code parser has reached, which
+runs ahead of the head by the planner buffer.
+
+Every line is acknowledged with 'ok' or 'error: <text>', the status codes
+of report.h are here as well, for the host and the simulator.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+
+
+STATES = ('Idle', 'Run', 'Hold', 'Home', 'Alarm', 'Check', 'Door')  # report_realtime_status
+
+# status codes of report.h, with the texts of report_status_message
+STATUS_OK = 0
+STATUS_EXPECTED_COMMAND_LETTER = 1
+STATUS_BAD_NUMBER_FORMAT = 2
+STATUS_INVALID_STATEMENT = 3
+STATUS_NEGATIVE_VALUE = 4
+STATUS_SETTING_DISABLED = 5
+STATUS_SETTING_STEP_PULSE_MIN = 6
+STATUS_IDLE_ERROR = 8
+STATUS_ALARM_LOCK = 9
+STATUS_OVERFLOW = 11
+STATUS_GCODE_UNSUPPORTED_COMMAND = 20
+STATUS_GCODE_MODAL_GROUP_VIOLATION = 21
+STATUS_GCODE_UNDEFINED_FEED_RATE = 22
+STATUS_GCODE_COMMAND_VALUE_NOT_INTEGER = 23
+STATUS_GCODE_WORD_REPEATED = 25
+STATUS_GCODE_VALUE_WORD_MISSING = 28
+STATUS_GCODE_NO_AXIS_WORDS_IN_PLANE = 32
+STATUS_GCODE_INVALID_TARGET = 33
+STATUS_GCODE_ARC_RADIUS_ERROR = 34
+STATUS_GCODE_NO_OFFSETS_IN_PLANE = 35
+STATUS_GCODE_UNUSED_WORDS = 36
+
+_STATUS_TEXT = {
+    1: 'Expected command letter', 2: 'Bad number format', 3: 'Invalid statement', 4: 'Value < 0',
+    5: 'Setting disabled', 6: 'Value < 3 usec', 7: 'EEPROM read fail. Using defaults', 8: 'Not idle',
+    9: 'Alarm lock', 10: 'Homing not enabled', 11: 'Line overflow',
+    20: 'Unsupported command', 21: 'Modal group violation', 22: 'Undefined feed rate',
+}
+
+_STATUS_CODE = {text: code for code, text in _STATUS_TEXT.items()}
+_ERROR_CODE = re.compile(r'^error: ?(?:Invalid gcode ID:)?([0-9]+)')
+
+
+def status_message(code):
+    """Response line of grbl for a status code, like report_status_message."""
+    if code == STATUS_OK:
+        return 'ok'
+    return 'error: ' + _STATUS_TEXT.get(code, 'Invalid gcode ID:%i' % code)
+
+
+def status_code(response):
+    """Status code of an 'ok' / 'error: ...' response, the inverse of status_message, None if unknown."""
+    if response.startswith('ok'):
+        return STATUS_OK
+    m = _ERROR_CODE.match(response)
+    if m is not None:
+        return int(m.group(1))
+    return _STATUS_CODE.get(response[6:].strip())
+
+
+# a field starts at a separator followed by 'Name:', the values contain commas too
+_FIELD_START = re.compile(r',(?=[A-Za-z]+:)')
+
+
+def _floats(text):
+    return tuple(float(v) for v in text.split(','))
+
+
+class MachineStatus(object):
+    """One status report.
+
+    state is one of STATES. The optional fields are None when $10 leaves
+    them out: spos (a, b, z) belt lengths, gpos (x, y, z) g-code position,
+    buf planner blocks, rx bytes in the serial rx buffer, line the line
+    number of USE_LINE_NUMBERS, feed the rate of REPORT_REALTIME_RATE and
+    limits the limit pin bits.
+    """
+
+    def __init__(self, state, spos=None, gpos=None, buf=None, rx=None, line=None, feed=None, limits=None, report=''):
+        """Initialise."""
+        self.state = state
+        self.spos = spos
+        self.gpos = gpos
+        self.buf = buf
+        self.rx = rx
+        self.line = line
+        self.feed = feed
+        self.limits = limits
+        self.report = report
+
+    @property
+    def idle(self):
+        """True if grbl has nothing left to move."""
+        return self.state == 'Idle'
+
+    def __repr__(self):
+        return 'MachineStatus(%r)' % self.report
+
+
+def parse_status(report):
+    """MachineStatus of a '<...>' report, None if it isn't one or is garbled."""
+    report = report.strip()
+    if not (report.startswith('<') and report.endswith('>')):
+        return None
+    parts = _FIELD_START.split(report[1:-1])
+    state = parts[0]
+    if state not in STATES:
+        return None
+    status = MachineStatus(state, report=report)
+    try:
+        for part in parts[1:]:
+            name, value = part.split(':', 1)
+            if name == 'SPos':
+                status.spos = _floats(value)
+            elif name == 'GPos':
+                status.gpos = _floats(value)
+            elif name == 'Buf':
+                status.buf = int(value)
+            elif name == 'RX':
+                status.rx = int(value)
+            elif name == 'Ln':
+                status.line = int(value)
+            elif name == 'F':
+                status.feed = float(value)
+            elif name == 'Lim':
+                status.limits = value
+    except ValueError:
+        return None
+    return status
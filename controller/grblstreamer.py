@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Character counting g-code streamer for grbl, without any Qt dependency
+
+The streamer keeps track of the number of characters in grbl's serial
+receive buffer, so grbl can fetch the next line directly from its buffer
+instead of waiting for the host after every 'ok'. The bytes in flight are
+kept as a running total together with a deque of the line lengths, so the
+bookkeeping per line and per acknowledge is O(1).
+
+Status reports are picked out of the responses and parsed, and can be
+requested with the realtime '?' every status_interval seconds while
+streaming. '?' never goes into grbl's rx buffer, so it costs no buffer space.
+
+version history:
+2026-10-18: created this
+"""
+
+import time
+from collections import deque
+from grblstatus import parse_status
+
+
+RX_BUFFER_SIZE = 128  # see RX_BUFFER_SIZE in firmware/grbl/serial.h
+GRBL_HWID = '2341:0043'  # USB vendor:product of the Arduino Uno running grbl
+DRAIN_TIMEOUT = 60.0  # s without an acknowledge before a stopped stream gives up on the lines in flight
+
+
+def grbl_ports():
+    """Serial ports with a grbl controller attached, found by their USB hwid."""
+    from serial.tools.list_ports import comports
+    return [port for port, desc, hwid in sorted(comports()) if GRBL_HWID in hwid]
+
+
+def is_ack(response):
+    """True for the 'ok' / 'error:...' responses that acknowledge one line."""
+    return response.startswith('ok') or response.startswith('error')
+
+
+class GrblStreamer(object):
+    """Stream g-code lines to grbl with the character counting protocol.
+
+    ser can be anything with write(bytes), readline() and in_waiting, like a
+    serial.Serial. The optional callbacks are called from the streaming thread:
+        on_send(n, line)          line n has been written
+        on_ack(n, response)       line n has been acknowledged with ok/error
+        on_status(status)         a '<...>' status report arrived, as MachineStatus
+        on_message(text)          any other output of grbl
+        on_idle()                 called while waiting for grbl to make room
+    Set telemetry to a StreamTelemetry to record the timing of every line,
+    checkpoint to a StreamCheckpoint to save the progress for a resume.
+    status is the last MachineStatus received.
+    """
+
+    def __init__(self, ser, rx_buffer_size=RX_BUFFER_SIZE):
+        """Initialise."""
+        self.ser = ser
+        self.rx_buffer_size = rx_buffer_size
+        self.on_send = None
+        self.on_ack = None
+        self.on_status = None
+        self.on_message = None
+        self.on_idle = None
+        self.telemetry = None
+        self.checkpoint = None
+        self.status = None
+        self.status_interval = None  # s between '?' requests while streaming, None for none
+        self._status_requested = 0.0
+        self.running = False
+        self._drain = True
+        self._partial = b''
+        self.reset()
+
+    def reset(self):
+        """Forget all lines in flight and zero the counters."""
+        self.in_flight = deque()  # lengths of the lines sent, but not acknowledged yet
+        self.buffered = 0  # sum(self.in_flight), bytes in grbl's rx buffer
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.peak_buffered = 0
+        self.buffered_sum = 0  # sum of self.buffered after each send, for the mean occupancy
+
+    def readline(self):
+        """Read one response line, '' if nothing complete arrived before the port timeout."""
+        data = self.ser.readline()
+        if not data.endswith(b'\n'):
+            self._partial += data
+            return ''
+        if self._partial:
+            data = self._partial + data
+            self._partial = b''
+        return data.decode(errors='replace').strip()
+
+    def dispatch(self, response):
+        """Book keeping for one line read from grbl, returns True for acknowledges."""
+        if not response:
+            return False
+        if response.startswith('<'):
+            status = parse_status(response)
+            if status is None:
+                if self.on_message is not None:
+                    self.on_message(response)
+                return False
+            self.status = status
+            if self.telemetry is not None:
+                self.telemetry.on_status(status)
+            if self.on_status is not None:
+                self.on_status(status)
+            return False
+        if not is_ack(response) or not self.in_flight:
+            if self.on_message is not None:
+                self.on_message(response)
+            return False
+        self.buffered -= self.in_flight.popleft()
+        self.acked += 1
+        if response.startswith('error'):
+            self.errors += 1
+        if self.telemetry is not None:
+            self.telemetry.on_ack(self.acked - 1, response)
+        if self.checkpoint is not None:
+            self.checkpoint.on_ack(self.acked - 1, response)
+        if self.on_ack is not None:
+            self.on_ack(self.acked - 1, response)
+        return True
+
+    def request_status(self):
+        """Send '?' if the last one is status_interval ago."""
+        if self.status_interval is None:
+            return
+        now = time.time()
+        if now - self._status_requested >= self.status_interval:
+            self._status_requested = now
+            self.ser.write(b'?')
+
+    def poll(self):
+        """Read and dispatch one line from grbl, returns True for an acknowledge."""
+        self.request_status()
+        return self.dispatch(self.readline())
+
+    def send_line(self, line):
+        """Send one line as soon as it fits into grbl's rx buffer, returns False if stopped."""
+        block = line.strip()
+        length = len(block) + 1  # +1 for the '\n'
+        # grbl's ring buffer holds rx_buffer_size-1 characters, keep one more spare
+        while self.in_flight and self.buffered + length >= self.rx_buffer_size - 1:
+            if not self.running:
+                return False
+            if self.on_idle is not None:
+                self.on_idle()
+            self.poll()
+        while self.ser.in_waiting:
+            self.poll()
+        self.request_status()
+        self.ser.write(('%s\n' % block).encode())
+        self.in_flight.append(length)
+        self.buffered += length
+        self.bytes_sent += length
+        self.buffered_sum += self.buffered
+        self.peak_buffered = max(self.peak_buffered, self.buffered)
+        if self.telemetry is not None:
+            self.telemetry.on_send(self.sent, length, self.buffered)
+        if self.on_send is not None:
+            self.on_send(self.sent, block)
+        self.sent += 1
+        return True
+
+    def stream(self, lines, wait=True, settings_mode=False):
+        """Stream a file, list or any iterator of lines.
+
+        With wait=True, return after grbl acknowledged every line sent.
+        settings_mode waits for every single acknowledge before sending the next
+        line (call-response), which is needed for $ settings since grbl's EEPROM
+        writes shut off the serial interrupt.
+        Returns the number of lines acknowledged.
+        """
+        self.running = True
+        self._drain = True
+        for line in lines:
+            if not self.running or not self.send_line(line):
+                break
+            if settings_mode:
+                self.wait()
+        if wait:
+            self.wait()
+        self.running = False
+        return self.acked
+
+    def wait(self):
+        """Wait for the acknowledges of all lines in flight.
+
+        grbl executes the lines in its rx buffer after a stop() too, so
+        their acknowledges are still counted, unless stopped without drain
+        or none arrives for DRAIN_TIMEOUT seconds.
+        """
+        t_ack = time.time()
+        while self.in_flight:
+            if not self.running and (not self._drain or time.time() - t_ack > DRAIN_TIMEOUT):
+                break
+            if self.on_idle is not None:
+                self.on_idle()
+            if self.poll():
+                t_ack = time.time()
+
+    def stop(self, drain=True):
+        """Stop sending, can be called from another thread.
+
+        With drain, stream() still waits for the acknowledges of the lines
+        in flight, without it returns at once.
+        """
+        self._drain = drain
+        self.running = False
+
+    @property
+    def mean_buffered(self):
+        """Mean number of bytes in grbl's rx buffer right after sending a line."""
+        return self.buffered_sum / self.sent if self.sent else 0.0
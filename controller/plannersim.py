@@ -0,0 +1,181 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Host side simulation of the grbl motion planner, for job time estimates
+
+The toolpath is cut into planner blocks like the firmware does (segmented
+lines, arcs), transformed to belt space and planned like planner.c plans
+them: junction speeds from the junction deviation, nominal rates and
+accelerations limited per axis, and trapezoidal velocity profiles. The
+planner only looks ahead BLOCK_BUFFER_SIZE-1 blocks and plans the last
+buffered block to a stop, which limits the speed on short segments. Every
+spindle (pen) change empties the planner buffer, so the machine stops there.
+
+Instead of replanning the buffer for every new block, the entry speed of
+every block is capped by the stopping distance within its lookahead window,
+and the backward and forward passes of the planner are done on the whole
+toolpath at once as running minima. This gives the same profiles as the
+firmware as long as the host keeps the buffers full.
+
+version history:
+2026-10-18: created this
+"""
+
+import numpy as np
+from grblsettings import DEFAULT_SETTINGS
+from polarkinematics import PolarKinematics
+
+
+BLOCK_BUFFER_SIZE = 18  # planner.h, 16 with USE_LINE_NUMBERS
+MINIMUM_JUNCTION_SPEED = 0.0  # config.h, mm/min
+
+
+def sync_points(toolpath):
+    """True for the moves in front of which the firmware empties the planner buffer.
+
+    That is where the spindle state or speed changes, see spindle_run.
+    """
+    spindle = np.asarray(toolpath['spindle'])
+    s = np.asarray(toolpath['s'])
+    sync = np.zeros(len(spindle), bool)
+    sync[1:] = (spindle[1:] != spindle[:-1]) | ((s[1:] != s[:-1]) & (spindle[1:] != 0))
+    if len(sync):
+        sync[0] = spindle[0] != 0
+    return sync
+
+
+def trapezoid_times(length, v0, v1, vn, accel):
+    """Duration (s) of blocks with length, entry, exit and nominal speed (mm/s) and acceleration (mm/s^2).
+
+    The speeds must be reachable, as after the planner passes.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_acc = (vn*vn - v0*v0) / (2*accel)
+        d_dec = (vn*vn - v1*v1) / (2*accel)
+        cruise = d_acc + d_dec <= length
+        # triangle profile, the nominal speed is not reached
+        vp = np.where(cruise, vn, np.sqrt(np.maximum(accel*length + 0.5*(v0*v0 + v1*v1), 0)))
+        t = (vp - v0)/accel + (vp - v1)/accel
+        t = np.where(cruise, t + (length - d_acc - d_dec)/vn, t)
+    return np.where(length > 0, np.nan_to_num(t), 0.0)
+
+
+class PlannerSimulator(object):
+    """Trapezoidal motion planner of the firmware, on whole toolpaths."""
+
+    def __init__(self, kinematics=None, junction_deviation=DEFAULT_SETTINGS[11],
+                 arc_tolerance=DEFAULT_SETTINGS[12], steps_per_mm=(DEFAULT_SETTINGS[100], DEFAULT_SETTINGS[101]),
+                 block_buffer_size=BLOCK_BUFFER_SIZE, baudrate=115200, sync_time=0.0):
+        """Initialise.
+
+        sync_time is added for every stop of the planner at a spindle change,
+        e.g. for the pen servo. Lines can't be executed faster than they are
+        transmitted at baudrate.
+        """
+        self.kinematics = PolarKinematics() if kinematics is None else kinematics
+        self.junction_deviation = junction_deviation
+        self.arc_tolerance = arc_tolerance
+        self.steps_per_mm = np.asarray(steps_per_mm, dtype=np.float64)
+        self.block_buffer_size = block_buffer_size
+        self.baudrate = baudrate
+        self.sync_time = sync_time
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """Create from a settings dict, see grblsettings.parse_settings."""
+        return cls(PolarKinematics.from_settings(settings), junction_deviation=settings[11],
+                   arc_tolerance=settings[12], steps_per_mm=(settings[100], settings[101]), **kwargs)
+
+    def blocks(self, toolpath, start=(0.0, 0.0)):
+        """Planner blocks of a toolpath.
+
+        Returns the belt length changes da, db (mm), the feed rate (mm/min,
+        -1 for rapids), the toolpath row and a sync flag per block. Blocks
+        without steps are dropped like plan_buffer_line does.
+        """
+        motion = np.asarray(toolpath['motion'])
+        xs, ys, source = self.kinematics.firmware_segments(
+            np.asarray(toolpath['x']), np.asarray(toolpath['y']), motion, start,
+            i=np.asarray(toolpath['i']), j=np.asarray(toolpath['j']), arc_tolerance=self.arc_tolerance)
+        a, b = self.kinematics.forward(np.concatenate(([start[0]], xs)), np.concatenate(([start[1]], ys)))
+        # the planner works on whole steps
+        sa = np.rint(a * self.steps_per_mm[0])
+        sb = np.rint(b * self.steps_per_mm[1])
+        da = np.diff(sa) / self.steps_per_mm[0]
+        db = np.diff(sb) / self.steps_per_mm[1]
+        keep = (da != 0) | (db != 0)
+        da, db, source = da[keep], db[keep], source[keep]
+        feed = np.where(motion == 0, -1.0, np.asarray(toolpath['f']))[source]
+        # a sync in front of any row since the previous block stops the machine
+        nsync = np.cumsum(sync_points(toolpath))
+        sync = np.diff(np.concatenate(([0], nsync[source]))) > 0
+        return da, db, feed, source, sync
+
+    def plan(self, da, db, feed, sync=None, entry_speed=0.0):
+        """Plan blocks, returns length, entry speed, exit speed, nominal speed (mm/s) and acceleration (mm/s^2).
+
+        entry_speed (mm/s) is the speed the machine has when the first block starts.
+        """
+        n = len(da)
+        length = np.hypot(da, db)
+        vn = self.kinematics.nominal_rates(da, db, length, feed) / 60.0
+        accel = self.kinematics.block_accelerations(da, db, length)
+        if n == 0:
+            return length, vn, vn, vn, accel
+
+        # junction speeds, from the angle between the unit vectors of neighbouring blocks
+        ua = da / length
+        ub = db / length
+        cos_theta = np.zeros(n)
+        cos_theta[1:] = -(ua[1:]*ua[:-1] + ub[1:]*ub[:-1])
+        cos_theta = np.clip(cos_theta, -0.999999, 1.0)
+        sin_theta_d2 = np.sqrt(0.5*(1.0 - cos_theta))
+        vmin2 = (MINIMUM_JUNCTION_SPEED/60.0)**2
+        junction2 = np.maximum(vmin2, accel*self.junction_deviation*sin_theta_d2/(1.0 - sin_theta_d2))
+        junction2[cos_theta > 0.999999] = vmin2
+        junction2[0] = entry_speed*entry_speed  # from rest, unless already moving
+        if sync is not None:
+            junction2[sync] = 0.0
+        vn2 = vn*vn
+        cap = np.minimum(junction2, vn2)
+        cap[1:] = np.minimum(cap[1:], vn2[:-1])
+
+        # the last block in the buffer is planned to a stop
+        budget = np.concatenate(([0.0], np.cumsum(2*accel*length)))
+        window = self.block_buffer_size - 1
+        end = np.minimum(np.arange(n) + window, n)
+        cap = np.minimum(cap, budget[end] - budget[:-1])
+
+        # backward pass: decelerate in time for every following cap, exit of the last block is 0
+        # v[k]^2 = min over j>=k of (cap[j] + budget[j] - budget[k])
+        capped = np.append(cap, 0.0) + budget
+        back = np.minimum.accumulate(capped[::-1])[::-1] - budget
+        # forward pass: accelerate from the previous entry speed
+        # v[k]^2 = min over j<=k of (back[j] + budget[k] - budget[j])
+        entry2 = np.minimum.accumulate(back - budget) + budget
+        entry2 = np.maximum(entry2, 0.0)
+        v = np.sqrt(entry2)
+        return length, v[:-1], v[1:], vn, accel
+
+    def block_times(self, da, db, feed, sync=None):
+        """Duration (s) of every block."""
+        length, v0, v1, vn, accel = self.plan(da, db, feed, sync)
+        return trapezoid_times(length, v0, v1, vn, accel)
+
+    def line_times(self, toolpath, nlines, line_bytes=None, start=(0.0, 0.0)):
+        """Cumulative simulated time (s) at the end of every line.
+
+        line_bytes is the length of every line as sent, e.g. the difference
+        of the GcodeFile offsets, to limit the line rate to the baud rate.
+        """
+        da, db, feed, source, sync = self.blocks(toolpath, start)
+        dt = self.block_times(da, db, feed, sync)
+        lines = np.asarray(toolpath['line'])
+        t = np.bincount(lines[source], weights=dt, minlength=nlines)[:nlines]
+        if self.sync_time:
+            t += np.bincount(lines[source[sync]], minlength=nlines)[:nlines] * self.sync_time
+        if line_bytes is not None and self.baudrate:
+            # 10 bits per byte on the wire
+            t = np.maximum(t, np.asarray(line_bytes, dtype=np.float64) * 10.0 / self.baudrate)
+        return np.cumsum(t)
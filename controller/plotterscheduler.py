@@ -0,0 +1,345 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Job scheduler for several v-plotters on one host
+
+Takes a queue of g-code jobs and hands each to the next idle machine. All
+machines are driven from one asyncio event loop, one stream per port (see
+grblclient), so the host load grows with the number of active streams
+only. The files are opened and indexed once, with the toolpath cache, and
+shared read-only between the machines plotting them: the GcodeFile is a
+memory map, every stream just iterates over it on its own.
+
+The status of all machines and jobs is polled in one place, status()
+returns it as one dict for a monitoring view, status_text() as a table.
+
+version history:
+2026-10-18: created this
+"""
+
+import sys
+import time
+import json
+import asyncio
+import argparse
+from collections import deque
+import serial
+from grblclient import GrblClient, connect
+from grblsim import SimulatedSerial
+from grblstreamer import RX_BUFFER_SIZE, grbl_ports
+from toolpathcache import ToolpathCache, load_gcode
+
+
+STATUS_INTERVAL = 1.0  # s between the status polls of all machines
+
+
+class Job(object):
+    """A g-code file to be plotted once."""
+
+    def __init__(self, number, fn, data):
+        """Initialise, data is the shared JobData of the file."""
+        self.number = number
+        self.fn = fn
+        self.data = data
+        self.state = 'queued'  # 'plotting', 'done' or 'failed'
+        self.machine = None
+        self.acked = 0
+        self.errors = 0
+        self.t_start = None
+        self.t_end = None
+
+
+class JobData(object):
+    """Read-only data of a g-code file, shared by all jobs of the file."""
+
+    def __init__(self, fn, cache=None):
+        """Open, index and parse fn."""
+        self.gcode, self.toolpath, self.stats = load_gcode(fn, cache)
+        self.users = 0
+
+    def __len__(self):
+        return len(self.gcode)
+
+    def close(self):
+        """Close the memory map."""
+        self.gcode.close()
+
+
+class Machine(object):
+    """One plotter and what it is doing."""
+
+    def __init__(self, port, client=None):
+        """Initialise."""
+        self.port = port
+        self.client = client
+        self.state = 'connecting'  # 'idle', 'plotting', 'alarm' or 'offline'
+        self.job = None
+        self.status = None  # the last grblstatus.MachineStatus
+        self.lines_per_s = 0.0
+        self._mark = (time.time(), None, 0)
+
+    def sample(self, now):
+        """Update the line rate of the current job, since the last sample."""
+        t, job, acked = self._mark
+        if self.job is None or self.job is not job:
+            self.lines_per_s = 0.0
+        elif now > t:
+            self.lines_per_s = (self.job.acked - acked) / (now - t)
+        self._mark = (now, self.job, 0 if self.job is None else self.job.acked)
+
+
+class PlotterScheduler(object):
+    """Run a queue of jobs on a set of plotters."""
+
+    def __init__(self, ports=(), unlock=False, rx_buffer_size=RX_BUFFER_SIZE, cache=None, reset=True):
+        """Initialise with the serial ports of the plotters.
+
+        With unlock, the alarm lock of the plotters is cleared with '$X' on
+        connecting, otherwise plotters in alarm state are left out until
+        someone unlocks them. Without reset, the plotters are connected to
+        without resetting them, they keep their positions.
+        """
+        self.machines = [Machine(port) for port in ports]
+        self.unlock = unlock
+        self.reset = reset
+        self.rx_buffer_size = rx_buffer_size
+        self.cache = cache
+        self.queue = deque()
+        self.jobs = []
+        self.files = {}  # file name: JobData
+        self._wakeup = None
+
+    def add_machine(self, port, client):
+        """Add a plotter with an already started GrblClient after its handshake, e.g. a simulated one."""
+        machine = Machine(port, client)
+        self.machines.append(machine)
+        return machine
+
+    def submit(self, fn, copies=1):
+        """Queue copies of the g-code file fn, returns the jobs."""
+        data = self.files.get(fn)
+        if data is None:
+            data = self.files[fn] = JobData(fn, self.cache)
+        jobs = []
+        for i in range(copies):
+            job = Job(len(self.jobs) + 1, fn, data)
+            data.users += 1
+            self.jobs.append(job)
+            self.queue.append(job)
+            jobs.append(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return jobs
+
+    async def _connect(self, machine):
+        try:
+            if machine.client is None:
+                machine.client = await connect(machine.port, rx_buffer_size=self.rx_buffer_size, reset=self.reset)
+            if self.unlock:
+                await machine.client.send('$X')
+            await self._poll_status(machine)
+        except (OSError, serial.SerialException, asyncio.TimeoutError) as e:
+            print('%s: %s' % (machine.port, e))
+            machine.state = 'offline'
+
+    async def _poll_status(self, machine):
+        try:
+            machine.status = await machine.client.get_status()
+        except asyncio.TimeoutError:
+            machine.status = None
+        if machine.state in ('plotting', 'offline'):
+            return
+        if machine.status is None:
+            machine.state = 'offline'
+        elif machine.status.state == 'Alarm':
+            machine.state = 'alarm'
+        elif machine.status.idle:
+            machine.state = 'idle'
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _plot(self, machine, job):
+        """Stream a job and wait until the plotter finished it."""
+        machine.job = job
+        job.machine = machine
+        job.state = 'plotting'
+        job.t_start = time.time()
+
+        def on_ack(n, response):
+            job.acked = n + 1
+            if response.startswith('error'):
+                job.errors += 1
+
+        try:
+            await machine.client.stream(job.data.gcode.lines(), on_ack)
+            machine.status = await machine.client.wait_idle()
+            job.state = 'done'
+            machine.state = 'idle'
+        except (OSError, serial.SerialException) as e:
+            print('%s: job %i failed after %i lines: %s' % (machine.port, job.number, job.acked, e))
+            job.state = 'failed'
+            machine.state = 'offline'
+        finally:
+            job.t_end = time.time()
+            machine.job = None
+            job.data.users -= 1
+            if not job.data.users:
+                job.data.close()
+                del self.files[job.fn]
+            self._wakeup.set()
+
+    async def run(self, monitor=None, interval=STATUS_INTERVAL):
+        """Connect to the plotters and run until every job is done or no plotter is left.
+
+        monitor(scheduler) is called every interval seconds.
+        """
+        self._wakeup = asyncio.Event()
+        await asyncio.gather(*(self._connect(m) for m in self.machines))
+        tasks = set()
+        t_status = 0.0
+        while True:
+            self._wakeup.clear()
+            for machine in self.machines:
+                if machine.state == 'idle' and self.queue:
+                    job = self.queue.popleft()
+                    machine.state = 'plotting'
+                    task = asyncio.ensure_future(self._plot(machine, job))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            online = [m for m in self.machines if m.state != 'offline']
+            if not tasks and (not self.queue or not online):
+                break
+            now = time.time()
+            if now - t_status >= interval:
+                t_status = now
+                await asyncio.gather(*(self._poll_status(m) for m in online))
+                for machine in self.machines:
+                    machine.sample(now)
+                if monitor is not None:
+                    monitor(self)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(interval - (time.time() - t_status), 0.01))
+            except asyncio.TimeoutError:
+                pass
+        for machine in self.machines:
+            machine.sample(time.time())
+
+    def close(self):
+        """Close all ports and shared files."""
+        for machine in self.machines:
+            if machine.client is not None:
+                machine.client.close()
+        for data in self.files.values():
+            data.close()
+        self.files.clear()
+
+    def status(self):
+        """Status of all plotters and jobs, for a monitoring view."""
+        machines = []
+        for m in self.machines:
+            job = m.job
+            machines.append({
+                'port': m.port, 'state': m.state,
+                'grbl': None if m.status is None else m.status.state,
+                'job': None if job is None else job.number,
+                'file': None if job is None else job.fn,
+                'lines': None if job is None else len(job.data),
+                'acked': None if job is None else job.acked,
+                'errors': None if job is None else job.errors,
+                'lines_per_s': m.lines_per_s})
+        states = [job.state for job in self.jobs]
+        return {'time': time.time(), 'machines': machines,
+                'active': sum(m.state == 'plotting' for m in self.machines),
+                'lines_per_s': sum(m.lines_per_s for m in self.machines),
+                'jobs': {state: states.count(state) for state in ('queued', 'plotting', 'done', 'failed')},
+                'files': len(self.files)}
+
+    def status_text(self):
+        """status() as a table."""
+        s = self.status()
+        text = ['%-20s %-9s %-6s %-30s %15s %6s %8s' % ('port', 'state', 'grbl', 'job', 'lines', 'errors', 'lines/s')]
+        for m in s['machines']:
+            job = '' if m['job'] is None else '%i %s' % (m['job'], m['file'])
+            lines = '' if m['job'] is None else '%i/%i' % (m['acked'], m['lines'])
+            errors = '' if m['job'] is None else '%i' % m['errors']
+            text.append('%-20s %-9s %-6s %-30.30s %15s %6s %8.1f' % (m['port'], m['state'], m['grbl'] or '-', job,
+                                                                   lines, errors, m['lines_per_s']))
+        text.append('%i plotting, %.1f lines/s, jobs: %i queued, %i done, %i failed' % (
+            s['active'], s['lines_per_s'], s['jobs']['queued'], s['jobs']['done'], s['jobs']['failed']))
+        return '\n'.join(text)
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Plot a queue of g-code files on several v-plotters.')
+    parser.add_argument('gcode_files', nargs='+',
+            help='g-code files, one job each, plotted in this order')
+    parser.add_argument('-p', '--port', action='append',
+            help='serial port of a plotter, repeat for more (default: all grbl ports found)')
+    parser.add_argument('-c', '--copies', type=int, default=1,
+            help='jobs per file (default: %(default)s)')
+    parser.add_argument('--unlock', action='store_true', default=False,
+            help="clear the alarm lock of the plotters with '$X'")
+    parser.add_argument('--no-reset', action='store_true', default=False,
+            help='connect without resetting the plotters, they keep their positions')
+    parser.add_argument('--rx-buffer-size', type=int, default=RX_BUFFER_SIZE,
+            help="grbl's serial rx buffer size, RX_BUFFER_SIZE in serial.h (default: %(default)s)")
+    parser.add_argument('-i', '--interval', type=float, default=5.0,
+            help='seconds between status tables (default: %(default)s)')
+    parser.add_argument('--status-file',
+            help='write the status as JSON to this file, for a monitoring view')
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+            help='plot on N simulated, unlocked grbl instead (see grblsim)')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+            help='simulated seconds per real second with --simulate (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    ports = [] if args.simulate else (args.port or grbl_ports())
+    if not ports and not args.simulate:
+        print('no plotters found!')
+        return 1
+    try:
+        cache = ToolpathCache()
+    except OSError:
+        cache = None
+    scheduler = PlotterScheduler(ports, unlock=args.unlock, rx_buffer_size=args.rx_buffer_size, cache=cache,
+                                 reset=not args.no_reset)
+    for fn in args.gcode_files:
+        scheduler.submit(fn, args.copies)
+    t_print = [0.0]
+
+    def monitor(scheduler):
+        if args.status_file:
+            with open(args.status_file, 'w') as f:
+                json.dump(scheduler.status(), f, indent=1)
+        if time.time() - t_print[0] >= args.interval:
+            t_print[0] = time.time()
+            print(scheduler.status_text())
+            sys.stdout.flush()
+
+    async def run():
+        for n in range(args.simulate):
+            client = GrblClient(SimulatedSerial(rx_buffer_size=args.rx_buffer_size, time_scale=args.time_scale,
+                                                locked=False), args.rx_buffer_size)
+            client.start()
+            await client.handshake()
+            scheduler.add_machine('simulated grbl %i' % (n + 1), client)
+        await scheduler.run(monitor, interval=min(args.interval, STATUS_INTERVAL))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print('interrupted! sending feed hold.')
+        for machine in scheduler.machines:
+            if machine.state == 'plotting':
+                machine.client.realtime('!')
+    finally:
+        scheduler.close()
+    t_print[0] = 0.0
+    monitor(scheduler)
+    return 1 if any(job.state != 'done' for job in scheduler.jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
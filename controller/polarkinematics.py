@@ -0,0 +1,258 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Polar kinematics of the v-plotter, mirroring the POLAR transform of the firmware
+
+mc_line in firmware/grbl/motion_control.c converts the cartesian target into
+the change of the two belt lengths against the origin, and the planner works
+on these belt lengths: feed rates, max rates and accelerations all apply in
+belt space. The motors hang at (-x0, y0) and (motordistance-x0, y0) in work
+coordinates. Everything here works on whole NumPy arrays.
+
+version history:
+2026-10-18: created this
+"""
+
+import numpy as np
+from grblsettings import DEFAULT_SETTINGS
+
+
+MM_PER_LINE_SEGMENT = 30.0  # mm_per_line_segment in mc_segmented_line
+ARC_ANGULAR_TRAVEL_EPSILON = 5e-7  # config.h
+
+
+def arc_travel(x0, y0, x, y, i, j, clockwise):
+    """Signed angular travel (rad) and radius of arcs from x0, y0 to x, y around x0+i, y0+j, like mc_arc."""
+    rx, ry = -i, -j
+    tx = x - (x0 + i)
+    ty = y - (y0 + j)
+    travel = np.arctan2(rx*ty - ry*tx, rx*tx + ry*ty)
+    travel = np.where(clockwise & (travel >= -ARC_ANGULAR_TRAVEL_EPSILON), travel - 2*np.pi, travel)
+    travel = np.where(~clockwise & (travel <= ARC_ANGULAR_TRAVEL_EPSILON), travel + 2*np.pi, travel)
+    return travel, np.hypot(i, j)
+
+
+def subdivide(x, y, counts, start=(0.0, 0.0)):
+    """Split the segments ending at x, y into counts[k] equal pieces each.
+
+    Returns the end points of all pieces and the index of the segment each
+    piece belongs to.
+    """
+    counts = np.maximum(np.asarray(counts, dtype=np.int64), 1)
+    x0 = np.concatenate(([start[0]], x[:-1]))
+    y0 = np.concatenate(([start[1]], y[:-1]))
+    source = np.repeat(np.arange(len(x)), counts)
+    first = np.cumsum(counts) - counts
+    frac = (np.arange(len(source)) - first[source] + 1) / counts[source]
+    xs = x0[source] + frac * (x - x0)[source]
+    ys = y0[source] + frac * (y - y0)[source]
+    # exact end points, no rounding
+    last = first + counts - 1
+    xs[last] = x
+    ys[last] = y
+    return xs, ys, source
+
+
+def expand_arcs(x, y, motion, i, j, start=(0.0, 0.0), arc_tolerance=DEFAULT_SETTINGS[12], counts=None):
+    """Cut the G2/G3 arcs of a toolpath into chords like mc_arc.
+
+    The other segments are split into counts[k] pieces (default 1), see
+    subdivide. Returns x, y and the index of the toolpath row of every point.
+    """
+    counts = np.ones(len(x)) if counts is None else np.array(counts, dtype=np.float64)
+    x0 = np.concatenate(([start[0]], x[:-1]))
+    y0 = np.concatenate(([start[1]], y[:-1]))
+    arc = motion >= 2
+    if arc.any():
+        travel, radius = arc_travel(x0[arc], y0[arc], x[arc], y[arc], i[arc], j[arc], motion[arc] == 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            segments = np.floor(np.abs(0.5*travel*radius) /
+                                np.sqrt(arc_tolerance*(2*radius - arc_tolerance)))
+        counts[arc] = np.nan_to_num(segments)
+    xs, ys, source = subdivide(x, y, counts, start)
+    if arc.any():
+        # chord end points on the circle, the last one of every arc stays the exact target
+        counts = np.maximum(counts.astype(np.int64), 1)
+        first = np.cumsum(counts) - counts
+        step = np.arange(len(source)) - first[source] + 1
+        on_arc = arc[source] & (step < counts[source])
+        ix = np.flatnonzero(arc)
+        phi = np.zeros(len(x))
+        phi[ix] = travel / counts[ix]
+        r = np.zeros(len(x))
+        r[ix] = radius
+        src = source[on_arc]
+        cx = x0[src] + i[src]
+        cy = y0[src] + j[src]
+        angle = np.arctan2(-j[src], -i[src]) + step[on_arc]*phi[src]
+        xs[on_arc] = cx + r[src]*np.cos(angle)
+        ys[on_arc] = cy + r[src]*np.sin(angle)
+    return xs, ys, source
+
+
+class PolarKinematics(object):
+    """Forward and inverse transform between work coordinates and belt lengths."""
+
+    def __init__(self, motordistance=DEFAULT_SETTINGS[28], x0=DEFAULT_SETTINGS[29], y0=DEFAULT_SETTINGS[30],
+                 max_rate=(DEFAULT_SETTINGS[110], DEFAULT_SETTINGS[111]),
+                 acceleration=(DEFAULT_SETTINGS[120], DEFAULT_SETTINGS[121])):
+        """Initialise with the machine geometry ($28, $29, $30), max rates (mm/min) and accelerations (mm/s^2)."""
+        self.motordistance = float(motordistance)
+        self.x0 = float(x0)
+        self.y0 = float(y0)
+        self.max_rate = np.asarray(max_rate, dtype=np.float64)
+        self.acceleration = np.asarray(acceleration, dtype=np.float64)
+        # belt lengths at the origin
+        self.a0 = np.hypot(self.x0, self.y0)
+        self.b0 = np.hypot(self.motordistance - self.x0, self.y0)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Create from a settings dict, see grblsettings.parse_settings."""
+        return cls(settings[28], settings[29], settings[30],
+                   max_rate=(settings[110], settings[111]),
+                   acceleration=(settings[120], settings[121]))
+
+    def forward(self, x, y):
+        """Belt length changes (a, b) against the origin for work positions x, y."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        yy = self.y0 - y
+        a = np.hypot(self.x0 + x, yy) - self.a0
+        b = np.hypot(self.motordistance - self.x0 - x, yy) - self.b0
+        return a, b
+
+    def inverse(self, a, b):
+        """Work positions (x, y) for belt length changes a, b."""
+        la = np.asarray(a, dtype=np.float64) + self.a0
+        lb = np.asarray(b, dtype=np.float64) + self.b0
+        D = self.motordistance
+        xa = (la*la - lb*lb + D*D) / (2*D)  # horizontal distance from motor A
+        yy = np.sqrt(np.maximum(la*la - xa*xa, 0.0))
+        return xa - self.x0, self.y0 - yy
+
+    def belt_moves(self, x, y, start=(0.0, 0.0)):
+        """Belt length changes da, db of every segment and its belt space length."""
+        a, b = self.forward(np.concatenate(([start[0]], x)), np.concatenate(([start[1]], y)))
+        da = np.diff(a)
+        db = np.diff(b)
+        return da, db, np.hypot(da, db)
+
+    def nominal_rates(self, da, db, length, feed):
+        """Block nominal rates (mm/min in belt space) like plan_buffer_line computes them.
+
+        feed is the programmed feed rate per segment, nan or negative for rapids.
+        """
+        feed = np.where(np.isnan(feed) | (feed < 0), np.inf, feed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ua = np.abs(da / length)
+            ub = np.abs(db / length)
+            limit = np.minimum(np.where(ua > 0, self.max_rate[0] / ua, np.inf),
+                               np.where(ub > 0, self.max_rate[1] / ub, np.inf))
+        return np.minimum(feed, limit)
+
+    def block_accelerations(self, da, db, length):
+        """Block accelerations (mm/s^2 in belt space), scaled down to the axis limits."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ua = np.abs(da / length)
+            ub = np.abs(db / length)
+            return np.minimum(np.where(ua > 0, self.acceleration[0] / ua, np.inf),
+                              np.where(ub > 0, self.acceleration[1] / ub, np.inf))
+
+    def belt_velocities(self, x, y, feed, start=(0.0, 0.0)):
+        """Belt velocities va, vb (mm/min) and duration dt (s) of every segment at its nominal rate."""
+        da, db, length = self.belt_moves(x, y, start)
+        rate = self.nominal_rates(da, db, length, feed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dt = np.where(length > 0, length / rate * 60.0, 0.0)
+            va = np.where(dt > 0, da / dt * 60.0, 0.0)
+            vb = np.where(dt > 0, db / dt * 60.0, 0.0)
+        return va, vb, dt
+
+    def belt_accelerations(self, x, y, feed, start=(0.0, 0.0)):
+        """Belt accelerations aa, ab (mm/s^2) needed at every junction at nominal rates.
+
+        The velocity step between a segment and its predecessor, spread over
+        the mean of their durations.
+        """
+        va, vb, dt = self.belt_velocities(x, y, feed, start)
+        va = np.concatenate(([0.0], va)) / 60.0
+        vb = np.concatenate(([0.0], vb)) / 60.0
+        dt = np.concatenate(([0.0], dt))
+        tj = 0.5 * (dt[1:] + dt[:-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aa = np.where(tj > 0, np.diff(va) / tj, 0.0)
+            ab = np.where(tj > 0, np.diff(vb) / tj, 0.0)
+        return aa, ab
+
+    def firmware_segments(self, x, y, motion, start=(0.0, 0.0), mm_per_segment=MM_PER_LINE_SEGMENT,
+                          i=None, j=None, arc_tolerance=DEFAULT_SETTINGS[12]):
+        """The points the firmware passes to the planner.
+
+        G1 lines are cut like mc_segmented_line. G2/G3 arcs are cut into
+        chords like mc_arc if the centre offsets i, j are given, otherwise
+        they are taken as straight lines. Returns x, y and the index of the
+        toolpath row of every point.
+        """
+        x0 = np.concatenate(([start[0]], x[:-1]))
+        y0 = np.concatenate(([start[1]], y[:-1]))
+        length = np.hypot(x - x0, y - y0)
+        counts = np.where(motion == 1, np.floor(length / mm_per_segment), 1)
+        if i is None:
+            return subdivide(x, y, counts, start)
+        return expand_arcs(x, y, motion, i, j, start, arc_tolerance, counts)
+
+    def chord_deviation(self, x0, y0, x1, y1):
+        """Distance (mm) of the machine path from the straight line, for moves from x0, y0 to x1, y1.
+
+        The move is linear in belt space, the deviation is taken in the
+        middle, where it is largest for short moves.
+        """
+        a0, b0 = self.forward(x0, y0)
+        a1, b1 = self.forward(x1, y1)
+        xm, ym = self.inverse(0.5*(a0 + a1), 0.5*(b0 + b1))
+        dx = x1 - x0
+        dy = y1 - y0
+        length = np.hypot(dx, dy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dev = np.abs((xm - x0)*dy - (ym - y0)*dx) / length
+        return np.where(length > 0, dev, 0.0)
+
+    def adaptive_counts(self, x, y, motion, tolerance, start=(0.0, 0.0), mm_per_segment=MM_PER_LINE_SEGMENT,
+                        max_iterations=8):
+        """Fewest pieces to cut every G1 move into, so the machine path stays within tolerance (mm).
+
+        The firmware cuts every piece further into mm_per_segment pieces,
+        moves which it already cuts finely enough get count 1. The deviation
+        shrinks with the square of the piece length. Other moves get count 1.
+        """
+        x0 = np.concatenate(([start[0]], x[:-1]))
+        y0 = np.concatenate(([start[1]], y[:-1]))
+        line = motion == 1
+        dev = np.where(line, self.chord_deviation(x0, y0, x, y), 0.0)
+        required = np.maximum(np.ceil(np.sqrt(dev / tolerance)), 1)
+        firmware = np.maximum(np.floor(np.hypot(x - x0, y - y0) / mm_per_segment), 1)
+        counts = np.where(line & (firmware < required), required, 1).astype(np.int64)
+        # check the pieces the firmware really plans, refine where the estimate was too optimistic
+        for iteration in range(max_iterations):
+            xs, ys, source = subdivide(x, y, counts, start)
+            xf, yf, fsource = self.firmware_segments(xs, ys, np.ones(len(xs), np.int8), start, mm_per_segment)
+            xf0 = np.concatenate(([start[0]], xf[:-1]))
+            yf0 = np.concatenate(([start[1]], yf[:-1]))
+            bad = self.chord_deviation(xf0, yf0, xf, yf) > tolerance
+            bad = np.zeros(len(x), bool) | (np.bincount(source[fsource[bad]], minlength=len(x)) > 0)
+            bad &= line
+            if not bad.any():
+                break
+            counts[bad] = np.maximum(counts[bad] + 1, np.ceil(counts[bad] * 1.25)).astype(np.int64)
+        return counts
+
+    def machine_path(self, x, y, motion, start=(0.0, 0.0), points_per_segment=8,
+                     mm_per_segment=MM_PER_LINE_SEGMENT, i=None, j=None, arc_tolerance=DEFAULT_SETTINGS[12]):
+        """The path the pen really takes, linear in belt space between the planner points."""
+        xs, ys, source = self.firmware_segments(x, y, motion, start, mm_per_segment, i, j, arc_tolerance)
+        a, b = self.forward(np.concatenate(([start[0]], xs)), np.concatenate(([start[1]], ys)))
+        ai, bi, _ = subdivide(a[1:], b[1:], np.full(len(xs), points_per_segment), (a[0], b[0]))
+        xm, ym = self.inverse(ai, bi)
+        return np.concatenate(([start[0]], xm)), np.concatenate(([start[1]], ym))
@@ -0,0 +1,199 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Serial transport worker for the GRBL v-plotter controller
+
+The worker thread is the only place that touches the serial port. The GUI
+queues commands and receives the responses back as Qt signals, tagged with
+the id of the command that caused them.
+
+version history:
+2026-10-18: created this
+"""
+
+import time
+import queue
+import itertools
+from PyQt5.QtCore import QThread, pyqtSignal
+from grblstreamer import GrblStreamer, is_ack
+from grblhandshake import handshake
+
+
+# single byte commands which grbl picks out of the serial stream directly,
+# they get no 'ok' and are never put into grbl's rx buffer
+REALTIME_COMMANDS = ('?', '!', '~', '\x18')
+
+
+class SerialWorker(QThread):
+    """Own the serial port and exchange commands with grbl in the background."""
+
+    ready = pyqtSignal()
+    response = pyqtSignal(int, str, list)  # command id, command, response lines
+    status = pyqtSignal(object)  # '<...>' realtime status report, as grblstatus.MachineStatus
+    message = pyqtSignal(str)  # anything else worth showing to the user
+    stream_message = pyqtSignal(str)  # the lines sent and acknowledged while streaming
+    stream_progress = pyqtSignal(int, int)  # lines sent, lines total
+    stream_finished = pyqtSignal(int, int)  # lines acknowledged, lines total
+
+    stream_status_interval = 0.2  # s between status reports while streaming
+
+    def __init__(self, ser, parent=None, reset=True):
+        """Initialise with an opened serial.Serial instance, reset False if it was opened without reset."""
+        super(SerialWorker, self).__init__(parent)
+        self.ser = ser
+        self.reset = reset
+        self.info = None  # grblhandshake.GrblInfo, when ready
+        self.response_timeout = 30.0
+        self._commands = queue.Queue()
+        self._realtime = queue.Queue()
+        self._ids = itertools.count(1)
+        self._running = True
+        self.stream_acked = 0  # lines of the current stream acknowledged, poll it from the GUI
+        self.stream_first = 0
+        self.streamer = GrblStreamer(ser)
+        self.streamer.on_status = self.status.emit
+        self.streamer.on_message = self.message.emit
+        self.streamer.on_idle = self._write_realtime
+
+    def send(self, command):
+        """Queue a line command and return the id its response is tagged with."""
+        command = command.strip()
+        if command in REALTIME_COMMANDS:
+            self.realtime(command)
+            return 0
+        cid = next(self._ids)
+        self._commands.put((cid, command, None))
+        return cid
+
+    def realtime(self, command):
+        """Send a realtime command at the next opportunity, ahead of queued lines."""
+        self._realtime.put(command)
+
+    def stream(self, lines, first=0):
+        """Queue a g-code program to be streamed with the character counting protocol.
+
+        first is the file line number of the first line, for the progress
+        of resumed streams.
+        """
+        cid = next(self._ids)
+        self.stream_first = first
+        self.stream_acked = max(first, 0)
+        self._commands.put((cid, None, lines))
+        return cid
+
+    def stop_stream(self):
+        """Stop a running stream after the line currently being sent.
+
+        stream_finished follows once grbl acknowledged the lines in its rx
+        buffer, which it still executes.
+        """
+        self.streamer.stop()
+
+    def stop(self):
+        """Stop the worker thread, wait() for it to finish."""
+        self._running = False
+        self.streamer.stop(drain=False)
+
+    def run(self):
+        """Thread main loop."""
+        # short timeout, so realtime commands and stop requests are picked up quickly
+        self.ser.timeout = 0.05
+        if not self._handshake():
+            return
+        while self._running:
+            self._write_realtime()
+            try:
+                cid, command, lines = self._commands.get(timeout=0.02)
+            except queue.Empty:
+                self._read_pending()
+                continue
+            if lines is None:
+                self._execute(cid, command)
+            else:
+                self._stream(lines)
+
+    def _handshake(self):
+        self.message.emit("Initializing grbl...")
+        try:
+            self.info = handshake(self.streamer, self.reset)
+        except (TimeoutError, OSError) as e:
+            self.message.emit('%s' % e)
+            return False
+        self.ready.emit()
+        return True
+
+    def _write_realtime(self):
+        while True:
+            try:
+                command = self._realtime.get_nowait()
+            except queue.Empty:
+                return
+            self.ser.write(command.encode())
+
+    def _readline(self):
+        """Read one line, returns '' on timeout. Status reports are dispatched here."""
+        line = self.streamer.readline()
+        if line.startswith('<'):
+            self.streamer.dispatch(line)
+            return ''
+        return line
+
+    def _read_pending(self):
+        while self.ser.in_waiting:
+            line = self._readline()
+            if line:
+                self.message.emit(line)
+
+    def _execute(self, cid, command):
+        self.ser.write(('%s\n' % command).encode())
+        results = []
+        t0 = time.time()
+        while self._running:
+            self._write_realtime()
+            line = self._readline()
+            if not line:
+                if time.time() - t0 > self.response_timeout:
+                    results.append('error: no response')
+                    break
+                continue
+            results.append(line)
+            if is_ack(line):
+                break
+        self.response.emit(cid, command, results)
+
+    def _stream(self, lines):
+        first = self.stream_first
+        Nlines = first + len(lines)
+
+        def on_send(n, line):
+            self.stream_message.emit(line)
+            if n % 10 == 0 or first+n+1 == Nlines:
+                self.stream_progress.emit(max(first+n+1, 0), Nlines)
+
+        def on_ack(n, response):
+            self.stream_acked = max(first+n+1, 0)
+            if response.startswith('error'):
+                self.message.emit('%s (line %i)' % (response, first+n+1))
+            else:
+                self.stream_message.emit('%s%i' % (response, first+n+1))
+
+        self.streamer.reset()
+        self.streamer.on_send = on_send
+        self.streamer.on_ack = on_ack
+        self.streamer.status_interval = self.stream_status_interval
+        try:
+            acked = self.streamer.stream(lines)
+        finally:
+            self.streamer.status_interval = None
+        self.stream_finished.emit(max(first+acked, 0), Nlines)
+
+
+class PortScanner(QThread):
+    """Enumerate the serial ports in the background, it can take seconds."""
+
+    ports = pyqtSignal(list)  # (port, description, hwid) of every port, sorted
+
+    def run(self):
+        from serial.tools.list_ports import comports
+        self.ports.emit([tuple(port) for port in sorted(comports())])
@@ -13,5 +13,14 @@ setup(
     author='Tobias Witting',
     author_email='tobias.witting@posteo.de',
     description='PyQt GUI for controlling V-Plotter',
-    entry_points={'console_scripts':['vplotter-controller=vplottercontroller:main']}
+    entry_points={'console_scripts':['vplotter-controller=vplottercontroller:main',
+                                    'vplotter-stream=vplotterstream:main',
+                                    'vplotter-optimize=strokeoptimizer:main',
+                                    'vplotter-segment=gcodesegmenter:main',
+                                    'vplotter-compact=gcodecompactor:main',
+                                    'vplotter-arcfit=arcfitter:main',
+                                    'vplotter-grblsim=grblsim:main',
+                                    'vplotter-bench=streambench:main',
+                                    'vplotter-scheduler=plotterscheduler:main',
+                                    'vplotter-startupbench=startupbench:main']}
 )
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Startup time benchmark of the GUI
+
+Starts the GUI a few times, each in a fresh interpreter, with
+--startup-report, which prints the times since the start of the module
+when the window is shown, when the plot is initialised and when the port
+scan is done, and quits. The wall time of the whole process, with the
+interpreter startup and shutdown, is measured too. By default Qt draws
+offscreen, so no display is needed.
+
+Phases:
+    init     imports and QApplication
+    window   the window is shown
+    plot     pyqtgraph and numpy are imported and the plot is there
+    ports    the port list is filled
+    process  wall time of the process
+
+Results are written as JSON, to compare them between commits (see
+--compare), and --max-window fails the run if the window shows up later,
+as a regression check. Installed as the vplotter-startupbench console
+script.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from streambench import _git_commit
+
+
+PHASES = ('init', 'window', 'plot', 'ports', 'process')
+RESULTS_VERSION = 1
+STARTUP_TIMEOUT = 60.0  # s
+
+
+def measure_startup(qt_platform='offscreen', timeout=STARTUP_TIMEOUT):
+    """Start the GUI once, returns the times of the PHASES in s."""
+    env = dict(os.environ)
+    if qt_platform:
+        env['QT_QPA_PLATFORM'] = qt_platform
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vplottercontroller.py')
+    t0 = time.perf_counter()
+    output = subprocess.check_output([sys.executable, script, '--startup-report'], env=env, timeout=timeout,
+                                     stderr=subprocess.DEVNULL)
+    process = time.perf_counter() - t0
+    report = [line for line in output.decode(errors='replace').splitlines() if line.startswith('{')]
+    if not report:
+        raise RuntimeError('no startup report from %s' % script)
+    times = json.loads(report[-1])
+    times['process'] = process
+    return times
+
+
+def summarise(runs):
+    """min, median and max of every phase over the runs."""
+    summary = {}
+    for phase in PHASES:
+        values = sorted(run[phase] for run in runs if phase in run)
+        if values:
+            summary[phase] = {'min': values[0], 'median': values[len(values) // 2], 'max': values[-1]}
+    return summary
+
+
+def _print_summary(summary):
+    for phase in PHASES:
+        if phase in summary:
+            s = summary[phase]
+            print('%-8s min %7.1f ms  median %7.1f ms  max %7.1f ms' % (
+                phase, 1e3 * s['min'], 1e3 * s['median'], 1e3 * s['max']))
+
+
+def _compare(summary, fn):
+    with open(fn) as f:
+        old = json.load(f)['summary']
+    print('compared to %s:' % fn)
+    for phase in PHASES:
+        if phase in summary and phase in old and old[phase]['median']:
+            print('%-8s median x%.3f' % (phase, summary[phase]['median'] / old[phase]['median']))
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the v-plotter GUI.')
+    parser.add_argument('-n', '--runs', type=int, default=5,
+            help='number of starts (default: %(default)s)')
+    parser.add_argument('--platform', default='offscreen',
+            help="Qt platform plugin, '' for the default display (default: %(default)s)")
+    parser.add_argument('--max-window', type=float, metavar='S',
+            help='exit with 1 if the median time to show the window exceeds S seconds')
+    parser.add_argument('-o', '--output',
+            help='JSON file to write the results to')
+    parser.add_argument('--compare',
+            help='JSON file of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    runs = []
+    for n in range(args.runs):
+        runs.append(measure_startup(args.platform))
+    summary = summarise(runs)
+    _print_summary(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'version': RESULTS_VERSION, 'commit': _git_commit(),
+                       'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'runs': runs, 'summary': summary}, f, indent=1)
+    if args.compare:
+        _compare(summary, args.compare)
+    if args.max_window is not None and summary['window']['median'] > args.max_window:
+        print('the window took %.1f ms, more than %.1f ms!' % (1e3 * summary['window']['median'],
+                                                              1e3 * args.max_window))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
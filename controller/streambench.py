@@ -0,0 +1,327 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Streaming throughput benchmark against the simulated grbl
+
+Streams synthetic workloads through GrblStreamer, or through the
+SerialWorker thread of the GUI, to a GrblSimulator and measures how fast
+the lines get through and whether the planner of grbl runs dry. The
+simulation runs on a virtual clock: it advances by the CPU time the host
+spends and jumps ahead while the host waits for grbl. So the results
+depend on the speed of the host code, but not on the load of the machine
+running the benchmark. The host CPU time includes polling the port while
+grbl is busy, like a real serial port with a timeout. Simulating costs
+about 0.3 ms per straight line and more for arcs, which grbl cuts into
+many blocks, so 10M lines take hours. The default polar settings make
+every workload machine bound, faster machines can be tried with
+--settings.
+
+Workloads:
+    hatch    dense short hatch lines, 1 mm long and 0.2 mm apart
+    travel   long rapid travels with pen up and down around a short stroke
+    arcs     chains of G2/G3 quarter circles
+    file     any g-code file, see --file
+Results are written as JSON, to compare them between commits (see
+--compare). Installed as the vplotter-bench console script.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+from grblsim import GrblSimulator, SimulatedSerial
+from grblstreamer import GrblStreamer
+from gcodefile import GcodeFile
+from grblsettings import parse_settings
+
+
+DEFAULT_SIZES = (1000, 10000)
+RESULTS_VERSION = 1
+
+
+def hatch_lines(n, width=1.0, spacing=0.2, feed=3000.0):
+    """n lines of zigzag hatching, in bands of 1000 strokes side by side."""
+    yield 'G1 F%g' % feed
+    for k in range(n - 1):
+        row = (k + 1) // 2
+        x = (width if k % 4 < 2 else 0.0) + (row // 1000 % 40) * (width + 2.0)
+        y = (row % 1000) * spacing
+        yield 'G1 X%.3f Y%.3f' % (x, y)
+
+
+def travel_lines(n, feed=3000.0):
+    """n lines of pen up, rapid travel across the drawing, pen down and a 2 mm stroke."""
+    yield 'G1 F%g' % feed
+    for k in range(n - 1):
+        group, step = divmod(k, 4)
+        x = (group * 397) % 500
+        y = (group * 211) % 600
+        yield ('M5', 'G0 X%.3f Y%.3f' % (x, y), 'M3 S1000', 'G1 X%.3f Y%.3f' % (x + 2.0, y))[step]
+
+
+def arc_lines(n, feed=3000.0):
+    """n lines of quarter circles with radii of 2 to 20 mm, alternately clockwise and counter clockwise."""
+    yield 'G1 F%g' % feed
+    x = y = 0.0
+    for k in range(n - 1):
+        if k % 21 == 20:
+            # start the next chain
+            x = 0.0
+            y = (k // 21 % 4) * 10.0
+            yield 'G0 X%.3f Y%.3f' % (x, y)
+            continue
+        r = 2.0 + (k % 7) * 3.0
+        x += r
+        y += r
+        if k % 2:
+            yield 'G3 X%.3f Y%.3f I0 J%.3f' % (x, y, r)
+        else:
+            yield 'G2 X%.3f Y%.3f I%.3f J0' % (x, y, r)
+
+
+WORKLOADS = {'hatch': hatch_lines, 'travel': travel_lines, 'arcs': arc_lines}
+
+
+class BenchmarkSerial(SimulatedSerial):
+    """SimulatedSerial on a virtual clock.
+
+    The clock advances by the CPU time the host spends between the calls,
+    times host_scale, e.g. to guess at a slower computer. Waiting for grbl
+    takes no time, the clock jumps to the next event of the simulation.
+    """
+
+    def __init__(self, simulator, timeout=0.05, host_scale=1.0):
+        """Initialise."""
+        self.clock = simulator.time
+        self.host_cpu = 0.0  # s of CPU time spent by the host
+        self.host_scale = host_scale
+        super(BenchmarkSerial, self).__init__(simulator, timeout=timeout)
+        self._mark = time.process_time()
+
+    def _now(self):
+        return self.clock
+
+    def _host(self):
+        """Charge the CPU time since the last call to the host."""
+        dt = time.process_time() - self._mark
+        self.host_cpu += dt
+        self.clock += dt * self.host_scale
+
+    def _done(self, result):
+        self._mark = time.process_time()
+        return result
+
+    def _wait(self, done):
+        deadline = self.clock + self.timeout
+        self._update()
+        while not done() and self.clock < deadline:
+            self.clock = min(max(self.simulator.next_time(), self.clock), deadline)
+            self._update()
+
+    def write(self, data):
+        self._host()
+        return self._done(super(BenchmarkSerial, self).write(data))
+
+    @property
+    def in_waiting(self):
+        self._host()
+        self._update()
+        return self._done(len(self._input))
+
+    def read(self, size=1):
+        self._host()
+        return self._done(super(BenchmarkSerial, self).read(size))
+
+    def readline(self):
+        self._host()
+        return self._done(super(BenchmarkSerial, self).readline())
+
+    def run_until_idle(self):
+        """Let the simulation finish the buffered moves."""
+        sim = self.simulator
+        while sim.planner or sim.machine_state == 'Run':
+            self.clock = max(sim.next_time(), self.clock)
+            self._update()
+        self._mark = time.process_time()
+
+
+def _stream_worker(ser, lines):
+    """Stream like gcode_stream_start of the GUI, through the SerialWorker thread."""
+    from PyQt5.QtCore import QCoreApplication
+    from serialworker import SerialWorker
+    app = QCoreApplication.instance() or QCoreApplication([])
+    worker = SerialWorker(ser)
+    done = []
+    worker.message.connect(lambda text: None)
+    worker.stream_progress.connect(lambda n, Nlines: None)
+    worker.stream_finished.connect(lambda acked, Nlines: done.append(acked))
+    worker.ready.connect(lambda: worker.stream(lines))
+    worker.start()
+    # the slots run in this thread
+    while not done:
+        app.processEvents()
+        time.sleep(0.01)
+    worker.stop()
+    worker.wait()
+    return worker.streamer
+
+
+def fill_statistics(fill_time):
+    """Summary of the time spent at every rx buffer fill level (bytes)."""
+    total = fill_time.sum()
+    if total <= 0:
+        return {}
+    fraction = fill_time / total
+    cdf = np.cumsum(fraction)
+    level = np.arange(len(fill_time))
+    percentile = lambda q: int(np.searchsorted(cdf, q))
+    bins = np.add.reduceat(fraction, np.arange(0, len(fraction), 16))
+    return {'mean': float((fraction * level).sum()), 'p10': percentile(0.1), 'p50': percentile(0.5),
+            'p90': percentile(0.9), 'empty_fraction': float(fraction[0]),
+            'histogram_16': [round(float(f), 6) for f in bins]}
+
+
+def starvation_statistics(intervals):
+    """Number and length (s) of the times the planner ran dry."""
+    lengths = np.array([end - start for start, end in intervals])
+    if not len(lengths):
+        return {'count': 0, 'total': 0.0, 'max': 0.0, 'mean': 0.0, 'p90': 0.0}
+    return {'count': len(lengths), 'total': float(lengths.sum()), 'max': float(lengths.max()),
+            'mean': float(lengths.mean()), 'p90': float(np.percentile(lengths, 90))}
+
+
+def run_benchmark(name, lines, engine='streamer', host_scale=1.0, simulator_kwargs=None):
+    """Stream lines to a fresh simulator, returns a dict with the measurements."""
+    sim = GrblSimulator(locked=False, **(simulator_kwargs or {}))
+    ser = BenchmarkSerial(sim, host_scale=host_scale)
+    wall = time.time()
+    if engine == 'worker':
+        lines = list(lines)
+        streamer = _stream_worker(ser, lines)
+    else:
+        streamer = GrblStreamer(ser)
+        streamer.stream(lines)
+    ser._host()
+    wall = time.time() - wall
+    stream_time = ser.clock
+    ser.run_until_idle()
+    sent = streamer.sent
+    return {
+        'workload': name,
+        'engine': engine,
+        'lines': sent,
+        'bytes': streamer.bytes_sent,
+        'errors': streamer.errors,
+        'stream_time': stream_time,
+        'job_time': ser.clock,
+        'lines_per_s': sent / stream_time if stream_time else 0.0,
+        'bytes_per_s': streamer.bytes_sent / stream_time if stream_time else 0.0,
+        'host_cpu': ser.host_cpu,
+        'host_cpu_per_line_us': 1e6 * ser.host_cpu / sent if sent else 0.0,
+        'host_lines_per_s': sent / ser.host_cpu if ser.host_cpu else 0.0,
+        'wall_time': wall,
+        'rx_fill': fill_statistics(sim.rx_fill_time),
+        'rx_overflows': sim.rx_overflows,
+        'starvation': starvation_statistics(sim.starved),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_result(r):
+    print('%-24s %9i lines %9.1f lines/s %9.0f bytes/s %7.1f us/line  rx %5.1f  starved %i x, %.2f s' % (
+        '%s/%s' % (r['workload'], r['engine']), r['lines'], r['lines_per_s'], r['bytes_per_s'],
+        r['host_cpu_per_line_us'], r['rx_fill'].get('mean', 0.0), r['starvation']['count'],
+        r['starvation']['total']))
+
+
+def _compare(results, fn):
+    with open(fn) as f:
+        old = {(r['workload'], r['lines']): r for r in json.load(f)['results']}
+    print('compared to %s:' % fn)
+    for r in results:
+        o = old.get((r['workload'], r['lines']))
+        if o is None:
+            continue
+        engine = r['engine'] if r['engine'] == o['engine'] else '%s->%s' % (o['engine'], r['engine'])
+        print('%-24s %9i lines  lines/s x%.3f  us/line x%.3f  starved %+i' % (
+            '%s/%s' % (r['workload'], engine), r['lines'],
+            r['lines_per_s'] / o['lines_per_s'] if o['lines_per_s'] else float('nan'),
+            r['host_cpu_per_line_us'] / o['host_cpu_per_line_us'] if o['host_cpu_per_line_us'] else float('nan'),
+            r['starvation']['count'] - o['starvation']['count']))
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Benchmark g-code streaming against a simulated grbl.')
+    parser.add_argument('-w', '--workloads', default=','.join(sorted(WORKLOADS)),
+            help='comma separated synthetic workloads (default: %(default)s)')
+    parser.add_argument('-n', '--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+            help='comma separated numbers of lines per workload, up to 10000000 (default: %(default)s)')
+    parser.add_argument('--feed', type=float, default=3000.0,
+            help='feed rate (mm/min) of the synthetic workloads (default: %(default)s)')
+    parser.add_argument('-f', '--file', action='append', default=[],
+            help='also stream this g-code file, can be given more than once')
+    parser.add_argument('-e', '--engine', choices=('streamer', 'worker'), default='streamer',
+            help='GrblStreamer directly, or the SerialWorker thread of the GUI (default: %(default)s)')
+    parser.add_argument('--host-scale', type=float, default=1.0,
+            help='host CPU time factor, to guess at a slower computer (default: %(default)s)')
+    parser.add_argument('-s', '--settings', type=argparse.FileType('r'),
+            help="file with the output of grbl's '$$' for the simulated machine (default: polar defaults)")
+    parser.add_argument('-o', '--output',
+            help='JSON file to write the results to')
+    parser.add_argument('--compare',
+            help='JSON file of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    runs = []
+    for name in args.workloads.split(','):
+        if name not in WORKLOADS:
+            parser.error('unknown workload %r' % name)
+        for n in args.sizes.split(','):
+            runs.append((name, WORKLOADS[name](int(n), feed=args.feed)))
+    for fn in args.file:
+        gcodefile = GcodeFile(fn)
+        runs.append(('file:%s' % os.path.basename(fn), gcodefile))
+
+    simulator_kwargs = {}
+    if args.settings is not None:
+        with args.settings as f:
+            simulator_kwargs['settings'] = parse_settings(f)
+
+    results = []
+    for name, lines in runs:
+        result = run_benchmark(name, lines, engine=args.engine, host_scale=args.host_scale,
+                               simulator_kwargs=simulator_kwargs)
+        results.append(result)
+        _print_result(result)
+        if isinstance(lines, GcodeFile):
+            lines.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'version': RESULTS_VERSION, 'commit': _git_commit(),
+                       'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'host_scale': args.host_scale,
+                       'settings': {str(k): v for k, v in sorted(simulator_kwargs.get('settings', {}).items())},
+                       'results': results}, f, indent=1)
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Checkpoints of running streams, to resume interrupted jobs
+
+The checkpoint follows the acknowledged lines: it keeps the modal state
+grbl's parser has after the last of them (units, G90/G91, motion mode,
+feed, S, spindle, coordinate system, G92 offset) and the position, and
+saves it with the line number and the hash of the file as a small JSON
+file every few seconds, next to the g-code file or in a directory of
+checkpoints. A checkpoint which can't be written doesn't stop the stream.
+
+To resume, a preamble lifts the pen, restores the modes and offsets,
+travels to the position of the last acknowledged line with the pen up,
+and restores the pen and feed. Then the file continues from the next
+line, straight from the line offset index of the GcodeFile.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import itertools
+from toolpathcache import CACHE_DIR, content_hash
+
+
+CHECKPOINT_INTERVAL = 5.0  # s between checkpoint saves
+CHECKPOINT_VERSION = 1
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'checkpoints')  # for checkpoints not kept next to the files
+
+_WORD = re.compile(r'([A-Z])([-+]?[0-9]*\.?[0-9]*)')
+_MOTION_WORD = re.compile(r'G0*[0-3](?![0-9.])')
+# non-modal G codes whose axis words are no move (G4, G10, G92) or a move to unknown positions (G28, G30, G53)
+_NON_MOTION_G = (4, 10, 28, 30, 53, 92)
+
+
+def checkpoint_filename(fn, directory=None):
+    """Checkpoint file of the g-code file fn, next to it or in directory."""
+    if directory is None:
+        return fn + '.checkpoint.json'
+    # files of the same name in different folders get their own checkpoints
+    key = hashlib.sha1(os.path.abspath(fn).encode()).hexdigest()[:8]
+    return os.path.join(directory, '%s.%s.checkpoint.json' % (os.path.basename(fn), key))
+
+
+class ModalState(object):
+    """Modal state and position of grbl's g-code parser, updated line by line.
+
+    Positions are in the program's coordinates, the frame of the active
+    coordinate system shifted by g92. They are None after moves to
+    positions the host can't know (G28, G30, G53).
+    """
+
+    def __init__(self):
+        """Initialise to the state after grbl's reset."""
+        self.units = 21
+        self.distance = 90
+        self.motion = 0
+        self.feed = None
+        self.s = 0.0
+        self.spindle = 5
+        self.coord_system = 54
+        self.g92 = [0.0, 0.0]
+        self.x = 0.0
+        self.y = 0.0
+
+    def update(self, line):
+        """Apply a cleaned line, acknowledged with 'ok'."""
+        words = _WORD.findall(line)
+        if not words:
+            return
+        axes = {}
+        non_motion = None
+        for letter, value in words:
+            try:
+                v = float(value)
+            except ValueError:
+                continue
+            if letter == 'G':
+                if v in (0, 1, 2, 3):
+                    self.motion = int(v)
+                elif v in (20, 21):
+                    self.units = int(v)
+                elif v in (90, 91):
+                    self.distance = int(v)
+                elif 54 <= v <= 59:
+                    self.coord_system = int(v)
+                elif v == 92.1:
+                    self.x, self.y = self._shift(self.g92)
+                    self.g92 = [0.0, 0.0]
+                elif v in _NON_MOTION_G:
+                    non_motion = int(v)
+            elif letter == 'M':
+                if v in (3, 4, 5):
+                    self.spindle = int(v)
+                elif v in (2, 30):
+                    # program end, see gc_execute_line
+                    self.motion = 1
+                    self.distance = 90
+                    self.coord_system = 54
+                    self.spindle = 5
+            elif letter == 'F':
+                self.feed = v
+            elif letter == 'S':
+                self.s = v
+            elif letter in 'XY':
+                axes[letter] = v
+        if not axes:
+            return
+        if non_motion == 92:
+            # the current point gets the given coordinates
+            x = axes.get('X', self.x)
+            y = axes.get('Y', self.y)
+            if self.x is not None:
+                self.g92 = [self.g92[0] + self.x - x, self.g92[1] + self.y - y]
+            self.x, self.y = x, y
+        elif non_motion in (28, 30, 53):
+            self.x = self.y = None
+        elif non_motion is None and self.x is not None:
+            if self.distance == 91:
+                self.x += axes.get('X', 0.0)
+                self.y += axes.get('Y', 0.0)
+            else:
+                self.x = axes.get('X', self.x)
+                self.y = axes.get('Y', self.y)
+
+    def _shift(self, offset):
+        if self.x is None:
+            return None, None
+        return self.x + offset[0], self.y + offset[1]
+
+    def to_dict(self):
+        """For JSON."""
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d):
+        """From to_dict."""
+        state = cls()
+        state.__dict__.update(d)
+        return state
+
+    def preamble(self, pen_up='M5'):
+        """Lines which bring a reset grbl into this state, with a pen-up travel to the position."""
+        if self.x is None:
+            raise ValueError('position unknown after G28/G30/G53')
+        x, y = self._shift(self.g92)
+        lines = [pen_up, 'G%i G90 G%i' % (self.units, self.coord_system), 'G92.1', 'G0 X%.4f Y%.4f' % (x, y)]
+        if self.g92 != [0.0, 0.0]:
+            lines.append('G92 X%.4f Y%.4f' % (self.x, self.y))
+        lines.append('M%i S%g' % (self.spindle, self.s))
+        modes = 'G%i' % self.distance
+        if self.motion in (0, 1):
+            modes += ' G%i' % self.motion
+        if self.feed is not None:
+            modes += ' F%g' % self.feed
+        lines.append(modes)
+        return lines
+
+
+class StreamCheckpoint(object):
+    """Follow the acknowledged lines of a stream of a GcodeFile and save them as checkpoints.
+
+    Set as the checkpoint of a GrblStreamer. The first skip lines of the
+    stream are a preamble, the following ones the lines of the file from
+    start on. on_message(text) is told once when saving fails, called from
+    the streaming thread.
+    """
+
+    def __init__(self, gcode, fn=None, start=0, skip=0, modal=None, file_hash=None,
+                 interval=CHECKPOINT_INTERVAL, clock=time.time):
+        """Initialise, the checkpoint is saved to fn, by default next to the g-code file."""
+        self.gcode = gcode
+        self.fn = checkpoint_filename(gcode.fn) if fn is None else fn
+        self.start = start
+        self.skip = skip
+        self.modal = ModalState() if modal is None else modal
+        self.file_hash = content_hash(gcode.fn) if file_hash is None else file_hash
+        self.interval = interval
+        self.clock = clock
+        self.line = start  # the next line to send after a resume
+        self.errors = 0
+        self.on_message = None
+        self.save_error = None  # the OSError of the last save, None if it worked
+        self._saved = clock()
+
+    def on_ack(self, n, response):
+        """Line n of the stream was acknowledged."""
+        if n < self.skip:
+            return
+        line = self.start + n - self.skip
+        if response.startswith('ok'):
+            self.modal.update(self.gcode[line])
+        else:
+            self.errors += 1
+        self.line = line + 1
+        if self.clock() - self._saved >= self.interval:
+            self.save()
+
+    def save(self):
+        """Write the checkpoint, atomically, returns False if that failed (see save_error)."""
+        self._saved = self.clock()
+        data = {'version': CHECKPOINT_VERSION, 'file': os.path.abspath(self.gcode.fn), 'hash': self.file_hash,
+                'line': self.line, 'lines': len(self.gcode), 'errors': self.errors, 'time': time.time(),
+                'modal': self.modal.to_dict()}
+        tmp = self.fn + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.fn)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.fn)
+        except OSError as e:
+            # e.g. a read-only folder, the plot goes on without checkpoints
+            if self.save_error is None and self.on_message is not None:
+                self.on_message('checkpoint not saved to %s: %s' % (self.fn, e))
+            self.save_error = e
+            return False
+        self.save_error = None
+        return True
+
+    def remove(self):
+        """Remove the checkpoint file, after the job is finished."""
+        try:
+            os.remove(self.fn)
+        except OSError:
+            pass
+
+
+def load_checkpoint(fn):
+    """Checkpoint dict from file fn, None if there is none."""
+    try:
+        with open(fn, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != CHECKPOINT_VERSION:
+        return None
+    data['modal'] = ModalState.from_dict(data['modal'])
+    return data
+
+
+class ResumedLines(object):
+    """The preamble and the lines of a GcodeFile from start on, with len() for the stream progress."""
+
+    def __init__(self, gcode, start, preamble):
+        """Initialise."""
+        self.gcode = gcode
+        self.start = start
+        self.preamble = preamble
+
+    def __len__(self):
+        return len(self.preamble) + len(self.gcode) - self.start
+
+    def __iter__(self):
+        return itertools.chain(self.preamble, self.gcode.lines(self.start))
+
+
+def resume(gcode, checkpoint_fn=None, pen_up='M5', file_hash=None, **kwargs):
+    """Lines to resume an interrupted stream of GcodeFile gcode, and a StreamCheckpoint to follow them.
+
+    Raises ValueError if there is no checkpoint, or it is of another file
+    or version of the file. file_hash is the content_hash of the file, if
+    known already.
+    """
+    checkpoint_fn = checkpoint_filename(gcode.fn) if checkpoint_fn is None else checkpoint_fn
+    data = load_checkpoint(checkpoint_fn)
+    if data is None:
+        raise ValueError('no checkpoint %s' % checkpoint_fn)
+    if file_hash is None:
+        file_hash = content_hash(gcode.fn)
+    if data['hash'] != file_hash:
+        raise ValueError('%s has changed since the checkpoint' % gcode.fn)
+    start = data['line']
+    modal = data['modal']
+    preamble = modal.preamble(pen_up)
+    skip = len(preamble)
+    checkpoint = StreamCheckpoint(gcode, checkpoint_fn, start, skip, modal, file_hash, **kwargs)
+    if start < len(gcode) and modal.motion in (2, 3) and not _MOTION_WORD.search(gcode[start]):
+        # a bare G2/G3 is an error, the motion mode goes with the first line instead
+        preamble.append('G%i %s' % (modal.motion, gcode[start]))
+        start += 1
+    return ResumedLines(gcode, start, preamble), checkpoint
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Per-line telemetry of a g-code stream
+
+Records the send and acknowledge time of every line, the bytes in grbl's
+rx buffer after sending it and the response code, and samples the status
+reports arriving meanwhile. Everything goes into preallocated numpy
+arrays, used as rings for streams of unknown length, so recording costs
+a few array stores per line. Exported as CSV or as columnar .npz.
+
+The summary over the last seconds tells where a slow stream waits:
+    host     grbl's rx buffer runs low, the host doesn't send fast enough
+    link     the bytes/s get close to what the baud rate can carry
+    grbl     the rx buffer stays full, grbl parses and moves as fast as it
+             can, the planner is the limit
+Set a StreamTelemetry as the telemetry of a GrblStreamer to record.
+
+version history:
+2026-10-18: created this
+"""
+
+import time
+import numpy as np
+from grblstreamer import RX_BUFFER_SIZE
+from grblstatus import STATES, STATUS_OK, status_code
+
+
+DEFAULT_CAPACITY = 1 << 20  # lines kept of streams of unknown length
+STATUS_CAPACITY = 1 << 16  # status reports kept
+NO_ACK = -1  # response of lines not acknowledged (yet)
+UNKNOWN_ERROR = 999  # response of an error text which isn't grbl's
+
+LINE_COLUMNS = ('line', 't_send', 't_ack', 'bytes', 'in_flight', 'response')
+STATUS_COLUMNS = ('time', 'state', 'a', 'b', 'x', 'y', 'buf', 'rx')
+
+
+class StreamTelemetry(object):
+    """Per-line timing of a stream and the status reports, times in s since the start."""
+
+    def __init__(self, nlines=None, rx_buffer_size=RX_BUFFER_SIZE, baudrate=115200,
+                 capacity=DEFAULT_CAPACITY, status_capacity=STATUS_CAPACITY, clock=time.perf_counter):
+        """Initialise for nlines lines, or for a ring of the last capacity lines if the length is unknown."""
+        self.capacity = capacity if nlines is None else max(nlines, 1)
+        self.rx_buffer_size = rx_buffer_size
+        self.baudrate = baudrate
+        self.clock = clock
+        self.t_send = np.empty(self.capacity)
+        self.t_ack = np.empty(self.capacity)
+        self.nbytes = np.empty(self.capacity, np.int32)
+        self.in_flight = np.empty(self.capacity, np.int32)
+        self.response = np.empty(self.capacity, np.int16)
+        self.status_capacity = status_capacity
+        self.status = np.empty((status_capacity, len(STATUS_COLUMNS)))
+        self.reset()
+
+    def reset(self):
+        """Forget everything and restart the clock."""
+        self.t0 = self.clock()
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.statuses = 0
+        self.t_ack.fill(np.nan)
+        self.response.fill(NO_ACK)
+
+    def on_send(self, n, length, buffered):
+        """Line n of length bytes was written, with buffered bytes in grbl's rx buffer now."""
+        k = n % self.capacity
+        self.t_send[k] = self.clock() - self.t0
+        self.t_ack[k] = np.nan
+        self.nbytes[k] = length
+        self.in_flight[k] = buffered
+        self.response[k] = NO_ACK
+        self.sent = n + 1
+
+    def on_ack(self, n, response):
+        """Line n was acknowledged with response."""
+        k = n % self.capacity
+        self.t_ack[k] = self.clock() - self.t0
+        code = status_code(response)
+        self.response[k] = UNKNOWN_ERROR if code is None else code
+        if code != STATUS_OK:
+            self.errors += 1
+        self.acked = n + 1
+
+    def on_status(self, status):
+        """Sample a status report, a grblstatus.MachineStatus."""
+        row = self.status[self.statuses % self.status_capacity]
+        row[0] = self.clock() - self.t0
+        row[1] = STATES.index(status.state)
+        row[2:4] = status.spos[:2] if status.spos is not None else (np.nan, np.nan)
+        row[4:6] = status.gpos[:2] if status.gpos is not None else (np.nan, np.nan)
+        row[6] = -1 if status.buf is None else status.buf
+        row[7] = -1 if status.rx is None else status.rx
+        self.statuses += 1
+
+    def _recent(self, count, capacity, limit=None):
+        """Ring positions of the last lines in order, at most limit of them."""
+        first = max(count - capacity, 0 if limit is None else count - limit, 0)
+        return np.arange(first, count), np.arange(first, count) % capacity
+
+    def columns(self):
+        """Dict of the recorded lines, in order, and of the status reports, as arrays."""
+        lines, k = self._recent(self.sent, self.capacity)
+        result = {'line': lines, 't_send': self.t_send[k], 't_ack': self.t_ack[k], 'bytes': self.nbytes[k],
+                  'in_flight': self.in_flight[k], 'response': self.response[k]}
+        n, k = self._recent(self.statuses, self.status_capacity)
+        for c, name in enumerate(STATUS_COLUMNS):
+            result['status_' + name] = self.status[k, c]
+        return result
+
+    def save(self, fn):
+        """Export to fn, columnar .npz or .csv, the status reports of CSV go to a second file *_status.csv."""
+        columns = self.columns()
+        if fn.endswith('.npz'):
+            np.savez_compressed(fn, **columns)
+            return
+        np.savetxt(fn, np.column_stack([columns[name] for name in LINE_COLUMNS]), delimiter=',',
+                   fmt=['%i', '%.6f', '%.6f', '%i', '%i', '%i'], header=','.join(LINE_COLUMNS), comments='')
+        base = fn[:-4] if fn.endswith('.csv') else fn
+        np.savetxt(base + '_status.csv', np.column_stack([columns['status_' + name] for name in STATUS_COLUMNS]),
+                   delimiter=',', fmt=['%.6f', '%i', '%.3f', '%.3f', '%.3f', '%.3f', '%i', '%i'],
+                   header=','.join(STATUS_COLUMNS), comments='')
+
+    def summary(self, window=10.0, now=None):
+        """Rates and where the stream waits, over the last window seconds."""
+        now = self.clock() - self.t0 if now is None else now
+        # acknowledges come in order, so the acknowledge times of the recent lines are sorted
+        lines, k = self._recent(self.acked, self.capacity, limit=1 << 16)
+        k = k[np.searchsorted(self.t_ack[k], now - window):]
+        acked = len(k)
+        span = min(window, now) if now > 0 else 0.0
+        result = {'lines': self.acked, 'errors': self.errors, 'window': span,
+                  'lines_per_s': len(k) / span if span else 0.0,
+                  'bytes_per_s': float(self.nbytes[k].sum()) / span if span else 0.0,
+                  'in_flight': float(self.in_flight[k].mean()) if len(k) else 0.0,
+                  'latency_p50': float(np.percentile(self.t_ack[k] - self.t_send[k], 50)) if len(k) else 0.0,
+                  'latency_p95': float(np.percentile(self.t_ack[k] - self.t_send[k], 95)) if len(k) else 0.0}
+        # 8N1, 10 bits on the wire per byte
+        result['link_load'] = result['bytes_per_s'] * 10.0 / self.baudrate
+        result['rx_fill'] = result['in_flight'] / (self.rx_buffer_size - 1)
+        n, ks = self._recent(self.statuses, self.status_capacity, limit=1 << 12)
+        status = self.status[ks]
+        status = status[status[:, 0] >= now - window]
+        result['statuses'] = len(status)
+        result['idle_fraction'] = float((status[:, 1] == STATES.index('Idle')).mean()) if len(status) else 0.0
+        buf = status[status[:, 6] >= 0, 6]
+        result['planner_blocks'] = float(buf.mean()) if len(buf) else None
+        if not acked:
+            result['bottleneck'] = None
+        elif result['link_load'] > 0.9:
+            result['bottleneck'] = 'link'
+        elif result['rx_fill'] > 0.75:
+            result['bottleneck'] = 'grbl'
+        else:
+            result['bottleneck'] = 'host'
+        return result
+
+    def summary_text(self, window=10.0):
+        """One line summary for the GUI and the console."""
+        s = self.summary(window)
+        text = '%i lines, %i errors, %.1f lines/s, %.0f bytes/s, link %.0f%%, rx buffer %.0f%%, latency %.0f/%.0f ms' % (
+            s['lines'], s['errors'], s['lines_per_s'], s['bytes_per_s'], 100*s['link_load'], 100*s['rx_fill'],
+            1e3*s['latency_p50'], 1e3*s['latency_p95'])
+        if s['statuses']:
+            text += ', idle %.0f%%' % (100*s['idle_fraction'])
+        if s['planner_blocks'] is not None:
+            text += ', planner %.1f blocks' % s['planner_blocks']
+        if s['bottleneck'] is not None:
+            text += ', waiting for the %s' % s['bottleneck']
+        return text
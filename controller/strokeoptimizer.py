@@ -0,0 +1,625 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Pen-up travel optimization: reorder and join the strokes of a g-code file
+
+The toolpath is split into strokes, runs of pen down moves. Their order
+(and optionally their direction) is chosen with a greedy nearest neighbour
+pass on a k-d tree of the stroke end points, then improved with 2-opt
+moves between strokes at most `window` positions apart. The tree adapts
+to the density of the drawing, so clustered strokes are as fast as evenly
+spread ones, and both passes take about n log n for n strokes. Strokes
+which start where the previous one ends are joined, saving the pen lift.
+The result is written out as g-code again, installed as the
+vplotter-optimize console script.
+
+The travel cost is the straight line distance in work coordinates.
+
+version history:
+2026-10-18: created this
+"""
+
+import re
+import sys
+import time
+import argparse
+import numpy as np
+from gcodeparser import parse_gcode
+from gcodefile import GcodeFile, clean_line
+from plannersim import PlannerSimulator
+
+
+# lines between the moves which are written anew for the new order
+_PEN_COMMAND = re.compile(r'^(?:M0*[345](?![0-9])|S[-+]?[0-9.]+|\s)+$')
+_DWELL = re.compile(r'^G0*4\s*P[-+]?[0-9.]+$')
+_DISTANCE_MODE = re.compile(r'^(?:G9[01](?![0-9.])|\s)+$')
+
+
+def pen_down(toolpath):
+    """True for the moves which draw.
+
+    Files which switch the pen with M3/M5 draw whenever the spindle is on,
+    files without spindle commands draw with every G1/G2/G3 move.
+    """
+    spindle = np.asarray(toolpath['spindle'])
+    if spindle.any():
+        return spindle != 0
+    return np.asarray(toolpath['motion']) != 0
+
+
+def pen_lifts(toolpath):
+    """Number of times the pen is lifted and put down again, between moves."""
+    draw = pen_down(toolpath)
+    return int(np.count_nonzero(draw[1:] & ~draw[:-1] & np.logical_or.accumulate(draw)[:-1]))
+
+
+def split_strokes(toolpath):
+    """First and last+1 toolpath row of every stroke.
+
+    A stroke also ends where the pen setting (S) changes.
+    """
+    draw = pen_down(toolpath)
+    s = np.asarray(toolpath['s'])
+    begin = draw.copy()
+    begin[1:] &= ~draw[:-1] | (s[1:] != s[:-1])
+    first = np.flatnonzero(begin)
+    end = draw.copy()
+    end[:-1] &= ~draw[1:] | begin[1:]
+    last = np.flatnonzero(end) + 1
+    return first, last
+
+
+def stroke_ends(toolpath, first, last, start=(0.0, 0.0)):
+    """Start and end points (n, 2) of the strokes."""
+    x = np.concatenate(([start[0]], toolpath['x']))
+    y = np.concatenate(([start[1]], toolpath['y']))
+    return np.column_stack((x[first], y[first])), np.column_stack((x[last], y[last]))
+
+
+def travel_length(starts, ends, order, flipped, start=(0.0, 0.0)):
+    """Total pen-up travel (mm) for strokes taken in order, flipped ones end to start."""
+    s = np.where(flipped[:, None], ends[order], starts[order])
+    e = np.where(flipped[:, None], starts[order], ends[order])
+    e = np.concatenate((np.array([start], dtype=np.float64), e[:-1]))
+    return float(np.hypot(*(s - e).T).sum())
+
+
+BRUTE_FORCE_POINTS = 64  # below this many points left, nearest neighbours are searched without the tree
+LEAF_POINTS = 16  # points per leaf of the k-d tree at most
+
+
+class _KdTree(object):
+    """End points in a k-d tree, for nearest neighbour searches.
+
+    Nodes are split at the median of their longer side, so dense clusters
+    get small cells and no leaf has more than LEAF_POINTS points. Every
+    node counts the points of strokes not done yet, empty subtrees are
+    skipped. The nodes are lists indexed by node number, node 0 is the root.
+    """
+
+    def __init__(self, points, ids):
+        self.box = []  # x0, y0, x1, y1 of the points in the node
+        self.split = []  # (axis, value) of inner nodes, None for leaves
+        self.children = []  # (below, above) of inner nodes
+        self.leaf = []  # [(id, x, y), ...] of leaves, None for inner nodes
+        self.parent = []
+        self.live = []
+        self.leaf_of = {}  # leaf of every point id
+        stack = [(-1, 0, np.arange(len(points)))]
+        while stack:
+            parent, side, idx = stack.pop()
+            node = len(self.box)
+            pts = points[idx]
+            lo = pts.min(axis=0).tolist()
+            hi = pts.max(axis=0).tolist()
+            self.box.append((lo[0], lo[1], hi[0], hi[1]))
+            self.parent.append(parent)
+            self.live.append(len(idx))
+            self.children.append(None)
+            if parent >= 0:
+                children = self.children[parent]
+                self.children[parent] = (node, children[1]) if side == 0 else (children[0], node)
+            axis = 0 if hi[0] - lo[0] >= hi[1] - lo[1] else 1
+            if len(idx) <= LEAF_POINTS or hi[axis] == lo[axis]:
+                self.split.append(None)
+                leaf_ids = ids[idx].tolist()
+                self.leaf.append(list(zip(leaf_ids, pts[:, 0].tolist(), pts[:, 1].tolist())))
+                for pid in leaf_ids:
+                    self.leaf_of[pid] = node
+                continue
+            half = len(idx) // 2
+            part = np.argpartition(pts[:, axis], half)
+            self.split.append((axis, float(pts[part[half], axis])))
+            self.leaf.append(None)
+            self.children[node] = (-1, -1)
+            stack.append((node, 1, idx[part[half:]]))
+            stack.append((node, 0, idx[part[:half]]))
+
+    def remove(self, pid):
+        """Count the point as done, if it is in the tree."""
+        node = self.leaf_of.pop(pid, -1)
+        while node >= 0:
+            self.live[node] -= 1
+            node = self.parent[node]
+
+    def nearest(self, px, py, done, n):
+        """Id of the nearest point whose stroke (id % n) is not done, None if there is none."""
+        box = self.box
+        live = self.live
+        best = None
+        best_d = float('inf')
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not live[node]:
+                continue
+            x0, y0, x1, y1 = box[node]
+            dx = x0 - px if px < x0 else (px - x1 if px > x1 else 0.0)
+            dy = y0 - py if py < y0 else (py - y1 if py > y1 else 0.0)
+            if dx*dx + dy*dy >= best_d:
+                continue
+            leaf = self.leaf[node]
+            if leaf is not None:
+                if live[node] != len(leaf):
+                    self.leaf[node] = leaf = [q for q in leaf if not done[q[0] % n]]
+                for pid, x, y in leaf:
+                    d = (x - px)**2 + (y - py)**2
+                    if d < best_d:
+                        best, best_d = pid, d
+                continue
+            axis, value = self.split[node]
+            below, above = self.children[node]
+            # the side of the point last, so it is searched first
+            if (px if axis == 0 else py) < value:
+                stack.append(above)
+                stack.append(below)
+            else:
+                stack.append(below)
+                stack.append(above)
+        return best
+
+
+def nearest_neighbour_order(starts, ends, reverse=True, start=(0.0, 0.0)):
+    """Greedy order of the strokes, always continuing with the closest stroke end.
+
+    With reverse, a stroke can be entered at its end and drawn backwards.
+    Returns the order and the flipped flags in that order.
+    """
+    n = len(starts)
+    points = np.concatenate((starts, ends)) if reverse else starts
+    done = [False] * n
+    order = np.empty(n, np.int64)
+    flipped = np.zeros(n, bool)
+    ends_list = ends.tolist()
+    starts_list = starts.tolist()
+
+    px, py = start
+    tree = None
+    rebuild_at = n
+    for k in range(n):
+        remaining = n - k
+        if remaining <= rebuild_at:
+            # rebuild with the remaining points, so the boxes of the nodes stay tight
+            ids = np.flatnonzero(~np.tile(done, 2 if reverse else 1))
+            pts = points[ids]
+            if len(pts) <= BRUTE_FORCE_POINTS:
+                tree = None
+                rebuild_at = -1
+            else:
+                tree = _KdTree(pts, ids)
+                rebuild_at = remaining // 2
+        if tree is None:
+            d = (pts[:, 0] - px)**2 + (pts[:, 1] - py)**2
+            d[np.asarray(done)[ids % n]] = np.inf
+            p = int(ids[np.argmin(d)])
+        else:
+            p = tree.nearest(px, py, done, n)
+        i = p % n
+        done[i] = True
+        if tree is not None:
+            tree.remove(i)
+            tree.remove(i + n)
+        order[k] = i
+        flipped[k] = p >= n
+        px, py = starts_list[i] if p >= n else ends_list[i]
+    return order, flipped
+
+
+def _dist(a, b):
+    return np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1])
+
+
+def two_opt(starts, ends, order, flipped, reverse=True, start=(0.0, 0.0), window=32, max_passes=10, rtol=1e-3):
+    """Improve a stroke order with 2-opt moves, reversing runs of up to window strokes.
+
+    With reverse the strokes of a reversed run are flipped, otherwise they
+    keep their direction and only their order is reversed. Stops when a pass
+    gains less than rtol of the travel.
+    Returns the new order and flipped flags.
+    """
+    order = order.copy()
+    flipped = flipped.copy()
+    n = len(order)
+    # S, E: entry and exit point of every position, position 0 is the start point
+    S = np.concatenate(([start], np.where(flipped[:, None], ends[order], starts[order])))
+    E = np.concatenate(([start], np.where(flipped[:, None], starts[order], ends[order])))
+    for npass in range(max_passes):
+        total = _dist(E[:-1], S[1:]).sum()
+        gained = 0.0
+        for d in range(1, min(window, n - 1) + 1):
+            # travel from every position to the next, 0 after the last
+            edge = np.append(_dist(E[:-1], S[1:]), 0.0)
+            # reverse the run of positions i+1..j, for all i at once
+            i = np.arange(0, n - d + 1)
+            j = i + d
+            has_next = j < n
+            jn = np.minimum(j + 1, n)
+            old = edge[i] + edge[j]
+            if reverse:
+                new = _dist(E[i], E[j]) + np.where(has_next, _dist(S[i + 1], S[jn]), 0.0)
+            else:
+                # the travel inside the run changes as well
+                inner = np.concatenate(([0.0], np.cumsum(edge[1:n])))
+                inner_rev = np.concatenate(([0.0], np.cumsum(_dist(E[2:], S[1:-1]))))
+                old += inner[j - 1] - inner[i]
+                new = (_dist(E[i], S[j]) + np.where(has_next, _dist(E[i + 1], S[jn]), 0.0) +
+                       inner_rev[j - 1] - inner_rev[i])
+            gain = old - new
+            candidates = np.flatnonzero(gain > 1e-9)
+            # apply non-overlapping moves from the left
+            taken_end = -1
+            for c in candidates.tolist():
+                if c <= taken_end:
+                    continue
+                a, b = c, c + d  # positions a+1..b in S/E are order[a:b]
+                order[a:b] = order[a:b][::-1].copy()
+                if reverse:
+                    flipped[a:b] = ~flipped[a:b][::-1]
+                    S[a+1:b+1], E[a+1:b+1] = E[a+1:b+1][::-1].copy(), S[a+1:b+1][::-1].copy()
+                else:
+                    flipped[a:b] = flipped[a:b][::-1].copy()
+                    S[a+1:b+1] = S[a+1:b+1][::-1].copy()
+                    E[a+1:b+1] = E[a+1:b+1][::-1].copy()
+                taken_end = b
+                gained += gain[c]
+        if gained <= rtol * total:
+            break
+    return order, flipped
+
+
+def optimize_order(starts, ends, reverse=True, start=(0.0, 0.0), window=32):
+    """Nearest neighbour order improved by 2-opt, returns order and flipped flags."""
+    order, flipped = nearest_neighbour_order(starts, ends, reverse, start)
+    if len(order) > 2:
+        order, flipped = two_opt(starts, ends, order, flipped, reverse, start, window)
+    return order, flipped
+
+
+def expand_groups(gfirst, glast, order, flipped):
+    """Stroke order and flipped flags from the order of groups of consecutive strokes.
+
+    A flipped group is drawn from its last stroke on, every stroke flipped.
+    """
+    counts = (glast - gfirst)[order]
+    pos = np.concatenate(([0], np.cumsum(counts)))
+    k = np.repeat(np.arange(len(order)), counts)
+    offs = np.arange(pos[-1]) - pos[k]
+    fl = flipped[k]
+    strokes = np.where(fl, glast[order][k] - 1 - offs, gfirst[order][k] + offs)
+    return strokes, fl
+
+
+def _stroke_rows(toolpath, first, last, order, flipped, start=(0.0, 0.0)):
+    """Moves of the reordered strokes, reversed strokes mirrored.
+
+    Returns a toolpath array and the index of its first row of every stroke.
+    """
+    counts = (last - first)[order]
+    pos = np.concatenate(([0], np.cumsum(counts)))
+    k = np.repeat(np.arange(len(order)), counts)
+    offs = np.arange(pos[-1]) - pos[k]
+    fl = flipped[k]
+    f0 = first[order][k]
+    l0 = last[order][k]
+    rows = np.where(fl, l0 - 1 - offs, f0 + offs)
+    out = toolpath[rows].copy()
+    if fl.any():
+        x0 = np.concatenate(([start[0]], toolpath['x']))
+        y0 = np.concatenate(([start[1]], toolpath['y']))
+        r = rows[fl]
+        # a reversed move goes from the end to the start of the original move
+        out['x'][fl] = x0[r]
+        out['y'][fl] = y0[r]
+        arc = out['motion'][fl] >= 2
+        cx = x0[r] + toolpath['i'][r]
+        cy = y0[r] + toolpath['j'][r]
+        out['i'][fl] = np.where(arc, cx - toolpath['x'][r], 0.0)
+        out['j'][fl] = np.where(arc, cy - toolpath['y'][r], 0.0)
+        out['motion'][fl] = np.where(arc, 5 - out['motion'][fl], out['motion'][fl])
+    return out, pos[:-1]
+
+
+def stroke_joins(toolpath, first, last, order, flipped, tolerance, start=(0.0, 0.0)):
+    """True for the strokes (in order) which can be drawn without lifting the pen before them.
+
+    That is when they start within tolerance of the end of the previous
+    stroke, with the same pen setting.
+    """
+    starts, ends = stroke_ends(toolpath, first, last, start)
+    entry = np.where(flipped[:, None], ends[order], starts[order])
+    exit = np.where(flipped[:, None], starts[order], ends[order])
+    s = np.asarray(toolpath['s'])[first][order]
+    joined = np.zeros(len(order), bool)
+    joined[1:] = (_dist(entry[1:], exit[:-1]) <= tolerance) & (s[1:] == s[:-1])
+    return joined
+
+
+def stroke_gcode(toolpath, first, last, order, flipped, start=(0.0, 0.0), pen_up='M5', pen_down='M3 S%g',
+                 pen_dwell=0.0, joined=None, precision=3, extras=None, lift_dwell=None, down_dwells=None,
+                 final_pen_up=True):
+    """Generate the g-code lines of the strokes in the given order.
+
+    pen_down is formatted with the S value of the stroke. Files without
+    spindle commands get no pen commands. Joined strokes (see stroke_joins)
+    continue the previous one, bridged by a G1 move if there is a gap.
+    Moves which don't go anywhere at the output precision are dropped, F is
+    only written when it changes.
+
+    extras are the lines written before each stroke and down_dwells the
+    dwell lines after putting the pen down on it, lists by stroke, None for
+    none, see stroke_lines. lift_dwell is the dwell line after every pen
+    lift. A pen_dwell overrides the dwells. final_pen_up False leaves the
+    pen on the paper after the last stroke.
+    """
+    rows, begins = _stroke_rows(toolpath, first, last, order, flipped, start)
+    starts, ends = stroke_ends(toolpath, first, last, start)
+    entry = np.where(flipped[:, None], ends[order], starts[order])
+    entry_out = np.round(entry, precision)
+    if joined is None:
+        joined = np.zeros(len(order), bool)
+    use_pen = bool(np.asarray(toolpath['spindle']).any())
+
+    # zero length moves, arcs ending where they start are full circles
+    x = np.round(rows['x'], precision)
+    y = np.round(rows['y'], precision)
+    px = np.concatenate(([0.0], x[:-1]))
+    py = np.concatenate(([0.0], y[:-1]))
+    px[begins] = entry_out[:, 0]
+    py[begins] = entry_out[:, 1]
+    keep = (rows['motion'] >= 2) | (x != px) | (y != py)
+    stops = np.append(begins[1:], len(rows)).tolist()
+    rowlist = rows.tolist()
+    keeplist = keep.tolist()
+
+    fmt = '%%.%if' % precision
+    xy = 'X%s Y%s' % (fmt, fmt)
+    ij = ' I%s J%s' % (fmt, fmt)
+    def dwell(line):
+        if pen_dwell:
+            return ['G4 P%g' % pen_dwell]
+        return [] if line is None else [line]
+
+    lines = []
+    f_last = None
+    pos = None
+    orderlist = order.tolist()
+    for k, (b, e) in enumerate(zip(begins.tolist(), stops)):
+        p = tuple(entry_out[k].tolist())
+        f = rowlist[b][6] if b < e else f_last
+        if not joined[k] and k and use_pen:
+            lines.append(pen_up)
+            lines.extend(dwell(lift_dwell))
+        if extras is not None and extras[orderlist[k]]:
+            lines.extend(extras[orderlist[k]])
+            if any('F' in clean_line(line) for line in extras[orderlist[k]]):
+                f_last = None
+        if not joined[k]:
+            lines.append('G0 ' + xy % p)
+            if use_pen:
+                s = toolpath['s'][first[orderlist[k]]]
+                lines.append(pen_down % s if '%' in pen_down else pen_down)
+                lines.extend(dwell(None if down_dwells is None else down_dwells[orderlist[k]]))
+        elif p != pos:
+            # bridge the gap to the joined stroke
+            cmd = 'G1 ' + xy % p
+            if f == f and f != f_last:
+                cmd += ' F%g' % f
+                f_last = f
+            lines.append(cmd)
+        pos = p
+        for n in range(b, e):
+            if not keeplist[n]:
+                continue
+            line, motion, x, y, i, j, f, s, spindle = rowlist[n]
+            cmd = ('G%i ' + xy) % (motion, x, y)
+            if motion >= 2:
+                cmd += ij % (i, j)
+            if motion != 0 and f == f and f != f_last:
+                cmd += ' F%g' % f
+                f_last = f
+            lines.append(cmd)
+            pos = (round(x, precision), round(y, precision))
+    if len(order) and use_pen and final_pen_up:
+        lines.append(pen_up)
+        lines.extend(dwell(lift_dwell))
+    return lines
+
+
+def stroke_lines(gcodefile, toolpath, first, last, line0, nlines=None):
+    """The lines between the moves of the strokes, sorted to the strokes.
+
+    Returns extras, lift_dwell and down_dwells of stroke_gcode. extras are
+    the lines after the previous stroke up to the last move of each stroke,
+    starting at line0 for the first one. Pen commands are dropped, they are
+    written anew, and so is the distance mode. A dwell right after a pen
+    command is the dwell of that pen movement, every other line, comments
+    included, is an extra line of the stroke. The pen is put down on the
+    stroke that follows, so down dwells are kept by stroke. Lifts come
+    after a different stroke once reordered, so they all get the dwell
+    which most often follows a pen-up in the file, up to line nlines.
+    """
+    n = len(first)
+    extras = [[] for i in range(n)]
+    down_dwells = [None] * n
+    if not n:
+        return extras, None, down_dwells
+    last_lines = toolpath['line'][last - 1]
+    line1 = int(last_lines[-1]) + 1
+    moves = np.zeros(line1 - line0, bool)
+    rows = toolpath['line']
+    moves[rows[(rows >= line0) & (rows < line1)] - line0] = True
+    others = np.flatnonzero(~moves) + line0
+    owners = np.searchsorted(last_lines, others)
+    lift_dwells = {}
+    after = None  # the pen command the last line was
+    owner_last = -1
+    for m, i in zip(others.tolist(), owners.tolist()):
+        if i != owner_last:
+            after = None
+            owner_last = i
+        raw = gcodefile.raw(m).decode(errors='replace').rstrip('\r\n')
+        line = clean_line(raw)
+        if not raw.strip():
+            continue
+        if line and _PEN_COMMAND.match(line):
+            after = 'up' if re.search(r'M0*5(?![0-9])', line) else 'down'
+        elif line and _DWELL.match(line) and after is not None:
+            if after == 'down':
+                down_dwells[i] = line
+            else:
+                lift_dwells[line] = lift_dwells.get(line, 0) + 1
+            after = None
+        elif line and _DISTANCE_MODE.match(line):
+            continue
+        else:
+            extras[i].append(raw)
+            if line:
+                after = None
+    # lifts before the first and after the last stroke
+    after = None
+    for m in list(range(line0)) + list(range(line1, line1 if nlines is None else nlines)):
+        line = clean_line(gcodefile.raw(m).decode(errors='replace'))
+        if not line:
+            continue
+        if _PEN_COMMAND.match(line):
+            after = 'up' if re.search(r'M0*5(?![0-9])', line) else 'down'
+        else:
+            if after == 'up' and _DWELL.match(line):
+                lift_dwells[line] = lift_dwells.get(line, 0) + 1
+            after = None
+    lift_dwell = max(lift_dwells, key=lift_dwells.get) if lift_dwells else None
+    return extras, lift_dwell, down_dwells
+
+
+def optimize_gcode(fn_in, fn_out, reorder=True, reverse=True, window=32, merge_tolerance=0.01,
+                   pen_up='M5', pen_down='M3 S%g', pen_dwell=0.0, lift_time=0.3, settings=None):
+    """Write the g-code file fn_in with reordered and joined strokes to fn_out.
+
+    The lines before the first move and after the last stroke are kept, the
+    pen-up moves and pen commands in between are replaced. Other lines in
+    between, like comments, dwells and modal changes, go with the stroke
+    following them, see stroke_lines. Strokes starting within
+    merge_tolerance (mm) of the end of the previous one are joined, None
+    to keep all pen lifts.
+    Returns a dict with the number of pen lifts (see pen_lifts), the
+    pen-up travel and the job time simulated with the
+    planner model before and after. lift_time is the time of a pen
+    movement for the simulation.
+    """
+    sim = PlannerSimulator() if settings is None else PlannerSimulator.from_settings(settings)
+    sim.sync_time = lift_time
+    with GcodeFile(fn_in) as gcodefile:
+        toolpath, nlines = parse_gcode(gcodefile.data)
+        first, last = split_strokes(toolpath)
+        starts, ends = stroke_ends(toolpath, first, last)
+        order = np.arange(len(first))
+        flipped = np.zeros(len(first), bool)
+        before = travel_length(starts, ends, order, flipped)
+        t0 = time.time()
+        if reorder:
+            # strokes which continue each other are kept together while reordering
+            joined = np.zeros(len(order), bool)
+            if merge_tolerance is not None:
+                joined = stroke_joins(toolpath, first, last, order, flipped, merge_tolerance)
+            gfirst = np.flatnonzero(~joined)
+            glast = np.append(gfirst[1:], len(first))
+            gorder, gflipped = optimize_order(starts[gfirst], ends[glast - 1], reverse, window=window)
+            order, flipped = expand_groups(gfirst, glast, gorder, gflipped)
+        joined = np.zeros(len(order), bool)
+        if merge_tolerance is not None:
+            joined = stroke_joins(toolpath, first, last, order, flipped, merge_tolerance)
+        Dt = time.time() - t0
+        after = travel_length(starts, ends, order, flipped)
+        # keep the set up before the first move and everything after the last stroke
+        line0 = int(toolpath['line'][0]) if len(first) else nlines
+        line1 = int(toolpath['line'][last[-1] - 1]) + 1 if len(first) else nlines
+        extras, lift_dwell, down_dwells = stroke_lines(gcodefile, toolpath, first, last, line0, nlines)
+        # the pen-up the file ends with does the last lift
+        trailer = [line for line in gcodefile.lines(line1, line1 + 10) if line]
+        final_pen_up = not trailer or trailer[0] != clean_line(pen_up)
+        body = stroke_gcode(toolpath, first, last, order, flipped, pen_up=pen_up, pen_down=pen_down,
+                            pen_dwell=pen_dwell, joined=joined, extras=extras, lift_dwell=lift_dwell,
+                            down_dwells=down_dwells, final_pen_up=final_pen_up)
+        with open(fn_out, 'w') as file:
+            for n in range(line0):
+                file.write(gcodefile.raw(n).decode(errors='replace').rstrip('\r\n') + '\n')
+            if body:
+                file.write('G90\n')
+                file.write('\n'.join(body) + '\n')
+            for n in range(line1, nlines):
+                file.write(gcodefile.raw(n).decode(errors='replace').rstrip('\r\n') + '\n')
+        time_before = sim.line_times(toolpath, nlines)
+        lifts_before = pen_lifts(toolpath)
+    with GcodeFile(fn_out) as gcodefile:
+        toolpath, nlines = parse_gcode(gcodefile.data)
+        time_after = sim.line_times(toolpath, nlines)
+        lifts_after = pen_lifts(toolpath)
+    return {'strokes': len(first), 'lifts_before': lifts_before, 'lifts_after': lifts_after,
+            'travel_before': before, 'travel_after': after,
+            'time_before': float(time_before[-1]) if len(time_before) else 0.0,
+            'time_after': float(time_after[-1]) if len(time_after) else 0.0,
+            'optimize_time': Dt}
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Reorder the strokes of a g-code file to reduce pen-up travel.')
+    parser.add_argument('gcode_file',
+            help='g-code file to optimize')
+    parser.add_argument('output_file',
+            help='optimized g-code file to write')
+    parser.add_argument('--no-reorder', action='store_true', default=False,
+            help='keep the order of the strokes, only join them')
+    parser.add_argument('--no-reverse', action='store_true', default=False,
+            help='keep the drawing direction of every stroke')
+    parser.add_argument('--merge-tolerance', type=float, default=0.01,
+            help='join strokes starting this close (mm) to the end of the previous one (default: %(default)s)')
+    parser.add_argument('--no-merge', action='store_true', default=False,
+            help='keep all pen lifts')
+    parser.add_argument('--window', type=int, default=32,
+            help='max number of strokes reversed by one 2-opt move (default: %(default)s)')
+    parser.add_argument('--pen-up', default='M5',
+            help='pen up command (default: %(default)s)')
+    parser.add_argument('--pen-down', default='M3 S%g',
+            help='pen down command, %%g is replaced by the S value of the stroke (default: %(default)s)')
+    parser.add_argument('--pen-dwell', type=float, default=0.0,
+            help='dwell (s) after every pen command (default: %(default)s)')
+    parser.add_argument('--lift-time', type=float, default=0.3,
+            help='time (s) of a pen movement, for the job time simulation (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    result = optimize_gcode(args.gcode_file, args.output_file, reorder=not args.no_reorder,
+                            reverse=not args.no_reverse, window=args.window,
+                            merge_tolerance=None if args.no_merge else args.merge_tolerance,
+                            pen_up=args.pen_up, pen_down=args.pen_down, pen_dwell=args.pen_dwell,
+                            lift_time=args.lift_time)
+    print('%i strokes, optimized in %.1f s' % (result['strokes'], result['optimize_time']))
+    print('pen lifts: %i -> %i' % (result['lifts_before'], result['lifts_after']))
+    print('pen-up travel: %.0f mm -> %.0f mm' % (result['travel_before'], result['travel_after']))
+    print('simulated job time: %.0f s -> %.0f s, %.0f s saved' %
+          (result['time_before'], result['time_after'], result['time_before'] - result['time_after']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
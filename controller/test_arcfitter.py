@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests of arcfitter, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+import numpy as np
+from gcodeparser import parse_gcode
+from arcfitter import arcfit_gcode, fit_arcs
+
+
+def _circle(cx, cy, r, phi0, phi1, n):
+    phi = np.linspace(phi0, phi1, n + 1)
+    return cx + r*np.cos(phi), cy + r*np.sin(phi)
+
+
+def test_fit_quarter_circle():
+    x, y = _circle(0.0, 0.0, 50.0, 0.0, np.pi/2, 30)
+    # the polyline starts at the first point of the circle
+    first, stop, cx, cy, ccw = fit_arcs(x[1:], y[1:], np.ones(30, bool), start=(x[0], y[0]))
+    assert (first.tolist(), stop.tolist(), ccw.tolist()) == ([0], [30], [True])
+    assert abs(cx[0]) < 1e-6 and abs(cy[0]) < 1e-6
+
+
+def test_no_arcs_on_lines_and_s_curves():
+    x = np.arange(1.0, 21.0)
+    first, stop, cx, cy, ccw = fit_arcs(x, np.zeros(20), np.ones(20, bool))
+    assert len(first) == 0
+    x1, y1 = _circle(0.0, 10.0, 10.0, -np.pi/2, 0.0, 12)
+    x2, y2 = _circle(20.0, 10.0, 10.0, np.pi, np.pi/2, 12)
+    x, y = np.concatenate((x1[1:], x2[1:])), np.concatenate((y1[1:], y2[1:]))
+    first, stop, cx, cy, ccw = fit_arcs(x, y, np.ones(24, bool), start=(x1[0], y1[0]))
+    assert ccw.tolist() == [True, False]
+    assert stop[0] <= first[1]
+
+
+def test_arcfit_gcode(tmp_path):
+    fn_in = tmp_path / 'in.gcode'
+    fn_out = tmp_path / 'out.gcode'
+    x, y = _circle(0.0, 0.0, 20.0, 0.0, np.pi, 40)
+    with open(fn_in, 'w') as f:
+        f.write('G90\nG0 X%.4f Y%.4f\nG1 F1000\n' % (x[0], y[0]))
+        f.writelines('G1 X%.4f Y%.4f\n' % p for p in zip(x[1:], y[1:]))
+        # a bare axis word after the arc is a G1 again
+        f.write('X-30 Y-10\n')
+    result = arcfit_gcode(str(fn_in), str(fn_out))
+    assert result['arcs'] == 1
+    assert result['moves_replaced'] == 40
+    with open(fn_out) as f:
+        lines = f.read().splitlines()
+    assert lines[3].startswith('G3 X-20.000 Y0.000 I-20.000 J')
+    assert lines[4] == 'G1 X-30 Y-10'
+    with open(fn_in, 'rb') as f:
+        before, n = parse_gcode(f.read())
+    with open(fn_out, 'rb') as f:
+        after, n = parse_gcode(f.read())
+    assert np.allclose((after['x'][-1], after['y'][-1]), (before['x'][-1], before['y'][-1]))
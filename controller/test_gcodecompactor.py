@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests of gcodecompactor, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+from gcodecompactor import GcodeCompactor, format_number
+
+
+def _compact(lines, decimals=3):
+    compactor = GcodeCompactor(decimals)
+    return [compactor.compact(line) for line in lines]
+
+
+def test_format_number():
+    assert [format_number(v, 3) for v in (1.5, 0.25, -0.25, -3.0, 0.0, -0.0001, 2.0004)] == \
+        ['1.5', '.25', '-.25', '-3', '0', '0', '2']
+
+
+def test_modal_words_dropped():
+    out = _compact(['G90', 'G1 X10 Y10 F1000', 'G1 X10 Y20 F1000', 'G1 X10.0001 Y20', 'N10 G1 X0 Y0 S300'])
+    assert out == ['G90', 'G1X10Y10F1000', 'Y20', '', 'X0Y0S300']
+
+
+def test_relative_rounding_does_not_drift():
+    compactor = GcodeCompactor(3)
+    out = [compactor.compact('G1 X0.0004')] + [compactor.compact(line) for line in ['G91'] + ['G1 X0.0004'] * 1000]
+    total = sum(float(line.split('X')[1]) for line in out[2:] if 'X' in line)
+    assert abs(total - 0.4) < 1e-9
+
+
+def test_arc_keeps_axis_words():
+    out = _compact(['G0 X10 Y0', 'G2 X10 Y0 I-5 J0 F500', 'G3 X10 Y0 I-5.00001 J0'], decimals=1)
+    assert out == ['G0X10Y0', 'G2X10Y0I-5J0F500', 'G3X10Y0I-5J0']
+
+
+def test_dollar_command_forgets_position():
+    # $H moves the machine, the move back to the same coordinates must not be dropped
+    out = _compact(['G90', 'G1 X10 Y10 F1000', '$H', 'G1 X10 Y10 F1000'])
+    assert out == ['G90', 'G1X10Y10F1000', '$H', 'G1X10Y10F1000']
+
+
+def test_program_end_resets_modes():
+    compactor = GcodeCompactor(3)
+    out = [compactor.compact(line) for line in ('G1 X1 F1000', 'G91', 'G1 X1', 'M2', 'G1 X5 F1000', 'G1 X5')]
+    assert out == ['G1X1F1000', 'G91', 'X1', 'M2', 'G1X5F1000', '']
+    assert not compactor.relative
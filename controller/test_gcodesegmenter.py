@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests of gcodesegmenter, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+import numpy as np
+from gcodeparser import parse_gcode
+from gcodesegmenter import DEFAULT_TOLERANCE, segment_gcode
+
+
+def _segment(tmp_path, text):
+    fn_in = tmp_path / 'in.gcode'
+    fn_out = tmp_path / 'out.gcode'
+    fn_in.write_text(text)
+    result = segment_gcode(str(fn_in), str(fn_out))
+    with open(fn_out) as f:
+        lines = f.read().splitlines()
+    with open(fn_out, 'rb') as f:
+        toolpath, n = parse_gcode(f.read())
+    return result, lines, toolpath
+
+
+def test_long_line_within_tolerance(tmp_path):
+    result, lines, toolpath = _segment(tmp_path, 'G90\nG0 X-400 Y-600\nG1 X400 Y-600 F2000\nM5\n')
+    assert result['deviation_before'] > DEFAULT_TOLERANCE
+    assert result['deviation_after'] <= DEFAULT_TOLERANCE
+    assert result['moves_split'] == 1
+    assert lines[0:2] == ['G90', 'G0 X-400 Y-600'] and lines[-1] == 'M5'
+    assert lines[2].endswith(' F2000') and lines[3].startswith('G1 ') and 'F' not in lines[3]
+    assert (toolpath['x'][-1], toolpath['y'][-1]) == (400.0, -600.0)
+    # the pieces stay on the straight line
+    assert np.allclose(toolpath['y'], -600.0)
+
+
+def test_relative_pieces_add_up(tmp_path):
+    result, lines, toolpath = _segment(tmp_path, 'G0 X-400 Y-600\nG91\nG1 X800.0004 Y0.3 F2000\nG90\n')
+    assert result['moves_split'] == 1
+    # increments between rounded points, so the end point is the rounded target
+    assert abs(toolpath['x'][-1] - 400.0) < 1e-9
+    assert abs(toolpath['y'][-1] - -599.7) < 1e-9
+
+
+def test_other_words_left_alone(tmp_path):
+    text = 'G90\nG0 X-400 Y-600\nG1 X400 Y-600 F2000 M3\n'
+    result, lines, toolpath = _segment(tmp_path, text)
+    assert lines == text.splitlines()
+    assert result['moves_split'] == 0
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the character counting of grblstreamer, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+from collections import deque
+from grblstreamer import GrblStreamer, RX_BUFFER_SIZE
+
+
+class _FakeGrbl(object):
+    """Takes one line out of its rx buffer per readline, answers error for lines starting with 'BAD'."""
+
+    def __init__(self, reports=()):
+        self.rx = deque()
+        self.buffered = 0
+        self.peak = 0
+        self.reports = deque(reports)
+        self.in_waiting = 0
+
+    def write(self, data):
+        if data == b'?':
+            return
+        self.rx.append(data)
+        self.buffered += len(data)
+        self.peak = max(self.peak, self.buffered)
+        # grbl's ring buffer holds RX_BUFFER_SIZE-1 characters
+        assert self.buffered <= RX_BUFFER_SIZE - 1
+
+    def readline(self):
+        if self.reports:
+            return self.reports.popleft()
+        if not self.rx:
+            return b''
+        line = self.rx.popleft()
+        self.buffered -= len(line)
+        return b'error: Bad number format\r\n' if line.startswith(b'BAD') else b'ok\r\n'
+
+
+def test_rx_buffer_never_overflows():
+    ser = _FakeGrbl()
+    streamer = GrblStreamer(ser)
+    lines = ['G1 X%i Y%i%s' % (k, -k, ' F1000' * (k % 7)) for k in range(300)]
+    acks = []
+    streamer.on_ack = lambda n, response: acks.append(n)
+    assert streamer.stream(lines) == 300
+    assert acks == list(range(300))
+    assert (streamer.sent, streamer.buffered, len(streamer.in_flight)) == (300, 0, 0)
+    assert streamer.bytes_sent == sum(len(line) + 1 for line in lines)
+    assert streamer.peak_buffered == ser.peak
+    # the buffer is used, not just one line at a time
+    assert ser.peak > RX_BUFFER_SIZE // 2
+
+
+def test_errors_and_status_reports():
+    ser = _FakeGrbl(reports=[b'<Idle,MPos:0.000,0.000,0.000,WPos:0.000,0.000,0.000>\r\n'] * 3)
+    streamer = GrblStreamer(ser)
+    statuses = []
+    streamer.on_status = statuses.append
+    assert streamer.stream(['G0 X1', 'BAD X', 'G0 X2']) == 3
+    assert streamer.errors == 1
+    assert len(statuses) == 3 and streamer.status.state == 'Idle'
+
+
+def test_stop_without_drain():
+    ser = _FakeGrbl()
+    ser.readline = lambda: b''  # grbl never answers
+    streamer = GrblStreamer(ser)
+    streamer.on_idle = lambda: streamer.stop(drain=False)
+    acked = streamer.stream(['G1 X%i' % k for k in range(100)])
+    assert acked == 0
+    assert streamer.buffered == sum(streamer.in_flight) > 0
@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests of streamcheckpoint, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+from gcodefile import GcodeFile
+from streamcheckpoint import ModalState, StreamCheckpoint, checkpoint_filename, load_checkpoint, resume
+
+
+def _gcode(tmp_path, text):
+    fn = tmp_path / 'job.gcode'
+    fn.write_text(text)
+    return GcodeFile(str(fn))
+
+
+def _ack(checkpoint, n):
+    for k in range(n):
+        checkpoint.on_ack(k, 'ok')
+
+
+def test_modal_state_relative_and_program_end():
+    modal = ModalState()
+    for line in ('G21 G90', 'G0 X10 Y20', 'G91', 'G1 X1 Y-2 F500', 'G1 X1'):
+        modal.update(line)
+    assert (modal.x, modal.y) == (12.0, 18.0)
+    assert (modal.distance, modal.motion, modal.feed) == (91, 1, 500.0)
+    modal.update('M3 S300')
+    modal.update('M2')
+    assert (modal.distance, modal.motion, modal.spindle) == (90, 1, 5)
+
+
+def test_resume_preamble(tmp_path):
+    gcode = _gcode(tmp_path, 'G21\nG90\nG0 X10 Y10\nM3 S300\nG1 X20 Y10 F1000\nG1 X20 Y20\nM5\n')
+    checkpoint = StreamCheckpoint(gcode)
+    _ack(checkpoint, 5)
+    assert checkpoint.save()
+    assert load_checkpoint(checkpoint.fn)['line'] == 5
+    lines, resumed = resume(gcode)
+    assert list(lines) == ['M5', 'G21 G90 G54', 'G92.1', 'G0 X20.0000 Y10.0000', 'M3 S300', 'G90 G1 F1000',
+                           'G1 X20 Y20', 'M5']
+    assert len(lines) == 8
+    assert (resumed.start, resumed.skip) == (5, 6)
+    gcode.close()
+
+
+def test_resume_bare_arc(tmp_path):
+    # the line after the checkpoint continues a G2 without the motion word
+    gcode = _gcode(tmp_path, 'G90\nG0 X0 Y0\nM3 S300\nG2 X10 Y0 I5 J0 F800\nX0 Y0 I-5 J0\nM5\n')
+    checkpoint = StreamCheckpoint(gcode)
+    _ack(checkpoint, 4)
+    checkpoint.save()
+    lines, resumed = resume(gcode)
+    assert list(lines) == ['M5', 'G21 G90 G54', 'G92.1', 'G0 X10.0000 Y0.0000', 'M3 S300', 'G90 F800',
+                           'G2 X0 Y0 I-5 J0', 'M5']
+    assert len(lines) == 8
+    gcode.close()
+
+
+def test_save_failure_keeps_streaming(tmp_path):
+    gcode = _gcode(tmp_path, 'G90\nG0 X1 Y1\nG0 X2 Y2\n')
+    # a file where the directory of the checkpoint should be
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    messages = []
+    checkpoint = StreamCheckpoint(gcode, checkpoint_filename(gcode.fn, str(blocker)), interval=0.0)
+    checkpoint.on_message = messages.append
+    _ack(checkpoint, 3)
+    assert checkpoint.line == 3
+    assert not checkpoint.save()
+    assert isinstance(checkpoint.save_error, OSError)
+    assert len(messages) == 1
+    gcode.close()
+
+
+def test_checkpoint_filename(tmp_path):
+    a = checkpoint_filename('/a/job.gcode', str(tmp_path))
+    b = checkpoint_filename('/b/job.gcode', str(tmp_path))
+    assert a != b
+    assert os.path.dirname(a) == str(tmp_path)
+    assert checkpoint_filename('/a/job.gcode') == '/a/job.gcode.checkpoint.json'
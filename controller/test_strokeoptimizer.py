@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Regression tests of strokeoptimizer, run with pytest
+
+version history:
+2026-10-18: created this
+"""
+
+import time
+import numpy as np
+from strokeoptimizer import LEAF_POINTS, _KdTree, nearest_neighbour_order, optimize_order, optimize_gcode
+
+
+def _greedy(starts, ends, start=(0.0, 0.0)):
+    """nearest_neighbour_order by brute force."""
+    points = np.concatenate((starts, ends))
+    n = len(starts)
+    done = np.zeros(n, bool)
+    order = []
+    p = np.array(start)
+    for k in range(n):
+        d = np.hypot(*(points - p).T)
+        d[np.tile(done, 2)] = np.inf
+        q = int(np.argmin(d))
+        i = q % n
+        done[i] = True
+        order.append(i)
+        p = starts[i] if q >= n else ends[i]
+    return order
+
+
+def test_nearest_neighbour_axis_aligned():
+    rng = np.random.default_rng(0)
+    for n in (10, 100, 1000):
+        # horizontal strokes on one line and vertical ones on a few columns
+        x = rng.uniform(0, 300, n)
+        starts = np.column_stack((x, np.zeros(n)))
+        ends = starts + np.column_stack((rng.uniform(1, 20, n), np.zeros(n)))
+        order, flipped = nearest_neighbour_order(starts, ends)
+        assert order.tolist() == _greedy(starts, ends)
+        starts = np.column_stack((rng.integers(0, 3, n).astype(float), rng.uniform(0, 300, n)))
+        ends = starts + np.column_stack((np.zeros(n), rng.uniform(1, 20, n)))
+        order, flipped = nearest_neighbour_order(starts, ends)
+        assert order.tolist() == _greedy(starts, ends)
+
+
+
+def _clusters(rng, n, k=10):
+    """Strokes in k dense clusters."""
+    centres = rng.uniform(0, 1000, (k, 2))
+    starts = centres[rng.integers(0, k, n)] + rng.normal(0, 5, (n, 2))
+    return starts, starts + rng.normal(0, 1, (n, 2))
+
+
+def test_nearest_neighbour_clusters():
+    rng = np.random.default_rng(2)
+    starts, ends = _clusters(rng, 2000)
+    order, flipped = nearest_neighbour_order(starts, ends)
+    assert order.tolist() == _greedy(starts, ends)
+    points = np.concatenate((starts, ends))
+    tree = _KdTree(points, np.arange(len(points)))
+    assert max(len(leaf) for leaf in tree.leaf if leaf is not None) <= LEAF_POINTS
+
+
+def test_optimize_order_clusters_time():
+    rng = np.random.default_rng(3)
+    starts, ends = _clusters(rng, 50000)
+    t0 = time.time()
+    order, flipped = optimize_order(starts, ends)
+    assert time.time() - t0 < 10.0
+    assert sorted(order.tolist()) == list(range(50000))
+
+def test_optimize_horizontal_strokes(tmp_path):
+    rng = np.random.default_rng(1)
+    fn_in = tmp_path / 'in.gcode'
+    fn_out = tmp_path / 'out.gcode'
+    with open(fn_in, 'w') as f:
+        f.write('G21\nG90\n')
+        for k in range(300):
+            x = rng.uniform(0, 300)
+            f.write('G0 X%.2f Y0\nM3 S300\nG1 X%.2f Y0 F3000\nM5\n' % (x, x + rng.uniform(1, 20)))
+    t0 = time.time()
+    result = optimize_gcode(str(fn_in), str(fn_out))
+    assert time.time() - t0 < 10.0
+    assert result['strokes'] == 300
+    assert result['travel_after'] < result['travel_before']
+
+
+def test_optimize_keeps_dwells_and_comments(tmp_path):
+    fn_in = tmp_path / 'in.gcode'
+    fn_out = tmp_path / 'out.gcode'
+    strokes = [(10, 0, 20, 0), (0, 5, 8, 5), (21, 0, 30, 0)]
+    with open(fn_in, 'w') as f:
+        f.write('G21\nG90\nM5\nG4 P0.3\n')
+        for k, (x0, y0, x1, y1) in enumerate(strokes):
+            f.write('(stroke %i)\nG0 X%g Y%g\nM3 S300\nG4 P0.2\nG1 X%g Y%g F3000\nM5\nG4 P0.3\n' % (k, x0, y0, x1, y1))
+        f.write('G0 X0 Y0\nM2\n')
+    result = optimize_gcode(str(fn_in), str(fn_out), merge_tolerance=None)
+    assert result['lifts_before'] == 2
+    assert result['lifts_after'] == 2
+    with open(fn_out) as f:
+        lines = f.read().splitlines()
+    assert lines.count('M5') == 4
+    assert 'M5' not in [a for a, b in zip(lines, lines[1:]) if b == 'M5']
+    assert lines.count('G4 P0.2') == 3
+    assert lines.count('G4 P0.3') == 4
+    assert sorted(line for line in lines if line.startswith('(')) == ['(stroke 0)', '(stroke 1)', '(stroke 2)']
+
+
+def test_optimize_every_lift_dwells(tmp_path):
+    fn_in = tmp_path / 'in.gcode'
+    fn_out = tmp_path / 'out.gcode'
+    # the last stroke continues the first, reordering moves it into the middle
+    strokes = [(0, 0, 10, 10), (100, 100, 110, 100), (10, 10, 30, 30)]
+    with open(fn_in, 'w') as f:
+        f.write('G21\nG90\n')
+        for x0, y0, x1, y1 in strokes:
+            f.write('G0 X%g Y%g\nM3 S300\nG4 P0.2\nG1 X%g Y%g F3000\nM5\nG4 P0.3\n' % (x0, y0, x1, y1))
+        f.write('G0 X0 Y0\nM2\n')
+    optimize_gcode(str(fn_in), str(fn_out), merge_tolerance=None)
+    with open(fn_out) as f:
+        lines = f.read().splitlines()
+    moves = [line for line in lines if line.startswith('G1')]
+    assert moves == ['G1 X10.000 Y10.000 F3000', 'G1 X30.000 Y30.000', 'G1 X110.000 Y100.000']
+    lifts = [k for k, line in enumerate(lines) if line == 'M5']
+    assert len(lifts) == 3
+    assert all(lines[k + 1] == 'G4 P0.3' for k in lifts)
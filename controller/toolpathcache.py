@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of parsed toolpaths, keyed by file content hash
+
+Every entry is a directory named by the content hash and the parser version,
+holding the toolpath array and the line offset index as .npy files (loaded
+memory mapped) and the summary stats as json. The least recently used
+entries are evicted when the cache grows beyond max_bytes.
+
+version history:
+2026-10-18: created this
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from gcodeparser import PARSER_VERSION, parse_gcode, line_times, segment_lengths
+from gcodefile import GcodeFile
+
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vplotter')
+MAX_CACHE_BYTES = 2 << 30
+_HASH_CHUNKSIZE = 1 << 24
+
+
+def content_hash(fn):
+    """blake2b hex digest of the content of file fn, read in chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(fn, 'rb') as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNKSIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def toolpath_stats(toolpath, nlines):
+    """Summary of a toolpath, json serializable."""
+    stats = {'nlines': int(nlines), 'nmoves': int(len(toolpath))}
+    if len(toolpath):
+        lengths = segment_lengths(toolpath)
+        draw = toolpath['motion'] != 0
+        stats.update({
+            'xmin': float(toolpath['x'].min()), 'xmax': float(toolpath['x'].max()),
+            'ymin': float(toolpath['y'].min()), 'ymax': float(toolpath['y'].max()),
+            'draw_length': float(lengths[draw].sum()),
+            'travel_length': float(lengths[~draw].sum()),
+            'estimated_time': float(line_times(toolpath, nlines)[-1]),
+        })
+    return stats
+
+
+class ToolpathCache(object):
+    """On-disk LRU cache of parsed g-code files."""
+
+    def __init__(self, cachedir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        """Initialise."""
+        self.cachedir = cachedir
+        self.max_bytes = max_bytes
+        os.makedirs(cachedir, exist_ok=True)
+        self._hash_index_fn = os.path.join(cachedir, 'hashes.json')
+
+    def key(self, fn):
+        """Cache key of the g-code file fn."""
+        return '%s-v%i' % (self.file_hash(fn), PARSER_VERSION)
+
+    def file_hash(self, fn):
+        """content_hash of the file fn.
+
+        Hashing a big file takes a while, so the hash is remembered per path,
+        size and modification time.
+        """
+        st = os.stat(fn)
+        fkey = '%s|%i|%i' % (os.path.abspath(fn), st.st_size, st.st_mtime_ns)
+        hashes = self._read_hashes()
+        if fkey not in hashes:
+            hashes[fkey] = content_hash(fn)
+            self._write_hashes(hashes)
+        return hashes[fkey]
+
+    def _read_hashes(self):
+        try:
+            with open(self._hash_index_fn, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_hashes(self, hashes):
+        # drop the remembered hashes of files which have changed or vanished
+        for fkey in list(hashes):
+            fn, size, mtime = fkey.rsplit('|', 2)
+            try:
+                st = os.stat(fn)
+            except OSError:
+                del hashes[fkey]
+                continue
+            if st.st_size != int(size) or st.st_mtime_ns != int(mtime):
+                del hashes[fkey]
+        fd, tmp = tempfile.mkstemp(dir=self.cachedir)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(hashes, file)
+        os.replace(tmp, self._hash_index_fn)
+
+    def load(self, key):
+        """Return dict with toolpath, offsets and stats, None if key is not cached."""
+        entry = os.path.join(self.cachedir, key)
+        try:
+            toolpath = np.load(os.path.join(entry, 'toolpath.npy'), mmap_mode='r')
+            offsets = np.load(os.path.join(entry, 'offsets.npy'), mmap_mode='r')
+            with open(os.path.join(entry, 'stats.json'), 'r') as file:
+                stats = json.load(file)
+        except (OSError, ValueError):
+            return None
+        os.utime(entry)  # mark as recently used
+        return {'toolpath': toolpath, 'offsets': offsets, 'stats': stats}
+
+    def store(self, key, toolpath, offsets, stats):
+        """Store an entry, then evict old entries if the cache is too big."""
+        entry = os.path.join(self.cachedir, key)
+        if os.path.isdir(entry):
+            return
+        tmp = tempfile.mkdtemp(dir=self.cachedir, prefix='.tmp-')
+        try:
+            np.save(os.path.join(tmp, 'toolpath.npy'), toolpath)
+            np.save(os.path.join(tmp, 'offsets.npy'), offsets)
+            with open(os.path.join(tmp, 'stats.json'), 'w') as file:
+                json.dump(stats, file)
+            os.rename(tmp, entry)
+        except OSError:
+            # somebody else stored the same entry in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """List of (last use time, size in bytes, path) of all entries, oldest first."""
+        result = []
+        for name in os.listdir(self.cachedir):
+            entry = os.path.join(self.cachedir, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((os.path.getmtime(entry), size, entry))
+        return sorted(result)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits into max_bytes."""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for mtime, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove all entries."""
+        for mtime, size, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def load_gcode(fn, cache=None):
+    """Open, index and parse a g-code file, using the toolpath cache if given.
+
+    Returns the GcodeFile, the toolpath array and the summary stats.
+    """
+    if cache is None:
+        gcodefile = GcodeFile(fn)
+        toolpath, nlines = parse_gcode(gcodefile.data)
+        return gcodefile, toolpath, toolpath_stats(toolpath, nlines)
+
+    key = cache.key(fn)
+    cached = cache.load(key)
+    if cached is not None:
+        return GcodeFile(fn, offsets=cached['offsets']), cached['toolpath'], cached['stats']
+
+    t0 = time.time()
+    gcodefile = GcodeFile(fn)
+    toolpath, nlines = parse_gcode(gcodefile.data)
+    stats = toolpath_stats(toolpath, nlines)
+    stats['parse_time'] = time.time() - t0
+    cache.store(key, toolpath, gcodefile.offsets, stats)
+    return gcodefile, toolpath, stats
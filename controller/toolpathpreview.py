@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Level of detail decimation of toolpaths for the preview plot
+
+A pyramid of decimated polylines is built once per file. Level 0 is the
+full toolpath, every following level snaps the points to a grid twice as
+coarse and drops the points which stay in the grid cell of their
+predecessor. For drawing, the coarsest level whose grid is still finer than
+a screen pixel is picked and clipped to the visible range.
+
+version history:
+2026-10-18: created this
+"""
+
+import numpy as np
+
+
+def decimate(x, y, cell):
+    """Indices of the points which leave the grid cell (size cell) of the previous point."""
+    qx = np.floor(x / cell)
+    qy = np.floor(y / cell)
+    keep = np.ones(len(x), bool)
+    keep[1:] = (qx[1:] != qx[:-1]) | (qy[1:] != qy[:-1])
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+class ToolpathPyramid(object):
+    """Multi-resolution versions of the polyline x, y."""
+
+    def __init__(self, x, y, min_points=2000, finest=1 << 16):
+        """Build the levels, the finest grid is the extent of the path / finest."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.levels = [(0.0, x, y)]  # (cell size, x, y)
+        if len(x) < 2:
+            return
+        extent = max(np.ptp(x), np.ptp(y))
+        if extent == 0:
+            return
+        cell = extent / finest
+        while len(x) > min_points and cell < extent:
+            ix = decimate(x, y, cell)
+            # only keep levels which save something, the finer level is good enough otherwise
+            if len(ix) < 0.8 * len(x):
+                x = x[ix]
+                y = y[ix]
+                self.levels.append((cell, x, y))
+            cell *= 2
+
+    def level(self, pixel_size):
+        """The coarsest level with a grid finer than pixel_size."""
+        for cell, x, y in reversed(self.levels):
+            if cell <= pixel_size:
+                return x, y
+        return self.levels[0][1], self.levels[0][2]
+
+    def select(self, xrange, yrange, pixel_size):
+        """Points to draw for a view, NaN where the path leaves and re-enters the view.
+
+        Plot with connect='finite'.
+        """
+        x, y = self.level(pixel_size)
+        if not len(x):
+            return x, y
+        # a margin, so segments crossing the view border are drawn
+        mx = 0.1 * (xrange[1] - xrange[0])
+        my = 0.1 * (yrange[1] - yrange[0])
+        inside = ((x >= xrange[0] - mx) & (x <= xrange[1] + mx) &
+                  (y >= yrange[0] - my) & (y <= yrange[1] + my))
+        keep = inside.copy()
+        keep[1:] |= inside[:-1]
+        keep[:-1] |= inside[1:]
+        ix = np.flatnonzero(keep)
+        if len(ix) == len(x):
+            return x, y
+        breaks = np.flatnonzero(np.diff(ix) > 1) + 1
+        x = np.insert(x[ix], breaks, np.nan)
+        y = np.insert(y[ix], breaks, np.nan)
+        return x, y
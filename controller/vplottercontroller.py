@@ -11,10 +11,11 @@ version history:
 
 import sys
 import os
+import argparse
 import re
 import time
-import datetime
-import numpy as np
+import json
+T_START = time.perf_counter()  # for the startup times, see startupbench
 # from pyqtgraph import QtGui, QtCore
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPainter, QColor, QPen, QTextCursor
@@ -24,9 +25,11 @@ from PyQt5.QtWidgets import (
     QComboBox,
     QDateEdit,
     QTextEdit,
+    QPlainTextEdit,
     QDateTimeEdit,
     QDial,
     QDoubleSpinBox,
+    QFileDialog,
     QFontComboBox,
     QLabel,
     QLCDNumber,
@@ -48,42 +51,67 @@ from PyQt5.QtWidgets import (
 
 
 
-import pyqtgraph as pg
 # from pyqtgraph.ptime import time as pyqtgtime
 from qtguielements import StartStopButtons, PlottingTimer, Spinner
 from generaltools import gettimestamp, sec2HMS
-import serial
-from serial.tools.list_ports import comports
-
-pg.setConfigOption('background', 'w')
-pg.setConfigOption('foreground', 'k')
+from serialworker import SerialWorker, PortScanner
+from grblstreamer import GRBL_HWID
+from consolelog import ConsoleLog, VERBOSITY, INFO, STREAM, format_entries
+from grblsettings import DEFAULT_SETTINGS, parse_settings
+from grblhandshake import open_port
+# numpy, pyqtgraph and the modules using numpy take most of the startup
+# time, they are imported where needed, after the window is shown
 
 
 class vplottercontroller(QWidget):
     """GUI for GRBL in PyQt."""
 
-    def __init__(self):
-        """Initialise."""
+    CONSOLE_LINES = 2000  # lines the console shows at most
+    CONSOLE_INTERVAL = 100  # ms between console updates
+
+    def __init__(self, logfile=None, startup_report=False, telemetry_dir=None, checkpoint_dir=None):
+        """Initialise, logfile is the rotating log file of everything in the console.
+
+        With startup_report, the startup times are printed as JSON and the
+        GUI quits as soon as the plot and the port list are ready. With
+        telemetry_dir, the telemetry of every stream is saved there. The
+        checkpoints of the streams go to checkpoint_dir, by default
+        streamcheckpoint.CHECKPOINT_DIR.
+        """
         super(vplottercontroller, self).__init__()
+        self.startup_times = {'init': time.perf_counter() - T_START}
+        self.startup_report = startup_report
+        self.telemetry_dir = telemetry_dir
+        self.checkpoint_dir = checkpoint_dir
+        self.console = ConsoleLog(logfile=logfile)
         self.initUI()
 
     def initUI(self):
-        """Initialise the GUI."""
+        """Initialise the GUI, the plot follows in initPlot once the window is shown."""
         self.usemock = False
         hbmain = QHBoxLayout()
         
-        self.plt1 = pg.PlotWidget()
-        self.plt1.setLabel('left', "y (mm)")
-        self.plt1.setLabel('bottom', "x (mm)")
-        self.plt1.showGrid(x=True, y=True)
-        self.plt_headposition_x = pg.InfiniteLine(angle=90, movable=False)
-        self.plt_headposition_y = pg.InfiniteLine(angle=0, movable=False)
-        self.plt1.addItem(self.plt_headposition_x)
-        self.plt1.addItem(self.plt_headposition_y)
-        self.plt_gcode = self.plt1.plot(pen=pg.mkPen('r', width=2))
-        self.plt1.setAspectLocked(True,ratio=1)
-        
-        hbmain.addWidget(self.plt1)
+        self.plt1 = None
+        self.plt_layout = QVBoxLayout()
+        self.gcode_preview = None
+        # already plotted part of the path, in pieces so only the last one is redrawn
+        self.gcode_done_curves = []
+        self.gcode_done_timer = QTimer()
+        self.gcode_done_timer.setInterval(33)
+        self.gcode_done_timer.timeout.connect(self.gcode_done_update)
+        # redraw the decimated toolpath for the new view range, at most every 30 ms
+        self.gcode_preview_timer = QTimer()
+        self.gcode_preview_timer.setSingleShot(True)
+        self.gcode_preview_timer.setInterval(30)
+        self.gcode_preview_timer.timeout.connect(self.gcode_plot_update)
+        # per-line timing of the stream, summarised every 0.5 s
+        self.telemetry = None
+        self.checkpoint = None  # StreamCheckpoint of the running stream
+        self.telemetry_timer = QTimer()
+        self.telemetry_timer.setInterval(500)
+        self.telemetry_timer.timeout.connect(self.telemetry_update)
+        
+        hbmain.addLayout(self.plt_layout)
         
         
         vbconsole = QVBoxLayout()
@@ -93,12 +121,25 @@ class vplottercontroller(QWidget):
         gbvbhb = QHBoxLayout()
         self.gui_console_date_cb = QCheckBox('show date', self, checkable=True, checked=False)
         self.gui_console_time_cb = QCheckBox('show time', self, checkable=True, checked=False)
+        self.gui_console_date_cb.clicked.connect(self.console_redraw)
+        self.gui_console_time_cb.clicked.connect(self.console_redraw)
         gbvbhb.addWidget(self.gui_console_date_cb)
         gbvbhb.addWidget(self.gui_console_time_cb)
+        self.gui_console_verbosity = QComboBox()
+        self.gui_console_verbosity.addItems(list(VERBOSITY))
+        self.gui_console_verbosity.setCurrentText('stream lines')
+        self.gui_console_verbosity.currentIndexChanged.connect(self.console_redraw)
+        gbvbhb.addWidget(self.gui_console_verbosity)
         gbvb.addLayout(gbvbhb)
 
-        self.gui_consoletext = QTextEdit()
+        # a bounded document, appended to in batches by console_timer
+        self.gui_consoletext = QPlainTextEdit()
+        self.gui_consoletext.setMaximumBlockCount(self.CONSOLE_LINES)
         gbvb.addWidget(self.gui_consoletext)
+        self.console_timer = QTimer()
+        self.console_timer.setInterval(self.CONSOLE_INTERVAL)
+        self.console_timer.timeout.connect(self.console_update)
+        self.console_timer.start()
         
         self.gui_command = QLineEdit('', self)
         self.gui_command.returnPressed.connect(self.respond_gui_command)
@@ -123,6 +164,15 @@ class vplottercontroller(QWidget):
         self.port_list=cb
         self.port_list.setMinimumWidth(200)
         hbox.addWidget(cb)
+        cb=QCheckBox("simulate")
+        cb.setToolTip('connect to a simulated grbl instead of the port (see grblsim)')
+        self.gui_simulate_cb=cb
+        cb.stateChanged.connect(self.toggle_simulate)
+        hbox.addWidget(cb)
+        cb=QCheckBox("no reset")
+        cb.setToolTip('open the port without resetting grbl, it keeps its position and modes')
+        self.gui_noreset_cb=cb
+        hbox.addWidget(cb)
         cb=QCheckBox("Open")
         self.opened=cb
         cb.stateChanged.connect(self.toggle_connection)
@@ -349,11 +399,25 @@ class vplottercontroller(QWidget):
         btn = QPushButton('stop streaming')
         btn.clicked.connect(self.gcode_stream_stop)
         gbvbhb.addWidget(btn)
+        btn = QPushButton('resume')
+        btn.clicked.connect(self.gcode_stream_resume)
+        gbvbhb.addWidget(btn)
         gbvb.addLayout(gbvbhb)
         
         self.gui_eta_info = QLabel('--- streaming ETA info ---', self)
         gbvb.addWidget(self.gui_eta_info)
         
+        gbvbhb = QHBoxLayout()
+        self.gui_telemetry_cb = QCheckBox('record telemetry', self, checkable=True, checked=True)
+        gbvbhb.addWidget(self.gui_telemetry_cb)
+        btn = QPushButton('save telemetry...')
+        btn.clicked.connect(self.telemetry_save)
+        gbvbhb.addWidget(btn)
+        gbvb.addLayout(gbvbhb)
+        self.gui_telemetry_info = QLabel('--- stream telemetry ---', self)
+        self.gui_telemetry_info.setWordWrap(True)
+        gbvb.addWidget(self.gui_telemetry_info)
+        
         gbvb.addLayout(gbvbhb)
         gb.setLayout(gbvb)
         vbcontrols.addWidget(gb)
@@ -384,45 +448,115 @@ class vplottercontroller(QWidget):
         self.setGeometry(20, 40, 1400, 900)
         self.setWindowTitle('Vplotter Controller')
         self.setStyleSheet("font-size: 12pt")
-        self.show()
-        self.scan()
-        
         self.get_state_timer = QTimer()
         self.get_state_timer.timeout.connect(self.gui_get_state)
-        self.serial_active = False
+        self.worker = None
+        self.port_scanner = None
+        self.response_handlers = {}  # command id: function called with the response lines
+        self.grbl_settings = dict(DEFAULT_SETTINGS)
+        self.kinematics = None
+        self.gcode_file = None
+        self.toolpath_cache = None
         self.gcode_stream_running = False
 
+        self.show()
+        self._startup_mark('window')
+        self.scan()
+        # first thing in the event loop, the window is drawn before
+        QTimer.singleShot(0, self.initPlot)
 
-    def userinfo(self, txt):
-        """Set userinfo to gui."""
-        timestamptxt = None
-        if self.gui_console_date_cb.isChecked() and self.gui_console_time_cb.isChecked():
-            timestamptxt = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        if not self.gui_console_date_cb.isChecked() and self.gui_console_time_cb.isChecked():
-            timestamptxt = datetime.datetime.now().strftime('%H:%M:%S')
-        
-        if timestamptxt is not None:
-            self.gui_consoletext.append("%s: %s" % (timestamptxt, txt))
-        else:
-            self.gui_consoletext.append("%s" % txt)
+
+    def initPlot(self):
+        """Initialise the plot and everything else needing numpy."""
+        import pyqtgraph as pg
+        from polarkinematics import PolarKinematics
+        from toolpathcache import ToolpathCache
+        pg.setConfigOption('background', 'w')
+        pg.setConfigOption('foreground', 'k')
+        self.plt1 = pg.PlotWidget()
+        self.plt1.setLabel('left', "y (mm)")
+        self.plt1.setLabel('bottom', "x (mm)")
+        self.plt1.showGrid(x=True, y=True)
+        self.plt_headposition_x = pg.InfiniteLine(angle=90, movable=False)
+        self.plt_headposition_y = pg.InfiniteLine(angle=0, movable=False)
+        self.plt1.addItem(self.plt_headposition_x)
+        self.plt1.addItem(self.plt_headposition_y)
+        self.plt_gcode = self.plt1.plot(pen=pg.mkPen('r', width=2))
+        self.plt1.setAspectLocked(True,ratio=1)
+        self.plt1.sigRangeChanged.connect(self.gcode_preview_timer.start)
+        self.plt_layout.addWidget(self.plt1)
+        self.kinematics = PolarKinematics.from_settings(self.grbl_settings)
+        try:
+            self.toolpath_cache = ToolpathCache()
+        except OSError:
+            print('toolpath cache not available')
+        self._startup_mark('plot')
+
+
+    def _startup_mark(self, name):
+        """Note the time since the start, with startup_report quit when everything is ready."""
+        self.startup_times.setdefault(name, time.perf_counter() - T_START)
+        if self.startup_report and 'plot' in self.startup_times and 'ports' in self.startup_times:
+            self.startup_report = False
+            print(json.dumps(self.startup_times))
+            sys.stdout.flush()
+            QApplication.quit()
+
+
+    def userinfo(self, txt, level=INFO):
+        """Log txt to the console, it shows up with the next console_update."""
+        self.console.append("%s" % txt, level)
+
+
+    def streaminfo(self, txt):
+        """Log a line sent or acknowledged while streaming."""
+        self.console.append(txt, STREAM)
+
+
+    def _console_lines(self, entries):
+        verbosity = VERBOSITY[self.gui_console_verbosity.currentText()]
+        entries = [entry for entry in entries if entry[1] <= verbosity][-self.CONSOLE_LINES:]
+        return format_entries(entries, date=self.gui_console_date_cb.isChecked(),
+                              clock=self.gui_console_time_cb.isChecked())
+
+
+    def console_update(self):
+        """Append the lines logged since the last update to the console, in one go."""
+        lines = self._console_lines(self.console.flush())
+        if lines:
+            self.gui_consoletext.appendPlainText('\n'.join(lines))
+            self.gui_consoletext.moveCursor(QTextCursor.End)
+
+
+    def console_redraw(self):
+        """Show the tail of the log again, for a new verbosity or time format."""
+        self.console.flush()
+        self.gui_consoletext.setPlainText('\n'.join(self._console_lines(self.console.entries)))
         self.gui_consoletext.moveCursor(QTextCursor.End)
-        # print("%s: %s" % (timestamptxt, txt))
 
 
     def scan(self):
-        """Scan for serial ports with controllers attached."""
+        """Scan for serial ports with controllers attached, in the background."""
+        if self.port_scanner is not None and self.port_scanner.isRunning():
+            return
         self.port_list.clear()
         self.port_list.addItem('scanning for COMports, pls wait...')
-        QApplication.processEvents()
-        
+        self.scanbtn.setEnabled(False)
+        self.port_scanner = PortScanner()
+        self.port_scanner.ports.connect(self._scan_finished)
+        self.port_scanner.start()
+
+
+    def _scan_finished(self, ports):
+        """Fill the port list with the ports found by the PortScanner."""
         self.port_list.clear()
-        for port, desc, hwid in sorted(comports()):
-            print(' ')
-            print(hwid)
-            print("{}: {} [{}]".format(port, desc, hwid))
-            if '2341:0043' in hwid:
+        for port, desc, hwid in ports:
+            self.userinfo("{}: {} [{}]".format(port, desc, hwid))
+            if GRBL_HWID in hwid:
                 self.port_list.addItem(port)
-            
+        self.scanbtn.setEnabled(True)
+        self._startup_mark('ports')
+
 
     def toggle_connection(self,state):
         if state:
@@ -431,45 +565,122 @@ class vplottercontroller(QWidget):
             self.disconnect()
 
 
+    def toggle_simulate(self, state):
+        self.usemock = self.gui_simulate_cb.isChecked()
+
+
     def connect(self):
         # self.info_status.setText('opening port and initialising device. Please wait...')
-        QApplication.processEvents()
         self.opened.setChecked(True)
-        portName = self.port_list.currentText()
-        self.ser = serial.Serial(port=portName, baudrate=115200, timeout=0.5)
-        time.sleep(0.5)
-        self.userinfo("Initializing grbl...")
-        self.ser.write("\r\n\r\n")
-        time.sleep(2)
-        self.ser.flushInput()
+        reset = not self.gui_noreset_cb.isChecked()
+        if self.usemock:
+            from grblsim import SimulatedSerial
+            ser = SimulatedSerial(timeout=0.5)
+        else:
+            portName = self.port_list.currentText()
+            ser = open_port(portName, 115200, reset, timeout=0.5)
+        self.worker = SerialWorker(ser, reset=reset)
+        self.worker.ready.connect(self._serial_ready)
+        self.worker.response.connect(self._serial_response)
+        self.worker.status.connect(self._serial_status)
+        self.worker.message.connect(self.userinfo)
+        self.worker.stream_message.connect(self.streaminfo)
+        self.worker.stream_progress.connect(self._gcode_stream_progress)
+        self.worker.stream_finished.connect(self._gcode_stream_finished)
+        self.worker.start()
         self.set_spindle_speed()
 
 
     def disconnect(self):
         self.opened.setChecked(False)
-        #self.stop_event.set()
-        self.ser.close()
-        #self.readthread.join()
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.wait()
+            self.worker.ser.close()
+            self.worker = None
+            if self.gcode_stream_running:
+                self._gcode_stream_stop_do()
         #self.info_status.setText('not connected!')
 
 
-    def serial_write(self, commandstring, read=True):
-        self.serial_active = True
+    def serial_write(self, commandstring):
+        """Queue a command, the response arrives in _serial_response."""
+        if not self.online:
+            self.userinfo('not connected!')
+            return 0
         self.userinfo(commandstring)
-        cmd = '%s\r\n' % commandstring
-        self.ser.write(cmd.encode())
-        if read:
-            time.sleep(0.1)
-            self.serial_read()
-        time.sleep(0.1)
-        self.serial_active = False
+        return self.worker.send(commandstring)
+
+
+    def _serial_ready(self):
+        """grbl answered the handshake, the settings come with it unless grbl was busy."""
+        info = self.worker.info
+        self.userinfo('%s.' % info.text)
+        if info.settings is not None:
+            self._set_grbl_settings(info.settings)
+        else:
+            self.response_handlers[self.worker.send('$$')] = self._parse_grbl_settings
         self.gui_get_state()
 
 
-    def serial_read(self):
-        while self.ser.in_waiting:
-            result = self.ser.readline().decode().strip()
+    def _serial_response(self, cid, commandstring, results):
+        handler = self.response_handlers.pop(cid, None)
+        if handler is not None:
+            handler(results)
+            return
+        for result in results:
             self.userinfo(result)
+        self.gui_get_state()
+
+
+    def _serial_status(self, status):
+        """Show a grblstatus.MachineStatus, the crosshairs follow the head also while streaming."""
+        self.gui_info_state1.setText(status.report)
+        if status.gpos is not None:
+            self.gpos_x, self.gpos_y = status.gpos[:2]
+            self._update_position_info()
+        if status.spos is not None:
+            # GPos is where the parser is, the head is where the belts are
+            x, y = self.kinematics.inverse(status.spos[0], status.spos[1])
+            if hasattr(self, 'g54_x'):
+                x, y = x - self.g54_x, y - self.g54_y
+            self.plt_headposition_x.setValue(float(x))
+            self.plt_headposition_y.setValue(float(y))
+
+
+    def _parse_ngc_parameters(self, results):
+        try:
+            self.gui_info_state2.setText(results[0])
+            self.g54_x = float(results[0].split(',')[0].split(':')[1])
+            self.g54_y = float(results[0].split(',')[1])
+            self._update_position_info()
+        except (IndexError, ValueError):
+            print('read failed...')
+
+
+    def _parse_grbl_settings(self, results):
+        """Machine settings from '$$'."""
+        self._set_grbl_settings(parse_settings(results))
+
+
+    def _set_grbl_settings(self, settings):
+        """New machine settings, the planner simulation of a loaded file is redone with them."""
+        from polarkinematics import PolarKinematics
+        if settings == self.grbl_settings:
+            return
+        self.grbl_settings = settings
+        self.kinematics = PolarKinematics.from_settings(settings)
+        if self.gcode_file is not None and not self.gcode_stream_running:
+            self.gcode_simulate()
+
+
+    def _update_position_info(self):
+        if not hasattr(self, 'gpos_x') or not hasattr(self, 'g54_x'):
+            return
+        self.gui_info_mcs_x.setText('MCS x = %.1f mm' % self.gpos_x)
+        self.gui_info_mcs_y.setText('MCS y = %.1f mm' % self.gpos_y)
+        self.gui_info_wcs_x.setText('WCS x = %.1f mm' % (self.gpos_x - self.g54_x))
+        self.gui_info_wcs_y.setText('WCS y = %.1f mm' % (self.gpos_y - self.g54_y))
 
 
     def respond_gui_command(self):
@@ -497,11 +708,15 @@ class vplottercontroller(QWidget):
 
         
     def feed_hold(self):
-        self.serial_write('!')
+        if self.online:
+            self.userinfo('!')
+            self.worker.realtime('!')
 
 
     def feed_resume(self):
-        self.serial_write('~')
+        if self.online:
+            self.userinfo('~')
+            self.worker.realtime('~')
 
 
     def jog(self, what):
@@ -555,49 +770,17 @@ class vplottercontroller(QWidget):
 
 
     def gui_get_state(self):
-        #self.serial_write('?')
-        
-        if self.online and not self.serial_active and not self.gcode_stream_running:
-            try:
-                cmd = '?\r\n'
-                self.ser.write(cmd.encode())
-                time.sleep(0.1)
-                results = []
-                while self.ser.in_waiting:
-                    result = self.ser.readline().decode().strip()
-                    results.append(result)
-                # print(results)
-                # state = results[0]
-                self.gui_info_state1.setText(results[0])
-                
-                res1 = results[0].split(',')
-                gpos_x = float(res1[4].split(':')[1])
-                gpos_y = float(res1[5])
-                
-                cmd = '$#\r\n'
-                self.ser.write(cmd.encode())
-                time.sleep(0.1)
-                results = []
-                while self.ser.in_waiting:
-                    result = self.ser.readline().decode().strip()
-                    results.append(result)
-                #print(results)
-                self.gui_info_state2.setText(results[0])
-        
-                g54_x = float(results[0].split(',')[0].split(':')[1])
-                g54_y = float(results[0].split(',')[1])
-        
-                self.gui_info_mcs_x.setText('MCS x = %.1f mm' % gpos_x)
-                self.gui_info_mcs_y.setText('MCS y = %.1f mm' % gpos_y)
-                self.gui_info_wcs_x.setText('WCS x = %.1f mm' % (gpos_x - g54_x))
-                self.gui_info_wcs_y.setText('WCS y = %.1f mm' % (gpos_y - g54_y))
-                self.gpos_x = gpos_x
-                self.gpos_y = gpos_y
-                self.g54_x = g54_x
-                self.g54_y = g54_y
-                
-            except:
-                print('read failed...')
+        """Request a status report and the work coordinate offsets.
+
+        Both are answered asynchronously, see _serial_status and _parse_ngc_parameters.
+        The realtime '?' works while streaming too, the offsets ('$#') grbl
+        only reports when idle.
+        """
+        if not self.online:
+            return
+        self.worker.realtime('?')
+        if not self.gcode_stream_running:
+            self.response_handlers[self.worker.send('$#')] = self._parse_ngc_parameters
 
 
     def gui_set_mcs_zero(self):
@@ -642,164 +825,247 @@ class vplottercontroller(QWidget):
 
 
     def gcode_load_file(self):
+        if self.gcode_stream_running:
+            self.userinfo('cannot load a file while streaming!')
+            return
         fn = self.gcodefile_text.toPlainText()
         self.userinfo('opening file %s ...' % fn)
-        with open(fn, 'r') as file:
-            gcode_lines1 = file.readlines()
-            
-        Nlines = len(gcode_lines1)
-        
-        self.gcode_lines = gcode_lines1
-        
-        for n, line in enumerate(gcode_lines1):
-            # print(line.strip())
-            ix = line.find(';')
-            if ix:
-                line1 = line[0:ix].upper()
-            else:
-                line1 = line.upper()
-            # l1 = re.sub(';|\(.*?\)','',line).upper() # Strip comments/spaces/new line and capitalize
-            # print(line1)
-            self.gcode_lines[n] = line1
-            
-        # self.gcodefile_id.close()
+        if self.gcode_file is not None:
+            self.gcode_file.close()
+        from toolpathcache import load_gcode
+        # memory mapped, lines are read, stripped of comments and capitalized when streamed
+        self.gcode_file, self.gcode_toolpath, self.gcode_stats = load_gcode(fn, self.toolpath_cache)
+        Nlines = len(self.gcode_file)
         self.userinfo('%i G-code file lines read.' % Nlines)
+        self.gcode_simulate()
         self.gcode_plot()
 
 
-    def gcode_plot(self):
-        self.gcode_coordinates = [[0], [0], [0]]
+    def gcode_simulate(self):
+        """Simulate the motion planner on the loaded file, for the job time and the ETA."""
+        import numpy as np
+        from plannersim import PlannerSimulator
+        sim = PlannerSimulator.from_settings(self.grbl_settings)
+        self.gcode_line_times = sim.line_times(self.gcode_toolpath, len(self.gcode_file),
+                                               line_bytes=np.diff(self.gcode_file.offsets))
+        t_total = self.gcode_line_times[-1] if len(self.gcode_line_times) else 0.0
+        h, m, s = sec2HMS(t_total)
+        self.userinfo('simulated job time: %.0fh, %.0fm, %.0fs' % (h, m, s))
+        self.gui_eta_info.setText('job time: %.0fh, %.0fm, %.0fs' % (h, m, s))
 
-        for n, line in enumerate(self.gcode_lines):
-            # l1 = line[0:line.find(';')].split()
-            #print(line)
-            #l1 = re.sub('|\(.*?\)','',line).upper() # Strip comments/spaces/new line and capitalize
-            #print(l1)
 
-            # print('%s\n%s\n' % (line.strip(), l1))
-            l1 = line.split()
-            
-            if l1:
-
-                if l1[0] == 'G00' or l1[0] == 'G0' or l1[0] == 'G01' or l1[0] == 'G1':
-                    
-                    x = y = None
-                    for l11 in l1:
-                        if l11.find('X') >= 0:
-                            x = float(l11[1:])
-                        if l11.find('Y') >= 0:
-                            y = float(l11[1:])
-            
-                    if x is not None or y is not None:        
-                        self.gcode_coordinates[0].append(x)
-                        self.gcode_coordinates[1].append(y)
-                
-                        if l1[0] == 'G00' or l1[0] == 'G0':
-                            self.gcode_coordinates[2].append(0)
-                        if l1[0] == 'G01' or l1[0] == 'G1':
-                            self.gcode_coordinates[2].append(1)
-        
-        for n in range(2):
-            for m, c in enumerate(self.gcode_coordinates[n]):
-                if c == None:
-                    self.gcode_coordinates[n][m] = self.gcode_coordinates[n][m-1]
-            
-        # print(np.array(self.gcode_coordinates).transpose())
-        # print(self.gcode_coordinates[1])
-        # print(self.gcode_coordinates[2])
-        self.plt_gcode.setData(x=self.gcode_coordinates[0], y=self.gcode_coordinates[1])
+    PREVIEW_ARC_TOLERANCE = 0.05  # mm, chords of G2/G3 arcs in the preview
+
+    def gcode_plot(self):
+        import numpy as np
+        from polarkinematics import expand_arcs
+        from toolpathpreview import ToolpathPyramid
+        tp = self.gcode_toolpath
+        x, y, source = expand_arcs(tp['x'], tp['y'], tp['motion'], tp['i'], tp['j'],
+                                   arc_tolerance=self.PREVIEW_ARC_TOLERANCE)
+        # the file line of every plotted point, for the overlay of the done part
+        self.gcode_plot_lines = tp['line'][source]
+        x = np.concatenate(([0], x))
+        y = np.concatenate(([0], y))
+        self.gcode_plot_x = x
+        self.gcode_plot_y = y
+        self.gcode_done_reset()
+        self.gcode_preview = ToolpathPyramid(x, y)
+        self.plt1.setRange(xRange=(x.min(), x.max()), yRange=(y.min(), y.max()))
+        self.gcode_plot_update()
+
+
+    def gcode_plot_update(self):
+        """Draw the preview level of detail which fits the current view."""
+        if self.gcode_preview is None:
+            return
+        vb = self.plt1.getViewBox()
+        xrange, yrange = vb.viewRange()
+        pixel_size = min(vb.viewPixelSize())
+        x, y = self.gcode_preview.select(xrange, yrange, pixel_size)
+        self.plt_gcode.setData(x=x, y=y, connect='finite')
+
+
+    GCODE_DONE_CHUNK = 8192
+
+    def gcode_done_reset(self):
+        for curve in self.gcode_done_curves:
+            self.plt1.removeItem(curve)
+        self.gcode_done_curves = []
+        self.gcode_done_points = 0
+
+
+    def gcode_done_update(self):
+        """Extend the already plotted overlay up to the last acknowledged line.
+
+        Only the last piece of the overlay gets new data, as a view into the
+        plot arrays. Called by gcode_done_timer at the display frame rate.
+        """
+        import numpy as np
+        import pyqtgraph as pg
+        if self.worker is None:
+            return
+        acked = self.worker.stream_acked
+        # +1 for the start point at the origin
+        npoints = int(np.searchsorted(self.gcode_plot_lines, acked)) + 1
+        if npoints <= self.gcode_done_points:
+            return
+        C = self.GCODE_DONE_CHUNK
+        while True:
+            nchunk = len(self.gcode_done_curves)
+            if nchunk == 0 or self.gcode_done_points >= nchunk*C + 1:
+                curve = pg.PlotCurveItem(pen=pg.mkPen('b', width=2))
+                self.plt1.addItem(curve)
+                self.gcode_done_curves.append(curve)
+                nchunk += 1
+            # pieces overlap by one point, so they join up
+            i0 = (nchunk-1)*C
+            i1 = min(npoints, nchunk*C + 1)
+            self.gcode_done_curves[-1].setData(x=self.gcode_plot_x[i0:i1], y=self.gcode_plot_y[i0:i1])
+            self.gcode_done_points = i1
+            if i1 >= npoints:
+                break
 
 
     def gcode_stream_start(self):
+        self._gcode_stream_start(resuming=False)
+
+
+    def gcode_stream_resume(self):
+        """Continue an interrupted stream of the file from its checkpoint."""
+        self._gcode_stream_start(resuming=True)
+
+
+    def _gcode_stream_start(self, resuming):
+        if not self.online:
+            self.userinfo('not connected!')
+            return
+        if self.gcode_stream_running:
+            self.userinfo('G-Code stream already running!')
+            return
+        from streamtelemetry import StreamTelemetry
+        from streamcheckpoint import CHECKPOINT_DIR, StreamCheckpoint, checkpoint_filename, resume
         self.userinfo('starting G-Code steam...')
-        self.gcode_stream_running = True
-        # self.gcode_stream_stopcommand = False
 
-        #fn = self.gcodefile_text.toPlainText()
-        #self.userinfo('opening file %s ...' % fn)
-        #self.gcodefile_id = open(fn, 'r')
-        #lines = self.gcodefile_id.readlines()
-        
         self.gcode_load_file()
-        Nlines = len(self.gcode_lines)
-        #self.gcodefile_id.close()
+        file_hash = None if self.toolpath_cache is None else self.toolpath_cache.file_hash(self.gcode_file.fn)
+        checkpoint_fn = checkpoint_filename(self.gcode_file.fn, self.checkpoint_dir or CHECKPOINT_DIR)
+        if resuming:
+            try:
+                lines, self.checkpoint = resume(self.gcode_file, checkpoint_fn, file_hash=file_hash)
+            except ValueError as e:
+                self.userinfo('cannot resume: %s' % e)
+                return
+            # file line number of the first line streamed, the preamble comes before it
+            first = self.checkpoint.start - self.checkpoint.skip
+            self.userinfo('resuming at line %i' % (self.checkpoint.start+1))
+        else:
+            lines, first = self.gcode_file, 0
+            self.checkpoint = StreamCheckpoint(self.gcode_file, checkpoint_fn, file_hash=file_hash)
+        self.checkpoint.on_message = self.worker.message.emit
+        self.gcode_stream_running = True
+        Nlines = len(lines)
         self.userinfo('%i G-code lines to send' % Nlines)
-        
-        l_count = 0
-        g_count = 0
-        c_line = []
-        verbose = False
-        RX_BUFFER_SIZE = 128
 
         now = time.time()  # pyqtgtime()
         self.ETAtimer_last = now
         self.ETAtimer_start = now
-        # self.streamglobalcounter = 0
-        
-        for n, line in enumerate(self.gcode_lines):
-            # print(line)
-            #self.userinfo(line.strip())
+        self.ETAsimulated_start = self.gcode_line_times[first-1] if first > 0 else 0.0
+        self.telemetry = None
+        if self.gui_telemetry_cb.isChecked():
+            self.telemetry = StreamTelemetry(Nlines, rx_buffer_size=self.worker.streamer.rx_buffer_size,
+                                             baudrate=getattr(self.worker.ser, 'baudrate', 115200))
+            self.telemetry_timer.start()
+        self.worker.streamer.telemetry = self.telemetry
+        self.worker.streamer.checkpoint = self.checkpoint
+        self.worker.stream(lines, first)
+        self.gcode_done_timer.start()
 
 
-            l_count += 1  # Iterate line counter
-            # l_block = re.sub('\s|\(.*?\)','',line).upper() # Strip comments/spaces/new line and capitalize
-            #l_block = re.sub('|\(.*?\)','',line).upper() # Strip comments/spaces/new line and capitalize
-            l_block = line.strip()
-            #print(l_block)
-            #l_block = l_block[0:l_block.find(';')]
-            self.userinfo(l_block)
-            
-            c_line.append(len(l_block)+1)  # Track number of characters in grbl serial read buffer
-            grbl_out = '' 
-            while sum(c_line) >= RX_BUFFER_SIZE-1 | self.ser.inWaiting():
-                # out_temp = self.ser.readline().strip().decode()  # Wait for grbl response
-                out_temp = self.ser.readline().decode().strip()
-                # print("  Debug1: ", out_temp)
-                if out_temp.find('ok') < 0 and out_temp.find('error') < 0 :
-                    #print("  Debug: ", out_temp)  # Debug response
-                    self.userinfo("Debug: " + out_temp)  # Debug response
-                else :
-                    grbl_out += out_temp;
-                    g_count += 1 # Iterate g-code counter
-                    grbl_out += str(g_count);  # Add line finished indicator
-                    del c_line[0]  # Delete the block character count corresponding to the last 'ok'
-                QApplication.processEvents()
-
-            if verbose: print("SND: " + str(l_count) + " : " + l_block,)
-            # cmd = l_block + '\n'
-            # cmd = '%s\r\n' % l_block
-            cmd = '%s\n' % l_block
-            self.ser.write(cmd.encode())  # Send g-code block to grbl
-            # self.ser.write(l_block + '\n') # Send g-code block to grbl
-            if verbose: print("BUF:",str(sum(c_line)),"REC:", grbl_out)
-            self.userinfo(grbl_out)
-
-            if not self.gcode_stream_running:
-                break                
-
-            if n % 10 == 0 or n+1 == Nlines:
-                self.gcode_stream_progressbar.setValue((n+1)/Nlines*100)
-                
-                now = time.time()  # pyqtgtime()
-                Dt0 = now - self.ETAtimer_start
-                eta = Dt0/(n+1) * (Nlines-n)
-                self.gui_eta_info.setText('line %i/%i, eta: %.0fh, %.0fm, %.0fs, runtime: %.0fh, %.0fm, %.0fs' %
-                                               (n+1, Nlines, sec2HMS(eta)[0], sec2HMS(eta)[1], sec2HMS(eta)[2], sec2HMS(Dt0)[0], sec2HMS(Dt0)[1], sec2HMS(Dt0)[2] ) )
-                
-                QApplication.processEvents()
+    ETA_MIN_SIMULATED = 10.0  # s of simulated job time before the drift is trusted
 
+    def _gcode_stream_progress(self, n, Nlines):
+        self.gcode_stream_progressbar.setValue(int(n/Nlines*100))
+
+        now = time.time()  # pyqtgtime()
+        Dt0 = now - self.ETAtimer_start
+        # simulated remaining time, scaled by the drift of the machine against the simulation so far
+        acked = max(self.worker.stream_acked, 1) if self.worker is not None else n
+        t_done = self.gcode_line_times[acked-1] - self.ETAsimulated_start
+        t_total = self.gcode_line_times[-1] - self.ETAsimulated_start
+        drift = Dt0/t_done if t_done > self.ETA_MIN_SIMULATED else 1.0
+        eta = drift * (t_total-t_done)
+        self.gui_eta_info.setText('line %i/%i, eta: %.0fh, %.0fm, %.0fs, runtime: %.0fh, %.0fm, %.0fs' %
+                                       (n, Nlines, sec2HMS(eta)[0], sec2HMS(eta)[1], sec2HMS(eta)[2], sec2HMS(Dt0)[0], sec2HMS(Dt0)[1], sec2HMS(Dt0)[2] ) )
+
+
+    def _gcode_stream_finished(self, g_count, Nlines):
         self.userinfo('G-Code steaming finished!')
+        self.gcode_done_update()
+        # the worker is done with the stream, telemetry and checkpoint are the GUI's again
+        if self.worker is not None:
+            self.worker.streamer.telemetry = None
+            self.worker.streamer.checkpoint = None
+        if self.checkpoint is not None:
+            self.checkpoint.on_message = None
+        if g_count >= Nlines and self.checkpoint is not None:
+            self.checkpoint.remove()
+            self.checkpoint = None
         self._gcode_stream_stop_do()
 
 
     def gcode_stream_stop(self):
         self.userinfo('stopping G-Code steam!')
-        self._gcode_stream_stop_do()
+        if self.online and self.gcode_stream_running:
+            # _gcode_stream_finished follows when the stream has ended
+            self.userinfo('waiting for grbl to take the lines already in its buffer...')
+            self.worker.stop_stream()
+        else:
+            self._gcode_stream_stop_do()
 
 
     def _gcode_stream_stop_do(self):
+        """Clean up after a stream, with the worker not streaming any more."""
         self.gcode_stream_running = False
-        # self.gcode_stream_stopcommand  = True
+        self.gcode_done_timer.stop()
+        if self.checkpoint is not None:
+            if self.checkpoint.save():
+                self.userinfo('checkpoint at line %i saved, resume continues there' % (self.checkpoint.line+1))
+            else:
+                self.userinfo('saving the checkpoint failed: %s' % self.checkpoint.save_error)
+            self.checkpoint = None
+        if self.telemetry is not None and self.telemetry_timer.isActive():
+            self.telemetry_timer.stop()
+            self.telemetry_update()
+            if self.telemetry_dir is not None:
+                name = os.path.splitext(os.path.basename(self.gcodefile_text.toPlainText()))[0]
+                fn = os.path.join(self.telemetry_dir, '%s_telemetry_%s.npz' % (name, time.strftime('%Y%m%d-%H%M%S')))
+                self._telemetry_save_to(fn)
+
+
+    def telemetry_update(self):
+        """Show the summary of the last seconds of the stream."""
+        if self.telemetry is not None:
+            self.gui_telemetry_info.setText(self.telemetry.summary_text())
+
+
+    def telemetry_save(self):
+        """Save the telemetry of the last stream, as .npz or .csv."""
+        if self.telemetry is None:
+            self.userinfo('no telemetry recorded!')
+            return
+        fn = QFileDialog.getSaveFileName(directory=os.path.dirname(self.gcodefile_text.toPlainText()),
+                                         filter='numpy (*.npz);;CSV (*.csv)')[0]
+        if fn:
+            self._telemetry_save_to(fn)
+
+
+    def _telemetry_save_to(self, fn):
+        try:
+            self.telemetry.save(fn)
+            self.userinfo('telemetry saved to %s' % fn)
+        except (IOError, OSError) as e:
+            self.userinfo('saving telemetry failed: %s' % e)
 
 
     def _browse_gcodefile(self):
@@ -810,13 +1076,7 @@ class vplottercontroller(QWidget):
 
     @property
     def online(self):
-        isonline = False
-        try:
-            isonline = self.ser.isOpen()
-        except:
-            isonline = False
-                
-        return isonline
+        return self.worker is not None and self.worker.isRunning()
 
 
     def closeEvent(self, event):
@@ -824,16 +1084,33 @@ class vplottercontroller(QWidget):
         self.userinfo("closing GUI...")
         try:
             self.userinfo('closiung serial')
-            self.ser.close()
+            self.disconnect()
         except:
             print("cannot close serial")
+        if self.port_scanner is not None:
+            self.port_scanner.wait()
         print("bye bye...")
+        self.console.close()
         
 
-def main():
+def main(argv=None):
     """The main."""
-    app = QApplication(sys.argv)
-    ex = vplottercontroller()
+    parser = argparse.ArgumentParser(description='GUI for the GRBL v-plotter.')
+    parser.add_argument('--simulate', action='store_true', default=False,
+            help='connect to a simulated grbl instead of a serial port (see grblsim)')
+    parser.add_argument('--log', metavar='FILE',
+            help='log everything shown in the console to FILE, rotated at 10 MB')
+    parser.add_argument('--startup-report', action='store_true', default=False,
+            help='print the startup times as JSON and quit once the GUI is ready (see startupbench)')
+    parser.add_argument('--telemetry-dir', metavar='DIR',
+            help='save the telemetry of every stream to DIR, as <gcode file>_telemetry_<time>.npz')
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+            help='keep the checkpoints of the streams, for resuming them, in DIR (default: ~/.cache/vplotter/checkpoints)')
+    args, qt_args = parser.parse_known_args(argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    ex = vplottercontroller(logfile=args.log, startup_report=args.startup_report, telemetry_dir=args.telemetry_dir,
+                            checkpoint_dir=args.checkpoint_dir)
+    ex.gui_simulate_cb.setChecked(args.simulate)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Headless g-code streaming to the GRBL v-plotter
+
+Python 3 replacement for firmware/doc/script/stream.py, installed as the
+vplotter-stream console script. No Qt needed. Comments, spaces and
+empty lines are stripped before streaming.
+
+version history:
+2026-10-18: created this
+"""
+
+import sys
+import time
+import argparse
+from grblstreamer import GrblStreamer, RX_BUFFER_SIZE
+from grblhandshake import handshake, open_port
+from gcodefile import GcodeFile, clean_line
+from gcodecompactor import GcodeCompactor
+from grblsim import SimulatedSerial
+from streamtelemetry import StreamTelemetry
+from streamcheckpoint import StreamCheckpoint, checkpoint_filename, resume
+
+
+def wait_for_idle(streamer, interval=0.2):
+    """Poll status reports until grbl reports Idle, i.e. the planner ran empty."""
+    state = {'idle': False}
+
+    def on_status(status):
+        state['idle'] = status.idle
+
+    on_status_old = streamer.on_status
+    streamer.on_status = on_status
+    try:
+        while not state['idle']:
+            streamer.ser.write(b'?')
+            t0 = time.time()
+            while time.time() - t0 < interval and not state['idle']:
+                streamer.poll()
+    finally:
+        streamer.on_status = on_status_old
+
+
+def main(argv=None):
+    """The main."""
+    parser = argparse.ArgumentParser(description='Stream g-code file to grbl.')
+    parser.add_argument('gcode_file', type=argparse.FileType('r'),
+            help='g-code filename to be streamed')
+    parser.add_argument('device_file', nargs='?',
+            help='serial device path')
+    parser.add_argument('-q', '--quiet', action='store_true', default=False,
+            help='suppress output text')
+    parser.add_argument('-s', '--settings', action='store_true', default=False,
+            help='settings write mode (call-response, one line at a time)')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200,
+            help='serial baud rate (default: %(default)s)')
+    parser.add_argument('--rx-buffer-size', type=int, default=RX_BUFFER_SIZE,
+            help="grbl's serial rx buffer size, RX_BUFFER_SIZE in serial.h (default: %(default)s)")
+    parser.add_argument('--no-wait', action='store_true', default=False,
+            help='exit after the last acknowledge, without waiting for grbl to become idle')
+    parser.add_argument('-c', '--compact', action='store_true', default=False,
+            help='compact the lines on the fly (see vplotter-compact)')
+    parser.add_argument('--simulate', action='store_true', default=False,
+            help='stream to a simulated, unlocked grbl instead of a device (see grblsim)')
+    parser.add_argument('--status-interval', type=float, default=None, metavar='S',
+            help="request a status report with '?' every S seconds while streaming (default: none)")
+    parser.add_argument('--telemetry', metavar='FILE',
+            help='record the send/acknowledge times of every line to FILE, .npz or .csv (see streamtelemetry)')
+    parser.add_argument('--checkpoint', action='store_true', default=False,
+            help='save the progress every few seconds next to the file, for --resume (see streamcheckpoint)')
+    parser.add_argument('--resume', action='store_true', default=False,
+            help='continue an interrupted --checkpoint stream from its checkpoint, after a pen-up travel')
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+            help='keep the checkpoint in DIR instead of next to the file')
+    parser.add_argument('--no-reset', action='store_true', default=False,
+            help='open the port without resetting grbl, it keeps its position and modes')
+    args = parser.parse_args(argv)
+    verbose = not args.quiet
+    if args.device_file is None and not args.simulate:
+        parser.error('a device_file is needed, or --simulate')
+    if (args.checkpoint or args.resume) and (args.compact or args.settings):
+        parser.error('--checkpoint and --resume stream the file as it is, without --compact or --settings')
+
+    gcode = None
+    checkpoint = None
+    if args.checkpoint or args.resume:
+        gcode = GcodeFile(args.gcode_file.name)
+        checkpoint_fn = checkpoint_filename(gcode.fn, args.checkpoint_dir)
+        if args.resume:
+            try:
+                lines, checkpoint = resume(gcode, checkpoint_fn)
+            except ValueError as e:
+                print('cannot resume: %s' % e)
+                return 1
+            print('resuming at line %i' % (checkpoint.start+1))
+        else:
+            lines, checkpoint = gcode, StreamCheckpoint(gcode, checkpoint_fn)
+
+    if args.simulate:
+        ser = SimulatedSerial(timeout=0.1, baudrate=args.baudrate, rx_buffer_size=args.rx_buffer_size, locked=False)
+    else:
+        ser = open_port(args.device_file, args.baudrate, reset=not args.no_reset, timeout=0.1)
+    streamer = GrblStreamer(ser, rx_buffer_size=args.rx_buffer_size)
+    streamer.status_interval = args.status_interval
+    streamer.checkpoint = checkpoint
+    if verbose:
+        streamer.on_send = lambda n, line: print('SND: %i : %s' % (n+1, line))
+        streamer.on_ack = lambda n, response: print('REC: %i : %s BUF: %i' % (n+1, response, streamer.buffered))
+    streamer.on_message = lambda text: print('  MSG: %s' % text)
+    if checkpoint is not None:
+        checkpoint.on_message = streamer.on_message
+
+    print('Initializing grbl...')
+    try:
+        info = handshake(streamer, reset=not args.no_reset)
+    except TimeoutError as e:
+        print(e)
+        ser.close()
+        return 1
+    print(info.text)
+
+    mode = 'SETTINGS MODE' if args.settings else 'STREAMING'
+    print('%s: %s to %s' % (mode, args.gcode_file.name, ser.port))
+    if args.telemetry:
+        streamer.telemetry = StreamTelemetry(rx_buffer_size=args.rx_buffer_size, baudrate=args.baudrate)
+    t0 = time.time()
+    try:
+        with args.gcode_file as f:
+            if gcode is None:
+                # comments and spaces would only take room in grbl's rx buffer
+                lines = (line for line in (clean_line(line).replace(' ', '') for line in f) if line)
+            if args.compact:
+                compactor = GcodeCompactor()
+                lines = compactor.lines(clean_line(line) for line in f)
+            streamer.stream(lines, settings_mode=args.settings)
+        Dt = time.time() - t0
+        if not args.no_wait:
+            print('waiting for grbl to finish the buffered moves...')
+            wait_for_idle(streamer)
+    except KeyboardInterrupt:
+        Dt = time.time() - t0
+        print('interrupted! sending feed hold.')
+        ser.write(b'!')
+    finally:
+        ser.close()
+
+    if checkpoint is not None:
+        if checkpoint.line >= len(gcode):
+            checkpoint.remove()
+        elif checkpoint.save():
+            print('checkpoint at line %i saved to %s, continue with --resume' % (checkpoint.line+1, checkpoint.fn))
+        else:
+            print('saving the checkpoint failed: %s' % checkpoint.save_error)
+        gcode.close()
+    if streamer.telemetry is not None:
+        streamer.telemetry.save(args.telemetry)
+        print('telemetry saved to %s' % args.telemetry)
+        print(streamer.telemetry.summary_text(window=Dt))
+    print('G-code streaming finished!')
+    print('%i lines sent, %i acknowledged, %i errors in %.1f s' % (streamer.sent, streamer.acked, streamer.errors, Dt))
+    if Dt > 0:
+        print('%.1f lines/s, %.0f bytes/s' % (streamer.acked / Dt, streamer.bytes_sent / Dt))
+    print('rx buffer occupancy: mean %.1f, peak %i of %i bytes' %
+          (streamer.mean_buffered, streamer.peak_buffered, streamer.rx_buffer_size))
+    if args.compact:
+        print('compression ratio %.2f' % compactor.ratio)
+    return 1 if streamer.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -47,6 +47,7 @@ import re
 import time
 import sys
 import argparse
+from collections import deque
 # import threading
 
 RX_BUFFER_SIZE = 128
@@ -107,15 +108,17 @@ else:
     # counting of the number of characters sent by the streamer to Grbl and tracking Grbl's 
     # responses, such that we never overflow Grbl's serial read buffer. 
     g_count = 0
-    c_line = []
+    c_line = deque() # Character counts of the blocks in grbl's serial read buffer
+    c_sum = 0 # Running total of c_line
     # periodic() # Start status report periodic timer
     for line in f:
         l_count += 1 # Iterate line counter
         # l_block = re.sub('\s|\(.*?\)','',line).upper() # Strip comments/spaces/new line and capitalize
         l_block = line.strip()
         c_line.append(len(l_block)+1) # Track number of characters in grbl serial read buffer
+        c_sum += c_line[-1]
         grbl_out = '' 
-        while sum(c_line) >= RX_BUFFER_SIZE-1 | s.inWaiting() :
+        while c_sum >= RX_BUFFER_SIZE-1 or s.inWaiting() :
             out_temp = s.readline().strip() # Wait for grbl response
             if out_temp.find('ok') < 0 and out_temp.find('error') < 0 :
                 print "  Debug: ",out_temp # Debug response
@@ -123,10 +126,10 @@ else:
                 grbl_out += out_temp;
                 g_count += 1 # Iterate g-code counter
                 grbl_out += str(g_count); # Add line finished indicator
-                del c_line[0] # Delete the block character count corresponding to the last 'ok'
+                c_sum -= c_line.popleft() # Delete the block character count corresponding to the last 'ok'
         if verbose: print "SND: " + str(l_count) + " : " + l_block,
         s.write(l_block + '\n') # Send g-code block to grbl
-        if verbose : print "BUF:",str(sum(c_line)),"REC:",grbl_out
+        if verbose : print "BUF:",str(c_sum),"REC:",grbl_out
 
 # Wait for user input after streaming is completed
 print "G-code streaming finished!\n"